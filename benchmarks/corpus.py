@@ -0,0 +1,110 @@
+"""
+Synthetic letter corpus for the Document Processor Pro benchmarks
+Writes minimal text PDFs in the same layout as real letters, without any PDF library
+
+    python benchmarks/corpus.py OUTPUT_FOLDER --files 1000 [--pages 3] [--seed 1]
+
+Each letter has the sender e-mail marker, two header lines, an address block
+and a "Dear" greeting on its first page, followed by filler pages. The same
+count, page number and seed always produce byte-identical files.
+"""
+import argparse
+import os
+import random
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from docprocessor.rules import SENDER_MARKER, GREETING_MARKER  # noqa: E402
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Jamie", "Robin", "Avery", "Riley"]
+SURNAMES = ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson", "Davies", "Patel", "Evans"]
+STREETS = ["High Street", "Station Road", "Church Lane", "Victoria Road", "Green Lane", "Manor Road"]
+TOWNS = ["Basingstoke", "Reading", "Leeds", "Bristol", "York", "Norwich", "Cardiff", "Bath"]
+FILLER = ("Thank you for your continued support. This letter confirms the details of your account "
+          "and sets out the information we are required to provide each year.")
+
+
+def _escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode('latin-1', 'replace')
+
+
+def pdf_bytes(pages):
+    """Build a PDF with one Helvetica text page per list of lines"""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 1 + 2 * len(pages) + 1
+    page_ids = []
+    for lines in pages:
+        body = b"BT /F1 11 Tf 72 760 Td 14 TL " + b" ".join(b"(" + _escape(line) + b") '" for line in lines) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(body), body))
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, len(objects)))
+        page_ids.append(len(objects))
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                   % (b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    return bytes(out)
+
+
+def letter_pages(rng, index, pages=3):
+    """Page lines for one synthetic letter"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}"
+    first_page = [
+        "Customer Services",
+        SENDER_MARKER,
+        f"Our ref: {index:08d}",
+        "",
+        name,
+        f"{rng.randint(1, 250)} {rng.choice(STREETS)}",
+        rng.choice(TOWNS),
+        f"RG{rng.randint(1, 29)} {rng.randint(1, 9)}{rng.choice('ABDEFGHJ')}{rng.choice('LNPQRSTU')}",
+        "",
+        f"{GREETING_MARKER} {name.split()[0]},",
+        FILLER,
+    ]
+    filler_page = [FILLER[i:i + 80] for i in range(0, len(FILLER), 80)] * 8
+    return [first_page] + [filler_page] * (pages - 1)
+
+
+def generate_corpus(folder, files, pages=3, seed=1):
+    """Write `files` letters to folder, skipping ones already there; returns the file paths"""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(files):
+        # Draw from the generator for every letter so existing files don't shift the rest
+        content = letter_pages(rng, index, pages)
+        path = os.path.join(folder, f"letter_{index:06d}.pdf")
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(pdf_bytes(content))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic letters for benchmarking.")
+    parser.add_argument("folder", help="folder to write the PDF files to")
+    parser.add_argument("--files", type=int, default=1000, help="number of letters (default: %(default)s)")
+    parser.add_argument("--pages", type=int, default=3, help="pages per letter (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    generate_corpus(args.folder, args.files, args.pages, args.seed)
+    print(f"Wrote {args.files} letters of {args.pages} page(s) to {args.folder}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Pipeline benchmark for Document Processor Pro
+Times each stage of a run over a synthetic letter corpus and compares it with a saved baseline
+
+    python benchmarks/pipeline_benchmark.py --files 1000 [--pages 3] [--repeat 3]
+    python benchmarks/pipeline_benchmark.py --files 1000 --save-baseline
+
+Stages, timed separately and serially so they can be compared run to run:
+  discovery   listing the PDF files in the folder
+  parsing     reading, hashing and extracting the text of every page
+  slicing     finding the markers and cutting out the address block
+  append      adding one row per letter to a new workbook
+  save        closing the workbook
+  end_to_end  process_files with the default worker pool and no cache
+
+Baselines are kept per corpus size in benchmarks/baselines.json. Exits with
+status 1 when any stage is slower than its baseline by more than --threshold.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor import core  # noqa: E402
+from docprocessor.extraction import apply_rules_to_pages  # noqa: E402
+from docprocessor.rules import DEFAULT_RULES  # noqa: E402
+from docprocessor.workbook import WorkbookWriter  # noqa: E402
+
+DEFAULT_BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "baselines.json")
+DEFAULT_THRESHOLD = 0.20
+
+# Stages faster than this are all noise; don't fail them on a relative change
+MIN_REGRESSION_SECONDS = 0.05
+
+STAGES = ["discovery", "parsing", "slicing", "append", "save", "end_to_end"]
+
+
+def scale_key(files, pages):
+    return f"{files} files x {pages} pages"
+
+
+def run_stages(corpus_dir, work_dir):
+    """Time one pass over the corpus; returns {stage: seconds}"""
+    from PyPDF2 import PdfReader
+
+    timings = {}
+
+    started = time.perf_counter()
+    pdf_files = sorted(core.find_pdf_files(corpus_dir))
+    timings['discovery'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parsed = []
+    for path in pdf_files:
+        with open(path, 'rb') as f:
+            content = f.read()
+        reader = PdfReader(io.BytesIO(content))
+        page_texts = {page_num: page.extract_text() or "" for page_num, page in enumerate(reader.pages)}
+        parsed.append((path, hashlib.sha256(content).hexdigest(), page_texts))
+    timings['parsing'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    blocks = []
+    for path, sha256, page_texts in parsed:
+        scanner = apply_rules_to_pages(page_texts, len(page_texts), DEFAULT_RULES)
+        block = scanner.block() if scanner is not None else None
+        if block is not None:
+            blocks.append((os.path.basename(path), sha256, block))
+    timings['slicing'] = time.perf_counter() - started
+
+    excel_path = os.path.join(work_dir, "stages.xlsx")
+    started = time.perf_counter()
+    writer = WorkbookWriter(excel_path)
+    for filename, sha256, block in blocks:
+        writer.add(filename, sha256, block)
+    timings['append'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    writer.close()
+    timings['save'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    summary = core.process_files(pdf_files, os.path.join(work_dir, "end_to_end.xlsx"), use_cache=False)
+    timings['end_to_end'] = time.perf_counter() - started
+
+    if len(blocks) != len(pdf_files) or summary['extracted'] != len(pdf_files):
+        raise RuntimeError(f"Expected {len(pdf_files)} extracted letters, got {len(blocks)} "
+                           f"in the stage run and {summary['extracted']} end to end")
+    return timings
+
+
+def benchmark(files, pages, repeat, corpus_root):
+    """Best time per stage over `repeat` passes"""
+    corpus_dir = os.path.join(corpus_root, f"letters_{files}x{pages}")
+    started = time.perf_counter()
+    generate_corpus(corpus_dir, files, pages)
+    print(f"📄 Corpus of {files} letters ready in {time.perf_counter() - started:.1f}s: {corpus_dir}")
+
+    best = {}
+    for run in range(repeat):
+        work_dir = tempfile.mkdtemp(prefix="docprocessor_bench_")
+        try:
+            timings = run_stages(corpus_dir, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        for stage, seconds in timings.items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    return best
+
+
+def load_baselines(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def compare(stages, baseline, threshold):
+    """List of (stage, seconds, baseline seconds) for stages that regressed"""
+    regressions = []
+    for stage, seconds in stages.items():
+        previous = baseline.get(stage)
+        if previous is None:
+            continue
+        if seconds > previous * (1 + threshold) and seconds - previous > MIN_REGRESSION_SECONDS:
+            regressions.append((stage, seconds, previous))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of document processing.")
+    parser.add_argument("--files", type=int, default=1000,
+                        help="letters in the corpus, e.g. 100 to 100000 (default: %(default)s)")
+    parser.add_argument("--pages", type=int, default=3, help="pages per letter (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="passes per stage; the fastest is kept (default: %(default)s)")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "docprocessor_corpus"),
+                        help="where generated letters are kept between runs (default: %(default)s)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH,
+                        help="baseline JSON file (default: benchmarks/baselines.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="record this run as the baseline for its corpus size")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown per stage, as a fraction (default: %(default)s)")
+    parser.add_argument("--json", dest="json_path", help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    stages = benchmark(args.files, args.pages, args.repeat, args.corpus_dir)
+    result = {
+        'scale': scale_key(args.files, args.pages),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'stages': {stage: round(stages[stage], 4) for stage in STAGES},
+    }
+
+    print(f"⏱️ {result['scale']}, best of {args.repeat}:")
+    for stage in STAGES:
+        seconds = stages[stage]
+        print(f"   {stage:<11} {seconds:9.3f}s  {seconds / args.files * 1000:8.3f} ms/file")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+    baselines = load_baselines(args.baseline)
+    if args.save_baseline:
+        baselines[result['scale']] = result
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"💾 Saved baseline for {result['scale']} to {args.baseline}")
+        return 0
+
+    baseline = baselines.get(result['scale'])
+    if baseline is None:
+        print(f"ℹ️ No baseline for {result['scale']}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(result['stages'], baseline['stages'], args.threshold)
+    for stage, seconds, previous in regressions:
+        print(f"❌ {stage} regressed: {seconds:.3f}s against a baseline of {previous:.3f}s "
+              f"(+{(seconds / previous - 1) * 100:.0f}%)")
+    if regressions:
+        return 1
+    print(f"✅ No stage is more than {args.threshold:.0%} slower than the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Print scheduling benchmark for Document Processor Pro
+Runs a print job list against the fake spooler and reports how far the run is from the printer's own speed
+
+    python benchmarks/print_benchmark.py --files 500 [--seconds-per-job 0.01] [--jobs-in-flight 2]
+
+The spooler prints one job at a time, so the fastest possible run is
+files x seconds-per-job; anything above that is scheduling overhead.
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from docprocessor.printing import (FakeSpooler, PrintScheduler, DEFAULT_JOBS_IN_FLIGHT,  # noqa: E402
+                                   DEFAULT_MAX_QUEUE_DEPTH, JOB_DONE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time print scheduling against a simulated printer.")
+    parser.add_argument("--files", type=int, default=500, help="letters to print (default: %(default)s)")
+    parser.add_argument("--seconds-per-job", type=float, default=0.01,
+                        help="simulated printer time per letter (default: %(default)s)")
+    parser.add_argument("--jobs-in-flight", type=int, default=DEFAULT_JOBS_IN_FLIGHT,
+                        help="jobs handed to the printer at once (default: %(default)s)")
+    parser.add_argument("--max-queue-depth", type=int, default=DEFAULT_MAX_QUEUE_DEPTH,
+                        help="hold submissions while the printer queue is this long (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    spooler = FakeSpooler(seconds_per_job=args.seconds_per_job)
+    scheduler = PrintScheduler(spooler, jobs_in_flight=args.jobs_in_flight,
+                               max_queue_depth=args.max_queue_depth)
+    paths = [f"letter_{i:05d}.pdf" for i in range(args.files)]
+
+    started = time.perf_counter()
+    jobs = scheduler.run(paths)
+    elapsed = time.perf_counter() - started
+
+    printed = sum(1 for job in jobs if job.state == JOB_DONE)
+    printer_bound = args.files * args.seconds_per_job
+    print(f"🖨️ {printed}/{args.files} letters in {elapsed:.3f}s with {args.jobs_in_flight} job(s) in flight")
+    print(f"   printer time {printer_bound:.3f}s, scheduling overhead {elapsed - printer_bound:.3f}s "
+          f"({(elapsed / printer_bound - 1) * 100 if printer_bound else 0:.1f}%)")
+    return 0 if printed == args.files else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Extraction service latency benchmark for Document Processor Pro
+Starts the HTTP service in-process and measures single-letter request latency as callers see it
+
+    python benchmarks/service_benchmark.py [--requests 2000] [--clients 4] [--workers 4] [--upload]
+
+Each client keeps one connection open and sends one-page letters one after
+another, by path or (--upload) as the request body. Exits with status 1 when
+the p99 latency is above --target-ms.
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor.service import serve  # noqa: E402
+
+DEFAULT_TARGET_MS = 200.0
+
+
+def client(port, paths, upload, latencies, errors):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    for path in paths:
+        if upload:
+            with open(path, 'rb') as f:
+                body, headers = f.read(), {"Content-Type": "application/pdf"}
+        else:
+            body, headers = json.dumps({'path': path}), {"Content-Type": "application/json"}
+        started = time.perf_counter()
+        connection.request("POST", f"/extract?name={os.path.basename(path)}", body, headers)
+        response = connection.getresponse()
+        record = json.loads(response.read())
+        latencies.append(time.perf_counter() - started)
+        if response.status != 200 or record.get('status') != 'ok':
+            errors.append(record)
+    connection.close()
+
+
+def percentile(latencies, q):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the extraction service's request latency.")
+    parser.add_argument("--requests", type=int, default=2000, help="requests in total (default: %(default)s)")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent callers (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=4, help="service worker processes (default: %(default)s)")
+    parser.add_argument("--upload", action="store_true", help="send the PDF itself rather than its path")
+    parser.add_argument("--target-ms", type=float, default=DEFAULT_TARGET_MS,
+                        help="p99 latency to stay under (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    corpus_dir = os.path.join(tempfile.gettempdir(), "docprocessor-service-benchmark")
+    paths = generate_corpus(corpus_dir, 200, pages=1)
+
+    ready = threading.Event()
+    stop_event = threading.Event()
+    servers = []
+
+    def on_ready(server):
+        servers.append(server)
+        ready.set()
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=serve, kwargs=dict(port=0, stop_event=stop_event, on_ready=on_ready,
+                                                        workers=args.workers))
+    thread.start()
+    ready.wait()
+    port = servers[0].server_address[1]
+    print(f"Service ready on port {port} in {time.perf_counter() - started:.2f}s with {args.workers} worker(s)")
+
+    latencies = []
+    errors = []
+    per_client = args.requests // args.clients
+    clients = [threading.Thread(target=client, args=(port, [paths[(c * per_client + i) % len(paths)]
+                                                           for i in range(per_client)],
+                                                     args.upload, latencies, errors))
+               for c in range(args.clients)]
+    started = time.perf_counter()
+    for c in clients:
+        c.start()
+    for c in clients:
+        c.join()
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+    thread.join()
+
+    latencies.sort()
+    p50, p95, p99 = (percentile(latencies, q) * 1000 for q in (0.50, 0.95, 0.99))
+    print(f"{len(latencies)} requests from {args.clients} client(s) in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f} req/s), {len(errors)} failed")
+    print(f"   latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, max {latencies[-1] * 1000:.1f} ms "
+          f"(target p99 < {args.target_ms:.0f} ms)")
+    return 0 if p99 < args.target_ms and not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Startup benchmark for Document Processor Pro
+Launches the desktop app repeatedly and measures the time until its window first paints
+
+    python benchmarks/startup_benchmark.py [--runs 10] [--target 0.5]
+
+Exits with status 1 when the median time-to-first-paint is above the target.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure_once(app_path):
+    env = dict(os.environ, DOCPROCESSOR_EXIT_AFTER_FIRST_PAINT="1")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, app_path], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, env=env)
+    for line in process.stdout:
+        if line.strip() == "FIRST_PAINT":
+            elapsed = time.perf_counter() - started
+            break
+    else:
+        process.wait()
+        raise RuntimeError(f"App exited without painting: {process.stderr.read().strip()}")
+    process.wait(timeout=30)
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="number of launches (default: %(default)s)")
+    parser.add_argument("--target", type=float, default=0.5,
+                        help="maximum median seconds to first paint (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    app_path = os.path.join(repo_dir, "pdf_address_extractor_gui.py")
+
+    # The first launch warms the OS file cache and writes bytecode; don't count it
+    measure_once(app_path)
+    timings = [measure_once(app_path) for _ in range(args.runs)]
+
+    median = statistics.median(timings)
+    print(f"⏱️ Time to first paint over {args.runs} runs: "
+          f"min {min(timings):.3f}s, median {median:.3f}s, max {max(timings):.3f}s")
+    if median > args.target:
+        print(f"❌ Median is above the {args.target:.3f}s target")
+        return 1
+    print(f"✅ Within the {args.target:.3f}s target")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
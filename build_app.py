@@ -28,18 +28,10 @@ def build_executable():
         print("❌ Error: app_icon.png not found!")
         return False
     
-    # Convert PNG to ICO for PyInstaller (if needed)
-    try:
-        from PIL import Image
-        ico_path = os.path.join(current_dir, "app_icon.ico")
-        
-        # Convert PNG to ICO
-        img = Image.open(icon_path)
-        img.save(ico_path, format='ICO', sizes=[(16, 16), (32, 32), (48, 48), (64, 64)])
-        print(f"✅ Created ICO file: {ico_path}")
-        
-    except Exception as e:
-        print(f"⚠️ Warning: Could not create ICO file: {e}")
+    # Use the pre-rendered ICO shipped with the app (regenerate with build_icons.py)
+    ico_path = os.path.join(current_dir, "app_icon.ico")
+    if not os.path.exists(ico_path):
+        print("⚠️ Warning: app_icon.ico not found - run 'python build_icons.py' first")
         ico_path = None
     
     # Prepare PyInstaller arguments
@@ -55,10 +47,11 @@ def build_executable():
     if ico_path and os.path.exists(ico_path):
         args.extend(['--icon', ico_path])
     
-    # Add data files to include
-    args.extend([
-        '--add-data', f'{icon_path};.',  # Include PNG icon in the bundle
-    ])
+    # Add data files to include (pre-rendered icons loaded at startup)
+    for asset in ("app_icon_16.png", "app_icon_32.png", "app_icon.ico"):
+        asset_path = os.path.join(current_dir, asset)
+        if os.path.exists(asset_path):
+            args.extend(['--add-data', f'{asset_path};.'])
     
     # Add the main script
     args.append(script_path)
@@ -86,15 +79,7 @@ def build_executable():
     except Exception as e:
         print(f"❌ Build error: {e}")
         return False
-    
-    finally:
-        # Clean up temporary ICO file
-        if ico_path and os.path.exists(ico_path):
-            try:
-                os.remove(ico_path)
-                print("🧹 Cleaned up temporary ICO file")
-            except:
-                pass
+
 
 def install_pyinstaller():
     """Install PyInstaller if not available"""
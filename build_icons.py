@@ -0,0 +1,34 @@
+"""
+Pre-render the application icon sizes used at runtime
+Run this after changing app_icon.png so the app never has to resize it on startup
+"""
+import os
+
+from PIL import Image
+
+
+def build_icons():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    png_path = os.path.join(current_dir, "app_icon.png")
+    
+    if not os.path.exists(png_path):
+        print("❌ Error: app_icon.png not found!")
+        return False
+    
+    img = Image.open(png_path)
+    
+    # Window/taskbar icons loaded directly by Tk (no Pillow needed at runtime)
+    for size in (16, 32):
+        out_path = os.path.join(current_dir, f"app_icon_{size}.png")
+        img.resize((size, size), Image.Resampling.LANCZOS).save(out_path, format='PNG', optimize=True)
+        print(f"✅ Created {os.path.basename(out_path)}")
+    
+    # Windows title bar / taskbar icon and executable icon
+    ico_path = os.path.join(current_dir, "app_icon.ico")
+    img.save(ico_path, format='ICO', sizes=[(16, 16), (32, 32), (48, 48), (64, 64)])
+    print(f"✅ Created {os.path.basename(ico_path)}")
+    return True
+
+
+if __name__ == "__main__":
+    build_icons()
@@ -0,0 +1,6 @@
+"""
+Core processing for Document Processor Pro.
+
+The modules in this package contain no tkinter code so they can be imported
+from worker processes without pulling in the GUI.
+"""
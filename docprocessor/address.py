@@ -0,0 +1,152 @@
+"""
+Address parsing and duplicate-recipient detection for Document Processor Pro
+Splits an extracted block into name, address lines and postcode, and remembers recipients across runs
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+
+# Duplicate recipient handling
+DUPLICATES_OFF = "off"
+DUPLICATES_FLAG = "flag"
+DUPLICATES_SKIP = "skip"
+DUPLICATE_MODES = (DUPLICATES_OFF, DUPLICATES_FLAG, DUPLICATES_SKIP)
+
+# UK postcode, with or without the space between outward and inward codes
+POSTCODE_RE = re.compile(r'\b([A-Z]{1,2}[0-9][A-Z0-9]?)\s*([0-9][A-Z]{2})\b', re.IGNORECASE)
+
+# Courtesy titles are dropped from the name so "Mr J Smith" and "J Smith" match
+TITLES = {"MR", "MRS", "MS", "MISS", "MX", "DR", "PROF", "SIR", "REV"}
+
+# Street words reduced to one spelling so "High Street" and "High St." match
+STREET_ABBREVIATIONS = {
+    "STREET": "ST", "ROAD": "RD", "AVENUE": "AVE", "LANE": "LN", "DRIVE": "DR",
+    "CLOSE": "CL", "COURT": "CT", "PLACE": "PL", "CRESCENT": "CRES", "GARDENS": "GDNS",
+    "SQUARE": "SQ", "TERRACE": "TCE",
+}
+
+_NON_WORD_RE = re.compile(r'[^A-Z0-9 ]+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def _normalise(text):
+    """Upper case, punctuation removed, runs of whitespace collapsed"""
+    text = _NON_WORD_RE.sub(' ', text.upper())
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def _normalise_street(line):
+    return ' '.join(STREET_ABBREVIATIONS.get(word, word) for word in _normalise(line).split(' '))
+
+
+def parse_address(block):
+    """
+    Split an address block into {'name', 'lines', 'postcode', 'key'}.
+
+    The first line is taken as the recipient's name and the postcode is pulled
+    out of whichever line holds it (the last one if several do). key is a hash
+    of the normalised name, first address line and postcode, so spacing,
+    punctuation, case, titles and street abbreviations don't stop two copies
+    of an address matching.
+    Returns None for an empty block.
+    """
+    lines = [line.strip() for line in (block or '').split('\n') if line.strip()]
+    if not lines:
+        return None
+
+    postcode = None
+    for index in range(len(lines) - 1, 0, -1):
+        match = POSTCODE_RE.search(lines[index])
+        if match:
+            postcode = f"{match.group(1)} {match.group(2)}".upper()
+            rest = (lines[index][:match.start()] + lines[index][match.end():]).strip(' ,')
+            if rest:
+                lines[index] = rest
+            else:
+                del lines[index]
+            break
+
+    name, address_lines = lines[0], lines[1:]
+    name_words = [word for word in _normalise(name).split(' ') if word not in TITLES]
+    if postcode:
+        parts = [' '.join(name_words), _normalise_street(address_lines[0]) if address_lines else '',
+                 postcode.replace(' ', '')]
+    else:
+        # Without a postcode the whole block has to agree
+        parts = [' '.join(name_words)] + [_normalise_street(line) for line in address_lines]
+    key = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    return {'name': name, 'lines': address_lines, 'postcode': postcode, 'key': key}
+
+
+def recipient_index_path_for(excel_path):
+    return excel_path + ".recipients.sqlite"
+
+
+def reset_recipients(excel_path):
+    """Forget every recipient seen so far"""
+    try:
+        os.remove(recipient_index_path_for(excel_path))
+    except FileNotFoundError:
+        pass
+
+
+class RecipientIndex:
+    """
+    Persistent set of recipient keys already processed, with the first letter
+    that went to each.
+
+    Lookups are a primary-key probe, so checking a letter costs the same with
+    ten recipients on file or ten million.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.duplicates = 0
+        self._pending = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS recipients ("
+            " key TEXT PRIMARY KEY, first_file TEXT, postcode TEXT, first_seen REAL, letters INTEGER)")
+        self.conn.commit()
+
+    def check(self, recipient, filename):
+        """
+        Record a letter to this recipient; returns the filename of an earlier
+        letter to the same recipient, or None if this is the first.
+
+        Re-running the file that first reached a recipient is not a duplicate.
+        """
+        row = self.conn.execute(
+            "SELECT first_file FROM recipients WHERE key = ?", (recipient['key'],)).fetchone()
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO recipients (key, first_file, postcode, first_seen, letters)"
+                " VALUES (?, ?, ?, ?, 1)",
+                (recipient['key'], filename, recipient['postcode'], time.time()))
+            self._note_write()
+            return None
+        if row[0] == filename:
+            return None
+
+        self.conn.execute("UPDATE recipients SET letters = letters + 1 WHERE key = ?",
+                          (recipient['key'],))
+        self._note_write()
+        self.duplicates += 1
+        return row[0]
+
+    def _note_write(self):
+        # Batch writes into larger transactions, as the extraction cache does
+        self._pending += 1
+        if self._pending >= 500:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,209 @@
+"""
+Persistent extraction cache for Document Processor Pro
+Stores page text and extracted blocks in SQLite, keyed by file content hash
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from .extraction import STATUS_OK, STATUS_NO_MARKERS, STATUS_ERROR, HASH_CHUNK_SIZE, apply_rules_to_pages
+from .rules import DEFAULT_RULES
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_sha256(file_path):
+    """Hash a file's content in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extraction results.
+
+    A size+mtime check against the last known hash of each path avoids hashing
+    unchanged files at all. Entries keep the raw text of the pages that were
+    read, so results made under different marker rules can be re-sliced without
+    opening the PDF again. Total stored text is capped and the least recently
+    used entries are evicted first.
+    """
+
+    def __init__(self, path, rules=DEFAULT_RULES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.rules = rules
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.rule_hits = 0
+        self.misses = 0
+        self.duplicates = 0
+        self.evicted = 0
+        self._touched = {}
+        self._pending = 0
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " sha256 TEXT PRIMARY KEY, rules TEXT, status TEXT, data TEXT,"
+            " marker_pages TEXT, page_count INTEGER, pages TEXT,"
+            " bytes INTEGER, last_used REAL, template TEXT)")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(documents)")]
+        if 'template' not in columns:
+            # Caches written before templates were reported
+            self.conn.execute("ALTER TABLE documents ADD COLUMN template TEXT")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS documents_last_used ON documents (last_used)")
+        self.conn.commit()
+
+    def content_hash(self, file_path):
+        """Return the file's content hash, skipping the read when size and mtime match"""
+        st = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (key,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+
+        sha256 = file_sha256(file_path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+            (key, st.st_size, st.st_mtime_ns, sha256))
+        self._note_write()
+        return sha256
+
+    def lookup(self, sha256, file_path):
+        """Return a cached record for this content, or None on a miss"""
+        row = self.conn.execute(
+            "SELECT rules, status, data, marker_pages, page_count, pages, template"
+            " FROM documents WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        rules, status, data, marker_pages, page_count, pages, template = row
+        marker_pages = json.loads(marker_pages) if marker_pages else None
+
+        if rules != self.rules.key:
+            # Marker rules changed since this entry was stored: re-slice the cached text
+            page_texts = {int(k): v for k, v in json.loads(pages).items()}
+            scanner = apply_rules_to_pages(page_texts, page_count, self.rules)
+            if scanner is None:
+                self.misses += 1
+                return None
+            data = scanner.block()
+            status = STATUS_OK if data is not None else STATUS_NO_MARKERS
+            marker_pages = scanner.marker_pages()
+            template = scanner.template_name()
+            self.conn.execute(
+                "UPDATE documents SET rules = ?, status = ?, data = ?, marker_pages = ?, template = ?"
+                " WHERE sha256 = ?",
+                (self.rules.key, status, data, json.dumps(marker_pages), template, sha256))
+            self._note_write()
+            self.rule_hits += 1
+        else:
+            self.hits += 1
+            if template is None and status == STATUS_OK and len(self.rules.templates) == 1:
+                # Stored before templates were recorded; with one template there is no doubt
+                template = self.rules.templates[0].name
+
+        self._touched[sha256] = time.time()
+        return {
+            'file': os.path.basename(file_path),
+            'path': file_path,
+            'status': status,
+            'data': data,
+            'error': None,
+            'marker_pages': marker_pages,
+            'template': template,
+            'pages_read': 0,
+            'page_count': page_count,
+            'sha256': sha256,
+            'cached': True,
+        }
+
+    def store(self, sha256, record):
+        """Save a freshly extracted record; errors are not cached so they get retried"""
+        page_texts = record.pop('pages', None)
+        if record['status'] == STATUS_ERROR or page_texts is None:
+            return
+
+        pages = json.dumps({str(k): v for k, v in page_texts.items()})
+        size = len(pages) + len(record['data'] or '')
+        self.conn.execute(
+            "INSERT OR REPLACE INTO documents"
+            " (sha256, rules, status, data, marker_pages, page_count, pages, bytes, last_used, template)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (sha256, self.rules.key, record['status'], record['data'],
+             json.dumps(record['marker_pages']), record['page_count'], pages,
+             size, time.time(), record.get('template')))
+        self._note_write()
+
+    def _note_write(self):
+        # Batch writes into larger transactions; a crash only loses cache entries
+        self._pending += 1
+        if self._pending >= 500:
+            self.conn.commit()
+            self._pending = 0
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM documents").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for sha256, size in self.conn.execute(
+                "SELECT sha256, bytes FROM documents ORDER BY last_used"):
+            doomed.append((sha256,))
+            freed += size
+            if freed >= target:
+                break
+
+        self.conn.executemany("DELETE FROM documents WHERE sha256 = ?", doomed)
+        self.conn.execute(
+            "DELETE FROM files WHERE sha256 NOT IN (SELECT sha256 FROM documents)")
+        self.evicted += len(doomed)
+        return len(doomed)
+
+    def flush(self):
+        """Record access times, enforce the size limit and commit"""
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE documents SET last_used = ? WHERE sha256 = ?",
+                [(used, sha256) for sha256, used in self._touched.items()])
+            self._touched = {}
+        self.evict()
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'rule_hits': self.rule_hits,
+            'misses': self.misses,
+            'duplicates': self.duplicates,
+            'evicted': self.evicted,
+        }
+
+    def summary(self):
+        """One-line hit/miss report for the status log"""
+        return (f"Cache: {self.hits} hit(s), {self.rule_hits} re-sliced from cached text, "
+                f"{self.misses} miss(es), {self.duplicates} duplicate(s) parsed once, "
+                f"{self.evicted} evicted")
@@ -0,0 +1,168 @@
+"""
+Run checkpoints for Document Processor Pro
+Durable record of the files each extraction run has finished, so an interrupted run resumes where it stopped
+"""
+import os
+import sqlite3
+import time
+
+from .extraction import STATUS_OK, STATUS_NO_MARKERS
+
+# Run states
+RUN_RUNNING = "running"
+RUN_FINISHED = "finished"
+RUN_ABANDONED = "abandoned"
+
+# Outcomes that count a file as done; one that failed or timed out is tried again on resume,
+# unless it was moved to quarantine
+DONE_STATUSES = (STATUS_OK, STATUS_NO_MARKERS)
+
+
+def checkpoint_path_for(excel_path):
+    return excel_path + ".runs.sqlite"
+
+
+def reset_checkpoints(excel_path):
+    """Forget every run, e.g. after the workbook has been cleared"""
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(checkpoint_path_for(excel_path) + suffix)
+        except FileNotFoundError:
+            pass
+
+
+class RunCheckpoint:
+    """
+    The file list of each extraction run and which of its files are done.
+
+    A run's files are recorded when it starts. A file is marked done once its
+    row has been saved by the output (or straight away if it had no markers),
+    so a resumed run re-extracts nothing that reached the output and loses
+    nothing that did not. Files that failed or timed out keep their status
+    but are not done, so resuming tries them again, unless they were moved
+    to quarantine and are no longer there to try. Each batch of files is committed with
+    synchronous=FULL, as the print journal is. Resuming reads only the files
+    not yet done, through an index on (run_id, done, seq), so restarting costs
+    the same however far the run had got. A finished run keeps its counts but
+    drops its file list; a run that ends with files failed or timed out stays
+    resumable, listing only those.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = None
+        # Files an earlier session of this run had already finished
+        self.resumed_files = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, folder TEXT, state TEXT, files INTEGER, done INTEGER,"
+            " started REAL, updated REAL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " run_id TEXT, seq INTEGER, path TEXT, done INTEGER, status TEXT,"
+            " PRIMARY KEY (run_id, path)) WITHOUT ROWID")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_pending ON files (run_id, done, seq)")
+        self.conn.commit()
+
+    def start(self, pdf_files, folder_path=None):
+        """Record a new run over pdf_files; returns its ID"""
+        now = time.time()
+        base = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.run_id = base
+        seq = 1
+        while self.run(self.run_id) is not None:
+            seq += 1
+            self.run_id = f"{base}-{seq}"
+        self.resumed_files = 0
+        self.conn.execute(
+            "INSERT INTO runs (run_id, folder, state, files, done, started, updated)"
+            " VALUES (?, ?, ?, ?, 0, ?, ?)",
+            (self.run_id, os.path.abspath(folder_path) if folder_path else None, RUN_RUNNING,
+             len(pdf_files), now, now))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO files (run_id, seq, path, done) VALUES (?, ?, ?, 0)",
+            ((self.run_id, seq, path) for seq, path in enumerate(pdf_files)))
+        self.conn.commit()
+        return self.run_id
+
+    def run(self, run_id):
+        """{'run_id', 'folder', 'state', 'files', 'done', 'started'} for a run, or None if it is unknown"""
+        row = self.conn.execute(
+            "SELECT run_id, folder, state, files, done, started FROM runs WHERE run_id = ?",
+            (run_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('run_id', 'folder', 'state', 'files', 'done', 'started'), row))
+
+    def resume(self, run_id, folder_path=None):
+        """
+        Continue an interrupted run; returns its files not yet done, in their original order.
+
+        Rows are named by their path below the run's folder, so folder_path,
+        when given, must be the folder the run started over.
+        """
+        run = self.run(run_id)
+        if run is None:
+            raise ValueError(f"No run {run_id} is recorded for this output.")
+        if run['state'] != RUN_RUNNING:
+            raise ValueError(f"Run {run_id} is {run['state']} and cannot be resumed.")
+        if folder_path and run['folder'] and os.path.abspath(folder_path) != run['folder']:
+            raise ValueError(f"Run {run_id} was over {run['folder']}, not {os.path.abspath(folder_path)}.")
+        self.run_id = run_id
+        self.resumed_files = run['done']
+        return [path for (path,) in self.conn.execute(
+            "SELECT path FROM files WHERE run_id = ? AND done = 0 ORDER BY seq", (run_id,))]
+
+    def unfinished(self, folder_path):
+        """The latest run over folder_path that did not finish, or None"""
+        row = self.conn.execute(
+            "SELECT run_id FROM runs WHERE folder = ? AND state = ? ORDER BY started DESC LIMIT 1",
+            (os.path.abspath(folder_path), RUN_RUNNING)).fetchone()
+        return self.run(row[0]) if row else None
+
+    def mark_done(self, records):
+        """
+        Record finished records' status, marking the DONE_STATUSES ones and
+        the quarantined ones done, durably before returning.
+        """
+        if not records:
+            return
+        rows = [(int(record['status'] in DONE_STATUSES or bool(record.get('quarantined_to'))),
+                 record['status'], self.run_id, record['path'])
+                for record in records]
+        self.conn.executemany(
+            "UPDATE files SET done = ?, status = ? WHERE run_id = ? AND path = ?", rows)
+        self.conn.execute("UPDATE runs SET done = done + ?, updated = ? WHERE run_id = ?",
+                          (sum(row[0] for row in rows), time.time(), self.run_id))
+        self.conn.commit()
+
+    def _end(self, run_id, state):
+        self.conn.execute("UPDATE runs SET state = ?, updated = ? WHERE run_id = ?",
+                          (state, time.time(), run_id))
+        self.conn.execute("DELETE FROM files WHERE run_id = ?", (run_id,))
+        self.conn.commit()
+
+    def finish(self):
+        """
+        Mark the current run finished, or, if files failed or timed out and
+        are still to try, keep it resumable with just those files listed.
+        Returns True if the run finished.
+        """
+        if self.conn.execute("SELECT 1 FROM files WHERE run_id = ? AND done = 0 LIMIT 1",
+                             (self.run_id,)).fetchone():
+            self.conn.execute("DELETE FROM files WHERE run_id = ? AND done = 1", (self.run_id,))
+            self.conn.execute("UPDATE runs SET updated = ? WHERE run_id = ?", (time.time(), self.run_id))
+            self.conn.commit()
+            return False
+        self._end(self.run_id, RUN_FINISHED)
+        return True
+
+    def abandon(self, run_id):
+        """Give up on an unfinished run so it is no longer offered for resuming"""
+        self._end(run_id, RUN_ABANDONED)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,307 @@
+"""
+Headless command-line batch mode for Document Processor Pro
+
+    python -m docprocessor FOLDER [-o OUTPUT] [-w WORKERS] [--rules RULES.json]
+    python -m docprocessor FOLDER --watch
+    python -m docprocessor FOLDER -o rows.sqlite --also rows.csv --also - --summary run.json
+    python -m docprocessor /mnt/share/letters -o /mnt/share/out.xlsx --shared
+
+Progress goes to stderr and a JSON summary of the run to stdout (or --summary),
+so the command can be scheduled from cron or Task Scheduler. In --watch mode
+one summary line is written per batch until the process is stopped.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import signal
+import sys
+import threading
+
+from .address import DUPLICATE_MODES, DUPLICATES_FLAG
+from .checkpoint import RunCheckpoint, checkpoint_path_for, RUN_RUNNING
+from .core import process_documents
+from .discovery import DEFAULT_INCLUDE, DEFAULT_EXCLUDE, QUEUE_DIR
+from .engine import default_worker_count, DEFAULT_WORKER_MEMORY_MB
+from .rules import DEFAULT_RULES, load_rules
+from .shards import DEFAULT_SHARD_ROWS, ROLLOVER_MODES, ROLLOVER_WORKBOOK
+from .sinks import STDOUT, sink_format, FORMAT_XLSX, FORMAT_PARQUET
+from .watch import watch_folder, DEFAULT_POLL_SECONDS, DEFAULT_SETTLE_SECONDS
+from .watchdog import DEFAULT_DOCUMENT_TIMEOUT, DEFAULT_DOCUMENT_CPU_SECONDS
+from .workqueue import run_shared, DEFAULT_BATCH_FILES
+
+
+# Exit codes
+EXIT_OK = 0
+EXIT_DOCUMENT_ERRORS = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+
+
+class UsageError(Exception):
+    """The command line asks for something that cannot be done; nothing has been written"""
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m docprocessor",
+        description="Extract address blocks from a folder of PDF letters into Excel.")
+    parser.add_argument("folder", help="folder containing the PDF files")
+    parser.add_argument("-o", "--output", default="extracted_data.xlsx",
+                        help="file to write: .xlsx, .csv, .ndjson, .sqlite or .parquet (a folder of "
+                             "part files); run files such as the cache are kept next to it "
+                             "(default: %(default)s)")
+    parser.add_argument("--also", action="append", default=[], metavar="PATH",
+                        help="also write every row to this output, in the format given by its "
+                             "extension; '-' writes NDJSON to stdout (repeatable)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="also process PDFs in subfolders; their rows are named by the "
+                             "path below FOLDER, e.g. 2024/letter.pdf")
+    parser.add_argument("--include", action="append", metavar="PATTERN",
+                        help="only process files matching this pattern, ignoring case; patterns "
+                             "with a '/' match the path below FOLDER (default: *.pdf, repeatable)")
+    parser.add_argument("--exclude", action="append", metavar="PATTERN",
+                        help="skip files and folders matching this pattern (default: "
+                             f"{', '.join(DEFAULT_EXCLUDE)}, repeatable)")
+    parser.add_argument("-w", "--workers", type=int, default=default_worker_count(),
+                        help="extraction worker processes (default: %(default)s)")
+    parser.add_argument("--worker-memory", type=int, default=DEFAULT_WORKER_MEMORY_MB, metavar="MB",
+                        help="replace the worker processes when one grows past this many MB "
+                             "resident, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--doc-timeout", type=float, default=DEFAULT_DOCUMENT_TIMEOUT, metavar="SECONDS",
+                        help="give up on a PDF that takes longer than this and move it to a "
+                             "quarantine folder next to it, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--doc-cpu", type=float, default=DEFAULT_DOCUMENT_CPU_SECONDS, metavar="SECONDS",
+                        help="likewise for CPU time spent on one PDF (default: %(default)s)")
+    parser.add_argument("--rules", help="JSON rule set with the markers to extract between")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream rows to dated, sharded workbooks instead of appending; a run "
+                             "continues the last workbook while it has room")
+    parser.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS,
+                        help="rows per shard in --stream mode (default: %(default)s)")
+    parser.add_argument("--shard-rollover", choices=ROLLOVER_MODES, default=ROLLOVER_WORKBOOK,
+                        help="what a full shard rolls over to in --stream mode: a new dated "
+                             "workbook, or a new sheet in the same workbook until it reaches "
+                             "about 50 MB (default: %(default)s)")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="finish an interrupted run (its run_id is in the log and summary), "
+                             "extracting only the files it had not done; files that failed "
+                             "are tried again")
+    parser.add_argument("--shared", action="store_true",
+                        help="work through the folder together with other workstations running "
+                             "the same command; one of them writes the output")
+    parser.add_argument("--queue-dir", metavar="DIR",
+                        help=f"folder for the --shared work queue (default: FOLDER/{QUEUE_DIR})")
+    parser.add_argument("--batch-files", type=int, default=DEFAULT_BATCH_FILES, metavar="N",
+                        help="PDFs claimed at a time in --shared mode (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse every PDF even if it is in the extraction cache")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and process PDFs as they arrive in the folder")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS,
+                        help="seconds between folder checks in --watch mode (default: %(default)s)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="seconds a file's size must stay unchanged before it is "
+                             "processed in --watch mode (default: %(default)s)")
+    parser.add_argument("--duplicates", choices=DUPLICATE_MODES, default=DUPLICATES_FLAG,
+                        help="letters to a recipient already processed, in this or an earlier "
+                             "run: list them in the summary (flag), also leave them out of the "
+                             "workbook (skip), or don't check (off) (default: %(default)s)")
+    parser.add_argument("--summary", help="write the JSON summary to this file instead of stdout")
+    parser.add_argument("--metrics-textfile",
+                        help="also write the run's Prometheus metrics to this file, e.g. in the "
+                             "node exporter textfile directory (a .prom file)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print progress")
+    return parser
+
+
+def check_arguments(args):
+    """Raise UsageError for a folder, output or run ID that cannot be used, before anything is written"""
+    if not os.path.isdir(args.folder):
+        raise UsageError(f"PDF folder does not exist: {args.folder}")
+    for path in [args.output] + [path for path in args.also if path != STDOUT]:
+        if os.path.isdir(path) and sink_format(path) != FORMAT_PARQUET:
+            raise UsageError(f"Output {path} is a folder, not a file.")
+        if args.stream and sink_format(path) != FORMAT_XLSX and path == args.output:
+            raise UsageError(f"Streaming to dated workbooks needs an .xlsx output, not {path}.")
+        if sink_format(path) == FORMAT_PARQUET and importlib.util.find_spec('pyarrow') is None:
+            raise UsageError("Parquet output needs pyarrow (pip install pyarrow).")
+    if args.resume:
+        run = None
+        if os.path.exists(checkpoint_path_for(args.output)):
+            checkpoint = RunCheckpoint(checkpoint_path_for(args.output))
+            try:
+                run = checkpoint.run(args.resume)
+            finally:
+                checkpoint.close()
+        if run is None:
+            raise UsageError(f"No run {args.resume} is recorded for {args.output}.")
+        if run['state'] != RUN_RUNNING:
+            raise UsageError(f"Run {args.resume} is {run['state']} and cannot be resumed.")
+        if run['folder'] and os.path.abspath(args.folder) != run['folder']:
+            raise UsageError(f"Run {args.resume} was over {run['folder']}, not {os.path.abspath(args.folder)}.")
+
+
+def _failed(error, summary_path):
+    """Report a run that stopped on an error other than a usage error"""
+    _write_summary({'status': 'failed', 'error': str(error)}, summary_path)
+    print(f"An error occurred: {error}", file=sys.stderr)
+    return EXIT_FAILED
+
+
+def _interrupted(args):
+    """Report a batch run stopped with Ctrl-C, with the run ID that finishes it"""
+    run_id = args.resume
+    if run_id is None and os.path.exists(checkpoint_path_for(args.output)):
+        checkpoint = RunCheckpoint(checkpoint_path_for(args.output))
+        try:
+            run = checkpoint.unfinished(args.folder)
+            run_id = run['run_id'] if run is not None else None
+        finally:
+            checkpoint.close()
+    _write_summary({'status': 'interrupted', 'run_id': run_id}, args.summary)
+    print("Interrupted.", file=sys.stderr)
+    if run_id is not None:
+        print(f"Rows saved so far are kept; finish the run with --resume {run_id}", file=sys.stderr)
+    return EXIT_FAILED
+
+
+def _write_summary(summary, path):
+    text = json.dumps(summary, indent=2)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def run_watch(args, rules, log):
+    """Watch the folder until interrupted, printing one JSON line per batch"""
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    def write_line(summary):
+        line = json.dumps(summary)
+        if args.summary:
+            with open(args.summary, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+        else:
+            print(line, flush=True)
+
+    def on_batch(summary):
+        summary['status'] = 'ok' if not summary['errors'] else 'document_errors'
+        write_line(summary)
+
+    try:
+        watch_folder(args.folder, args.output, workers=args.workers, rules=rules,
+                     use_cache=not args.no_cache, poll_seconds=args.poll,
+                     settle_seconds=args.settle, log=log, on_batch=on_batch,
+                     stop_event=stop_event, metrics_textfile=args.metrics_textfile,
+                     duplicates=args.duplicates, worker_memory_mb=args.worker_memory,
+                     document_timeout=args.doc_timeout, document_cpu_seconds=args.doc_cpu,
+                     include=args.include, exclude=args.exclude, outputs=args.also)
+    except Exception as e:
+        write_line({'status': 'failed', 'error': str(e)})
+        print(f"An error occurred: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def run_shared_mode(args, rules, log):
+    """Take part in a shared run until the folder is done, then print this workstation's summary"""
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        summary = run_shared(args.folder, args.output, queue_dir=args.queue_dir, workers=args.workers,
+                             rules=rules, streaming=args.stream, shard_rows=args.shard_rows, log=log,
+                             metrics_textfile=args.metrics_textfile, duplicates=args.duplicates,
+                             worker_memory_mb=args.worker_memory, document_timeout=args.doc_timeout,
+                             document_cpu_seconds=args.doc_cpu, recursive=args.recursive,
+                             include=args.include, exclude=args.exclude, outputs=args.also,
+                             batch_files=args.batch_files, stop_event=stop_event,
+                             shard_rollover=args.shard_rollover)
+    except Exception as e:
+        return _failed(e, args.summary)
+
+    summary['status'] = 'ok' if not summary['errors'] else 'document_errors'
+    _write_summary(summary, args.summary)
+    if summary['errors']:
+        print(f"Try the files that failed again with --resume {summary['run_id']}", file=sys.stderr)
+    return EXIT_OK if not summary['errors'] else EXIT_DOCUMENT_ERRORS
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.watch and args.stream:
+        parser.error("--watch appends to a single workbook and cannot be combined with --stream")
+    if args.output == STDOUT:
+        parser.error("-o needs a file, since run files are kept next to it; use --also - for stdout")
+    if STDOUT in args.also and not args.summary:
+        parser.error("--also - writes rows to stdout, so --summary FILE is needed for the run summary")
+    if args.watch and args.resume:
+        parser.error("--resume finishes a batch run and cannot be combined with --watch")
+    if args.watch and args.recursive:
+        parser.error("--watch only watches the top folder and cannot be combined with --recursive")
+    if args.shared and (args.watch or args.resume):
+        parser.error("--shared cannot be combined with --watch or --resume")
+    if args.shared and args.no_cache:
+        parser.error("--shared never uses the extraction cache, so --no-cache has no effect with it")
+    if args.queue_dir and not args.shared:
+        parser.error("--queue-dir is only used with --shared")
+    args.include = tuple(args.include or DEFAULT_INCLUDE)
+    args.exclude = tuple(args.exclude or DEFAULT_EXCLUDE)
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    try:
+        rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+    except (OSError, ValueError) as e:
+        print(f"Could not load rule set {args.rules}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    try:
+        check_arguments(args)
+    except UsageError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.watch:
+        return run_watch(args, rules, log)
+
+    if args.shared:
+        return run_shared_mode(args, rules, log)
+
+    try:
+        summary = process_documents(args.folder, args.output, workers=args.workers, rules=rules,
+                                    streaming=args.stream, shard_rows=args.shard_rows,
+                                    use_cache=not args.no_cache, log=log,
+                                    metrics_textfile=args.metrics_textfile,
+                                    duplicates=args.duplicates, worker_memory_mb=args.worker_memory,
+                                    document_timeout=args.doc_timeout,
+                                    document_cpu_seconds=args.doc_cpu, recursive=args.recursive,
+                                    include=args.include, exclude=args.exclude,
+                                    outputs=args.also, resume_run=args.resume,
+                                    shard_rollover=args.shard_rollover)
+    except KeyboardInterrupt:
+        return _interrupted(args)
+    except Exception as e:
+        return _failed(e, args.summary)
+
+    summary['status'] = 'ok' if not summary['errors'] else 'document_errors'
+    _write_summary(summary, args.summary)
+    if summary['errors']:
+        print(f"Try the files that failed again with --resume {summary['run_id']}", file=sys.stderr)
+    return EXIT_OK if not summary['errors'] else EXIT_DOCUMENT_ERRORS
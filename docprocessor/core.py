@@ -0,0 +1,493 @@
+"""
+GUI-free processing pipeline for Document Processor Pro
+Used by the desktop app, the command line and anything else that needs a run
+"""
+import os
+import time
+from collections import deque
+
+from .address import (RecipientIndex, parse_address, recipient_index_path_for,
+                      DUPLICATES_OFF, DUPLICATES_FLAG, DUPLICATES_SKIP)
+from .cache import ExtractionCache
+from .checkpoint import RunCheckpoint, checkpoint_path_for
+from .discovery import FileIndex, file_index_path_for, row_name, DEFAULT_INCLUDE, DEFAULT_EXCLUDE
+from .engine import ExtractionEngine, DEFAULT_WORKER_MEMORY_MB
+from .extraction import STATUS_OK, STATUS_NO_MARKERS, STATUS_TIMEOUT
+from .metrics import RunMetrics, metrics_paths_for
+from .pagehints import PageHints
+from .rules import DEFAULT_RULES
+from .shards import StreamingWorkbookWriter, index_workbook_path_for, DEFAULT_SHARD_ROWS, ROLLOVER_WORKBOOK
+from .sinks import SinkGroup, open_sink, sink_format, FORMAT_XLSX
+from .watchdog import quarantine, DEFAULT_DOCUMENT_TIMEOUT, DEFAULT_DOCUMENT_CPU_SECONDS
+from .workbook import WorkbookWriter
+
+
+# With on_durable, queued rows are written at least this often so finished letters move on promptly
+DURABLE_FLUSH_ROWS = 25
+DURABLE_FLUSH_SECONDS = 2.0
+
+# Otherwise a checkpointed run writes them this often; each workbook flush
+# rewrites the sheet, so this bounds both the work a crash loses and the cost
+CHECKPOINT_FLUSH_ROWS = 1000
+CHECKPOINT_FLUSH_SECONDS = 30.0
+
+# Either way a flush waits at least this many times as long as the last one
+# took. An .xlsx flush rewrites the whole sheet, so on a large workbook rows
+# are saved less often rather than the run spending its time re-zipping it
+FLUSH_COST_RATIO = 10
+
+
+def _no_log(message):
+    pass
+
+
+def find_pdf_files(folder_path, recursive=False, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE,
+                   file_index=None):
+    """
+    Sorted list of the PDF files in a folder, and its subfolders if recursive.
+
+    Names are matched case-insensitively, so .PDF files are found too. Pass a
+    FileIndex to reuse (and refresh) an earlier listing of the folder instead.
+    """
+    if file_index is None:
+        file_index = FileIndex(folder_path, recursive, include, exclude)
+    return file_index.files()
+
+
+def extract_text_from_pdfs(folder_path, excel_path=None, workers=None, rules=DEFAULT_RULES,
+                           use_cache=True, on_record=None, log=_no_log, progress=None,
+                           metrics=None):
+    """Extract the address block from every PDF in folder_path; see extract_files"""
+    metrics = metrics if metrics is not None else RunMetrics()
+    with metrics.timer('discovery'):
+        pdf_files = find_pdf_files(folder_path)
+    return extract_files(pdf_files, excel_path, workers, rules, use_cache,
+                         on_record, log, progress=progress, metrics=metrics, root=folder_path)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def extract_files(pdf_files, excel_path=None, workers=None, rules=DEFAULT_RULES,
+                  use_cache=True, on_record=None, log=_no_log, executor=None, progress=None,
+                  metrics=None, on_finished=None, worker_memory_mb=DEFAULT_WORKER_MEMORY_MB,
+                  document_timeout=DEFAULT_DOCUMENT_TIMEOUT,
+                  document_cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS, root=None):
+    """
+    Extract the address block from each of the given PDF files.
+
+    Successful records are handed to on_record in file order as they are
+    extracted, and every record, whatever its status, to on_finished after
+    that. Returns a dict of counts for the run. Page hints and the
+    extraction cache are kept next to excel_path when it is given. Each
+    finished file is counted on `progress` (a ProgressTracker) and its stage
+    timings recorded on `metrics` (a RunMetrics) if given. Worker processes
+    are replaced when one grows past worker_memory_mb (0 for no limit).
+
+    A document that takes longer than document_timeout seconds, or more than
+    document_cpu_seconds of CPU, is abandoned (its worker killed if need be)
+    and moved to the quarantine folder next to it, so it does not stall this
+    or later runs. It is counted as an error and listed under 'quarantined'.
+
+    Each record's 'file' is its path below root (see row_name), which is
+    what rows, the recipient index and metrics are keyed by.
+    """
+    stats = {
+        'files': 0,
+        'extracted': 0,
+        'no_markers': 0,
+        'errors': 0,
+        'error_files': [],
+        'templates': {},
+        'cache': None,
+        'timeouts': 0,
+        'quarantined': [],
+        'workers_over_memory': 0,
+        'worker_recycles': 0,
+        'worker_crashes': 0,
+        'pool_broken': False,
+    }
+
+    stats['files'] = len(pdf_files)
+    if progress is not None:
+        progress.start(len(pdf_files), "Extracting")
+
+    if not pdf_files:
+        log("No PDF files found in the selected folder.")
+        return stats
+
+    log(f"Found {len(pdf_files)} PDF files to process.")
+
+    # Remembered marker pages let workers skip straight to the address block
+    page_hints = PageHints(excel_path + ".pagehints.json" if excel_path else None)
+    for template, hint in page_hints.for_rules(rules):
+        log(f"Trying pages {hint[0] + 1}-{hint[1] + 1} first for {template} (learned from previous runs).")
+
+    # Unchanged files are served from the cache next to the workbook
+    cache = None
+    if excel_path and use_cache:
+        try:
+            cache = ExtractionCache(excel_path + ".cache.sqlite", rules=rules)
+        except Exception as e:
+            log(f"⚠️ Extraction cache unavailable, parsing every file: {e}")
+
+    engine = ExtractionEngine(workers, page_hints=page_hints, cache=cache, rules=rules,
+                              executor=executor, metrics=metrics, worker_memory_mb=worker_memory_mb,
+                              document_timeout=document_timeout,
+                              document_cpu_seconds=document_cpu_seconds)
+    log(f"Using {engine.workers} extraction worker(s).")
+    multi_template = len(rules.templates) > 1
+
+    try:
+        # Records arrive in the same order as pdf_files
+        for record in engine.run(pdf_files):
+            filename = record['file'] = row_name(record['path'], root)
+
+            if record['status'] == STATUS_OK:
+                stats['extracted'] += 1
+                template = record.get('template')
+                stats['templates'][template] = stats['templates'].get(template, 0) + 1
+                if on_record is not None:
+                    on_record(record)
+                if multi_template:
+                    log(f"Successfully extracted data from {filename} (template: {template})")
+                else:
+                    log(f"Successfully extracted data from {filename}")
+            elif record['status'] == STATUS_NO_MARKERS:
+                stats['no_markers'] += 1
+                log(f"Could not find data markers in {filename}")
+            elif record['status'] == STATUS_TIMEOUT:
+                stats['errors'] += 1
+                stats['timeouts'] += 1
+                stats['error_files'].append({'file': filename, 'error': record['error']})
+                log(f"⏱️ Gave up on {filename}: {record['error']}")
+            else:
+                stats['errors'] += 1
+                stats['error_files'].append({'file': filename, 'error': record['error']})
+                log(f"Error processing {filename}: {record['error']}")
+
+            if progress is not None:
+                progress.advance(record['status'], _file_size(record['path']))
+            if metrics is not None:
+                metrics.observe_record(record)
+            if record['status'] == STATUS_TIMEOUT:
+                moved_to = quarantine(record['path'])
+                record['quarantined_to'] = moved_to
+                stats['quarantined'].append({'file': filename, 'reason': record['error'], 'moved_to': moved_to})
+                log(f"   Moved to {moved_to}" if moved_to else f"   Could not move {filename} to quarantine")
+            if on_finished is not None:
+                on_finished(record)
+    finally:
+        if cache is not None:
+            log(cache.summary())
+            stats['cache'] = cache.stats()
+            cache.close()
+        stats['workers_over_memory'] = engine.over_memory
+        stats['worker_recycles'] = engine.recycled
+        stats['worker_crashes'] = engine.crashed
+        stats['pool_broken'] = engine.pool_broken
+        if engine.recycled:
+            log(f"♻️ Replaced the worker pool {engine.recycled} time(s) after a worker "
+                f"went over {worker_memory_mb} MB.")
+
+    return stats
+
+
+def open_output_writer(excel_path, streaming=False, shard_rows=DEFAULT_SHARD_ROWS, log=_no_log,
+                       outputs=(), shard_rollover=ROLLOVER_WORKBOOK):
+    """
+    Open the writer for the selected output mode.
+
+    excel_path is usually a workbook, but a .csv, .ndjson, .sqlite or
+    .parquet path writes that format instead. Each of `outputs` is opened as
+    well and gets every row, and a SinkGroup over all of them is returned.
+    """
+    if streaming:
+        if shard_rollover == ROLLOVER_WORKBOOK:
+            log(f"Streaming rows to dated workbooks of up to {shard_rows} rows.")
+        else:
+            log(f"Streaming rows to dated workbooks, starting a new sheet every {shard_rows} rows.")
+        writer = open_sink(excel_path, streaming, shard_rows, shard_rollover)
+    elif sink_format(excel_path) != FORMAT_XLSX:
+        log(f"Writing {sink_format(excel_path).upper()} rows to {excel_path}")
+        writer = open_sink(excel_path)
+    else:
+        if os.path.exists(excel_path):
+            log(f"Appending to existing Excel file: {excel_path}")
+        else:
+            log(f"Created new Excel file: {excel_path}")
+
+        writer = WorkbookWriter(excel_path)
+        if writer.rebuilt:
+            log("Rebuilt the row index from the Excel file (it was changed outside the app).")
+
+    if not outputs:
+        return writer
+    sinks = [writer]
+    try:
+        for path in outputs:
+            log(f"Also writing {sink_format(path).upper()} rows to {path}")
+            sinks.append(open_sink(path))
+    except BaseException:
+        SinkGroup(sinks).close()
+        raise
+    return SinkGroup(sinks)
+
+
+def check_recipient(recipients, record, log=_no_log):
+    """
+    Look the record's recipient up in a RecipientIndex; returns the file of
+    an earlier letter to the same recipient (also set as record['duplicate_of']), or None.
+    """
+    # Records served from the extraction cache were not parsed by a worker
+    recipient = record.get('recipient') or parse_address(record['data'])
+    first_file = recipients.check(recipient, record['file']) if recipient else None
+    if first_file is not None:
+        record['duplicate_of'] = first_file
+        log(f"⚠️ {record['file']} is addressed to the same recipient as {first_file}")
+    return first_file
+
+
+def process_documents(folder_path, excel_path, workers=None, rules=DEFAULT_RULES,
+                      streaming=False, shard_rows=DEFAULT_SHARD_ROWS, use_cache=True,
+                      log=_no_log, progress=None, metrics_textfile=None,
+                      duplicates=DUPLICATES_FLAG, worker_memory_mb=DEFAULT_WORKER_MEMORY_MB,
+                      document_timeout=DEFAULT_DOCUMENT_TIMEOUT,
+                      document_cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS,
+                      recursive=False, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, file_index=None,
+                      outputs=(), resume_run=None, shard_rollover=ROLLOVER_WORKBOOK):
+    """
+    Extract every PDF in folder_path and write the results to excel_path.
+
+    Returns a JSON-serialisable summary of the run. Raises ValueError for bad
+    inputs; any other exception means the run was aborted. Stage metrics are
+    written next to the workbook, and the Prometheus textfile also to
+    metrics_textfile when given. Letters to a recipient already processed
+    are listed in the summary (DUPLICATES_FLAG), left out of the workbook as
+    well (DUPLICATES_SKIP), or not checked (DUPLICATES_OFF).
+
+    PDFs are found with the include and exclude patterns, in subfolders too
+    if recursive. The listing is kept next to the workbook so the next run
+    only lists folders that changed; a caller's file_index is used instead.
+
+    Rows also go to every path in outputs (see open_output_writer); the
+    sidecar files of the run are kept next to excel_path.
+
+    Every run is checkpointed in <excel>.runs.sqlite under the run_id given
+    in the summary. Pass that ID as resume_run to finish an interrupted run,
+    or one that left files failed or timed out, over the same folder: the
+    folder is not listed again and only the files the run had not finished
+    are extracted.
+    """
+    if not folder_path:
+        raise ValueError("Please select a PDF folder.")
+    if not excel_path:
+        raise ValueError("Please specify an Excel file.")
+    if not os.path.isdir(folder_path):
+        raise ValueError("PDF folder does not exist.")
+
+    log("Starting document processing...")
+    metrics = RunMetrics()
+    checkpoint = RunCheckpoint(checkpoint_path_for(excel_path))
+    try:
+        if resume_run:
+            pdf_files = checkpoint.resume(resume_run, folder_path)
+            log(f"Resuming run {resume_run}: {checkpoint.resumed_files} file(s) already done, "
+                f"{len(pdf_files)} to go.")
+        else:
+            if file_index is None:
+                file_index = FileIndex(folder_path, recursive, include, exclude,
+                                       path=file_index_path_for(excel_path))
+            with metrics.timer('discovery'):
+                pdf_files = find_pdf_files(folder_path, file_index=file_index)
+            metrics.count("folders_listed", file_index.listed)
+            checkpoint.start(pdf_files, folder_path)
+            log(f"Run {checkpoint.run_id} started; it can be resumed by that ID if it is interrupted.")
+        summary = process_files(pdf_files, excel_path, workers, rules,
+                                streaming, shard_rows, use_cache, log, progress=progress,
+                                metrics=metrics, metrics_textfile=metrics_textfile,
+                                duplicates=duplicates, worker_memory_mb=worker_memory_mb,
+                                document_timeout=document_timeout,
+                                document_cpu_seconds=document_cpu_seconds, outputs=outputs,
+                                checkpoint=checkpoint, root=folder_path,
+                                shard_rollover=shard_rollover)
+    finally:
+        checkpoint.close()
+    summary['folder'] = os.path.abspath(folder_path)
+    return summary
+
+
+def process_files(pdf_files, excel_path, workers=None, rules=DEFAULT_RULES,
+                  streaming=False, shard_rows=DEFAULT_SHARD_ROWS, use_cache=True,
+                  log=_no_log, executor=None, progress=None, metrics=None,
+                  metrics_textfile=None, duplicates=DUPLICATES_FLAG, on_durable=None,
+                  worker_memory_mb=DEFAULT_WORKER_MEMORY_MB, document_timeout=DEFAULT_DOCUMENT_TIMEOUT,
+                  document_cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS, outputs=(), checkpoint=None,
+                  root=None, shard_rollover=ROLLOVER_WORKBOOK):
+    """
+    Extract the given PDF files and write the results to excel_path; returns a summary.
+
+    Rows are keyed by each file's path below root, the folder the files were
+    found in (see row_name).
+
+    on_durable(record) is called for every record, in file order, once its
+    row is saved on disk (or straight away if it has no row). Queued rows are
+    then written every DURABLE_FLUSH_ROWS rows or DURABLE_FLUSH_SECONDS.
+    No flush starts until FLUSH_COST_RATIO times the last one's duration has
+    passed, so flushing a large workbook takes a bounded share of the run.
+
+    With a started or resumed RunCheckpoint, each record's file is marked
+    done at the same point, and the run is marked finished at the end unless
+    files failed or timed out, which leaves it to be resumed for them. Rows
+    are written at least every CHECKPOINT_FLUSH_ROWS rows or
+    CHECKPOINT_FLUSH_SECONDS, so a crash loses no more than that.
+    """
+    started = time.time()
+    metrics = metrics if metrics is not None else RunMetrics()
+    with metrics.timer('workbook_open'):
+        writer = open_output_writer(excel_path, streaming, shard_rows, log, outputs, shard_rollover)
+
+    recipients = None
+    duplicate_recipients = []
+    if duplicates != DUPLICATES_OFF:
+        recipients = RecipientIndex(recipient_index_path_for(excel_path))
+
+    def write_record(record):
+        if recipients is not None:
+            first_file = check_recipient(recipients, record, log)
+            if first_file is not None:
+                duplicate_recipients.append({'file': record['file'], 'duplicate_of': first_file})
+                if duplicates == DUPLICATES_SKIP:
+                    return
+
+        with metrics.timer('workbook_append'):
+            writer.add(record['file'], record['sha256'], record['data'])
+
+    # Records waiting for their row to reach the disk, with the number of rows added up to them
+    awaiting = deque()
+    # Time of the last flush, rows added by then, and how long it took
+    last_flush = [time.monotonic(), 0, 0.0]
+    if on_durable is not None:
+        flush_rows, flush_seconds = DURABLE_FLUSH_ROWS, DURABLE_FLUSH_SECONDS
+    else:
+        flush_rows, flush_seconds = CHECKPOINT_FLUSH_ROWS, CHECKPOINT_FLUSH_SECONDS
+
+    # Durable records not yet marked done in the checkpoint, which is committed once per flush
+    done = []
+
+    def release(commit=False, notify=True):
+        durable = []
+        while awaiting and awaiting[0][0] <= writer.rows_saved:
+            durable.append(awaiting.popleft()[1])
+        if checkpoint is not None:
+            done.extend(durable)
+            if commit:
+                checkpoint.mark_done(done)
+                done.clear()
+        if on_durable is not None and notify:
+            for record in durable:
+                on_durable(record)
+
+    def finish_record(record):
+        awaiting.append((writer.rows_added, record))
+        since = time.monotonic() - last_flush[0]
+        flushed = (since >= last_flush[2] * FLUSH_COST_RATIO
+                   and (writer.rows_added - last_flush[1] >= flush_rows or since >= flush_seconds))
+        if flushed:
+            flush_started = time.monotonic()
+            with metrics.timer('workbook_flush'):
+                writer.flush()
+            now = time.monotonic()
+            last_flush[:] = [now, writer.rows_added, now - flush_started]
+        release(flushed)
+
+    # Extract text from PDFs, handing each record to the writer as it arrives
+    completed = False
+    try:
+        stats = extract_files(pdf_files, excel_path, workers, rules, use_cache,
+                              on_record=write_record, log=log, executor=executor,
+                              progress=progress, metrics=metrics,
+                              on_finished=finish_record if on_durable is not None or checkpoint is not None else None,
+                              worker_memory_mb=worker_memory_mb,
+                              document_timeout=document_timeout,
+                              document_cpu_seconds=document_cpu_seconds, root=root)
+        if stats['extracted']:
+            log("Writing extracted data to Excel...")
+        completed = True
+    finally:
+        try:
+            with metrics.timer('workbook_close'):
+                counts = writer.close()
+        finally:
+            if recipients is not None:
+                recipients.close()
+            if not completed and checkpoint is not None:
+                # Whatever reached the output before the run was interrupted need not be redone
+                try:
+                    release(commit=True, notify=False)
+                except Exception as e:
+                    log(f"⚠️ Could not checkpoint the files already saved: {e}")
+    if completed and (on_durable is not None or checkpoint is not None):
+        release(commit=True)
+        if checkpoint is not None and not checkpoint.finish():
+            log(f"Run {checkpoint.run_id} left files that failed or timed out; "
+                f"resume it to try them again.")
+
+    summary = {
+        'folder': None,
+        'output': os.path.abspath(excel_path),
+        'workers': workers,
+        'rules': rules.name,
+        'streaming': bool(streaming),
+        'rows': counts,
+        'shards': [],
+        'shard_index': None,
+        'outputs': [],
+        'run_id': checkpoint.run_id if checkpoint is not None else None,
+        'resumed_files': checkpoint.resumed_files if checkpoint is not None else 0,
+        'elapsed_seconds': 0.0,
+        'metrics': None,
+        'duplicate_recipients': duplicate_recipients,
+        'duplicates_skipped': len(duplicate_recipients) if duplicates == DUPLICATES_SKIP else 0,
+    }
+    summary.update(stats)
+
+    group = writer if isinstance(writer, SinkGroup) else SinkGroup([writer])
+    summary['outputs'] = group.outputs()
+    if isinstance(group.primary, StreamingWorkbookWriter) and group.primary.shards_written:
+        summary['shards'] = [os.path.abspath(path) for path in group.primary.shards_written]
+        summary['shard_index'] = os.path.abspath(index_workbook_path_for(excel_path))
+
+    summary['metrics'] = export_metrics(metrics, writer, summary, excel_path, metrics_textfile, log)
+    summary['elapsed_seconds'] = round(time.time() - started, 3)
+    return summary
+
+
+def export_metrics(metrics, writer, summary, excel_path, metrics_textfile=None, log=_no_log):
+    """Finish the run's metrics and write the report files; returns the JSON report path"""
+    for stage, seconds in writer.timings.items():
+        if seconds:
+            metrics.observe(f"workbook_{stage}", seconds)
+    for outcome, count in summary['rows'].items():
+        metrics.count(f"rows_{outcome}", count)
+    for name, count in (summary['cache'] or {}).items():
+        metrics.count(f"cache_{name}", count)
+    metrics.count("duplicate_recipients", len(summary['duplicate_recipients']))
+    metrics.count("worker_recycles", summary['worker_recycles'])
+    metrics.count("worker_crashes", summary['worker_crashes'])
+    metrics.count("quarantined", len(summary['quarantined']))
+    metrics.finish()
+
+    json_path, prom_path = metrics_paths_for(excel_path)
+    try:
+        metrics.export(json_path, prom_path)
+        if metrics_textfile:
+            metrics.export(prom_path=metrics_textfile)
+    except OSError as e:
+        log(f"⚠️ Could not write run metrics: {e}")
+        return None
+    return os.path.abspath(json_path)
@@ -0,0 +1,219 @@
+"""
+PDF discovery for Document Processor Pro
+Lists the letters in a folder tree with os.scandir and remembers the listing between runs
+"""
+import fnmatch
+import json
+import os
+import threading
+import time
+
+from .watchdog import QUARANTINE_DIR
+
+
+DEFAULT_INCLUDE = ("*.pdf",)
+
+# Folder in a shared PDF folder that holds the work queue's leases and results (see workqueue)
+QUEUE_DIR = ".docqueue"
+
+# Quarantined PDFs sit in a folder next to the letters and must not be picked up
+# again, and the work queue's folder holds no letters
+DEFAULT_EXCLUDE = (QUARANTINE_DIR, QUEUE_DIR)
+
+# A directory listed this soon after it last changed could change again within
+# the same mtime tick (2 s on FAT and some shares), so it is listed again next time
+RACY_SECONDS = 2.0
+
+INDEX_VERSION = 1
+
+
+def file_index_path_for(excel_path):
+    """On-disk file index kept next to the workbook by command-line runs"""
+    return excel_path + ".files.json"
+
+
+def row_name(file_path, root=None):
+    """
+    Name a PDF is recorded under in the output, recipient index and metrics:
+    its path below root with '/' separators, so letters with the same name in
+    different subfolders stay apart. A file directly in root, or any file
+    when root is None, keeps its plain name, as it always has.
+    """
+    if root is None:
+        return os.path.basename(file_path)
+    try:
+        rel_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(root))
+    except ValueError:
+        # On another drive than root (Windows)
+        return os.path.basename(file_path)
+    if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+        return os.path.basename(file_path)
+    return rel_path.replace(os.sep, '/')
+
+
+def matches(rel_path, patterns):
+    """
+    True if rel_path matches any of the glob patterns, ignoring case.
+
+    Patterns with a '/' are matched against the path relative to the root
+    (with '/' separators); others against the file or folder name alone.
+    """
+    rel_path = rel_path.replace(os.sep, '/').lower()
+    name = rel_path.rsplit('/', 1)[-1]
+    for pattern in patterns:
+        pattern = pattern.replace(os.sep, '/').lower()
+        if fnmatch.fnmatchcase(rel_path if '/' in pattern else name, pattern):
+            return True
+    return False
+
+
+def list_directory(folder_path, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, rel_dir=''):
+    """
+    One os.scandir pass over a folder.
+
+    Returns ({name: (size, mtime_ns)} for matching files, [subfolder names
+    not excluded]). rel_dir is the folder's path relative to the root that
+    path patterns are matched against.
+    """
+    files = {}
+    dirs = []
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not matches(rel_path, exclude):
+                        dirs.append(entry.name)
+                elif entry.is_file() and matches(rel_path, include) and not matches(rel_path, exclude):
+                    # Free on Windows, where the listing already carries the file's attributes
+                    st = entry.stat()
+                    files[entry.name] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                # Removed while we were listing
+                continue
+    return files, sorted(dirs)
+
+
+class FileIndex:
+    """
+    Listing of the PDFs under a folder, refreshed incrementally.
+
+    Each directory's mtime is recorded with its listing. A refresh stats
+    every known directory but only lists again those whose mtime changed,
+    since adding, removing or renaming a file changes its directory's mtime.
+    An unchanged tree of any size therefore costs one stat per directory. A
+    file rewritten in place does not touch the directory, so the size and
+    mtime kept for it can be stale; callers that need them exact stat the
+    file themselves.
+
+    With a path, the index is also kept on disk and loaded by the next
+    process that lists the same folder with the same options. Processing and
+    printing share one index, so only the first action re-reads the folder.
+    Refreshes are serialised with a lock.
+    """
+
+    def __init__(self, root, recursive=False, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, path=None):
+        self.root = os.path.abspath(root)
+        self.recursive = bool(recursive)
+        self.include = tuple(include or DEFAULT_INCLUDE)
+        self.exclude = tuple(exclude if exclude is not None else DEFAULT_EXCLUDE)
+        self.path = path
+        # rel_dir -> {'mtime_ns', 'listed_at', 'files': {name: [size, mtime_ns]}, 'dirs': [names]}
+        self.dirs = {}
+        self.listed = 0
+        self._dirty = False
+        # Sorted paths as of the last refresh that changed anything
+        self._files = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def options(self):
+        return {'root': self.root, 'recursive': self.recursive,
+                'include': list(self.include), 'exclude': list(self.exclude)}
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # A damaged index only costs one full listing
+            return
+        if data.get('version') == INDEX_VERSION and data.get('options') == self.options():
+            self.dirs = data.get('dirs', {})
+
+    def save(self):
+        """Write the index if it changed; failures only cost the next process a full listing"""
+        if not self.path or not self._dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'version': INDEX_VERSION, 'options': self.options(), 'dirs': self.dirs}))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError:
+            pass
+
+    def _full_path(self, rel_dir):
+        return os.path.join(self.root, *rel_dir.split('/')) if rel_dir else self.root
+
+    def refresh(self):
+        """Bring the index up to date with the folder; returns the number of directories listed"""
+        with self._lock:
+            self.listed = 0
+            seen = set()
+            pending = ['']
+            now = time.time()
+            while pending:
+                rel_dir = pending.pop()
+                try:
+                    mtime_ns = os.stat(self._full_path(rel_dir)).st_mtime_ns
+                except OSError:
+                    continue
+                seen.add(rel_dir)
+                known = self.dirs.get(rel_dir)
+                if known is None or known['mtime_ns'] != mtime_ns or \
+                        known['listed_at'] - mtime_ns / 1e9 < RACY_SECONDS:
+                    try:
+                        files, dirs = list_directory(self._full_path(rel_dir), self.include,
+                                                     self.exclude, rel_dir)
+                    except OSError:
+                        continue
+                    known = self.dirs[rel_dir] = {
+                        'mtime_ns': mtime_ns, 'listed_at': now,
+                        'files': {name: list(stat) for name, stat in files.items()}, 'dirs': dirs,
+                    }
+                    self.listed += 1
+                    self._dirty = True
+                    self._files = None
+                if self.recursive:
+                    pending.extend(f"{rel_dir}/{name}" if rel_dir else name for name in known['dirs'])
+
+            for rel_dir in [d for d in self.dirs if d not in seen]:
+                del self.dirs[rel_dir]
+                self._dirty = True
+                self._files = None
+            self.save()
+            return self.listed
+
+    def entries(self):
+        """{path: (size, mtime_ns)} for every matching file, as of the last refresh"""
+        with self._lock:
+            return {os.path.join(self._full_path(rel_dir), name): tuple(stat)
+                    for rel_dir, listing in self.dirs.items()
+                    for name, stat in listing['files'].items()}
+
+    def files(self):
+        """Refresh and return the sorted paths of every matching file"""
+        self.refresh()
+        with self._lock:
+            if self._files is None:
+                files = []
+                for rel_dir, listing in self.dirs.items():
+                    folder = self._full_path(rel_dir)
+                    files.extend(os.path.join(folder, name) for name in listing['files'])
+                files.sort()
+                self._files = files
+            return list(self._files)
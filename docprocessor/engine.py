@@ -0,0 +1,355 @@
+"""
+Process-pool extraction engine for Document Processor Pro
+Spreads PDF parsing across CPU cores while keeping results in input order
+"""
+import os
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from .extraction import extract_document, STATUS_ERROR, STATUS_TIMEOUT
+from .rules import DEFAULT_RULES
+from .watchdog import (DocumentTimeout, worker_watchdog,
+                       DEFAULT_DOCUMENT_TIMEOUT, DEFAULT_DOCUMENT_CPU_SECONDS)
+
+
+# Chunks submitted ahead of the consumer, per worker; results beyond that wait to be asked for
+CHUNKS_AHEAD_PER_WORKER = 2
+
+# Resident memory a worker process may reach before the pool is replaced; 0 turns recycling off
+DEFAULT_WORKER_MEMORY_MB = 512
+
+
+def default_worker_count():
+    """Number of worker processes to use when none is configured"""
+    return max(1, os.cpu_count() or 1)
+
+
+def current_rss():
+    """Resident memory of this process in bytes, or None where it cannot be read"""
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return None
+
+    if os.name == 'nt':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.WorkingSetSize
+
+    # Elsewhere only the peak is available, which is enough to tell a worker has grown too large
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _timeout_record(file_path, reason, seconds=None):
+    record = dict(ExtractionEngine._error_record(file_path, reason), status=STATUS_TIMEOUT)
+    if seconds is not None:
+        record['timings'] = {'document': seconds}
+    return record
+
+
+def _extract_chunk(extract, files, memory_limit=None, budget=None):
+    """
+    Worker task: returns the chunk's records and whether this worker is now over memory_limit bytes.
+
+    With a (timeout, cpu_seconds) budget, each document is parsed under the
+    worker's watchdog and one that overruns comes back as a timeout record.
+    """
+    records = []
+    for file_path in files:
+        if budget is None:
+            records.append(extract(file_path))
+            continue
+        watchdog = worker_watchdog()
+        started = time.perf_counter()
+        try:
+            with watchdog.watch(*budget):
+                record = extract(file_path)
+        except DocumentTimeout:
+            record = _timeout_record(file_path, watchdog.reason or "went over its time budget",
+                                     time.perf_counter() - started)
+        records.append(record)
+    rss = current_rss() if memory_limit else None
+    return records, rss is not None and rss > memory_limit
+
+
+class ExtractionEngine:
+    """Runs extract_document over many files using a pool of worker processes"""
+
+    def __init__(self, workers=None, page_hints=None, cache=None, rules=DEFAULT_RULES,
+                 executor=None, metrics=None, worker_memory_mb=DEFAULT_WORKER_MEMORY_MB,
+                 document_timeout=DEFAULT_DOCUMENT_TIMEOUT,
+                 document_cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS):
+        self.workers = max(1, int(workers or default_worker_count()))
+        self.page_hints = page_hints
+        self.cache = cache
+        self.rules = rules
+        # A long-running caller can pass a warm pool to avoid paying worker start-up per run
+        self.executor = executor
+        # Optional RunMetrics for the hashing and cache lookup done in this process
+        self.metrics = metrics
+        self.memory_limit = int(worker_memory_mb * 1024 * 1024) if worker_memory_mb else None
+        # Chunks that left a worker over the memory limit, and pools replaced because of it
+        self.over_memory = 0
+        self.recycled = 0
+        # Wall-clock and CPU seconds each document may take; None parses without a watchdog
+        self.budget = (document_timeout, document_cpu_seconds) \
+            if document_timeout or document_cpu_seconds else None
+        # Worker processes lost while parsing, each blamed on the one document that took it down
+        self.crashed = 0
+        # Whether the caller's executor broke; the run moved to a pool of its own, but the caller must replace it
+        self.pool_broken = False
+
+    def chunk_size(self, file_count):
+        """Batch files per task so IPC overhead stays small on large runs"""
+        return max(1, min(32, file_count // (self.workers * 4)))
+
+    def _plan(self, pdf_files):
+        """
+        Split the run into cached results and documents that must be parsed.
+
+        Returns one (key, record) pair per file, where record is set for cache
+        hits, plus the ordered (key, file) list of unique documents to parse.
+        With a cache the key is the content hash, so identical files are only
+        parsed once.
+        """
+        plan = []
+        to_parse = []
+        hits = {}
+        seen = set()
+
+        for file_path in pdf_files:
+            if self.cache is None:
+                plan.append((file_path, None))
+                to_parse.append((file_path, file_path))
+                continue
+
+            started = time.perf_counter()
+            try:
+                key = self.cache.content_hash(file_path)
+            except OSError as e:
+                plan.append((None, self._error_record(file_path, e)))
+                continue
+
+            if key in seen:
+                self.cache.duplicates += 1
+                hit = hits.get(key)
+                if hit is not None:
+                    hit = dict(hit, file=os.path.basename(file_path), path=file_path)
+                plan.append((key, hit))
+                continue
+            seen.add(key)
+
+            hashed = time.perf_counter()
+            record = self.cache.lookup(key, file_path)
+            if self.metrics is not None:
+                self.metrics.observe('hash', hashed - started)
+                self.metrics.observe('cache_lookup', time.perf_counter() - hashed)
+            if record is None:
+                to_parse.append((key, file_path))
+            else:
+                hits[key] = record
+            plan.append((key, record))
+
+        return plan, to_parse
+
+    @staticmethod
+    def _error_record(file_path, error):
+        return {
+            'file': os.path.basename(file_path),
+            'path': file_path,
+            'status': STATUS_ERROR,
+            'data': None,
+            'error': str(error),
+            'marker_pages': None,
+            'template': None,
+            'pages_read': 0,
+            'page_count': 0,
+        }
+
+    def _extract_all(self, to_parse):
+        """Yield (key, record) for to_parse in order, in-process or on the pool"""
+        page_hints = self.page_hints.for_rules(self.rules) if self.page_hints else None
+        # Cached documents were hashed for the lookup; the others are hashed by the worker
+        extract = partial(extract_document, rules=self.rules, page_hints=page_hints,
+                          keep_pages=self.cache is not None, hash_file=self.cache is None)
+
+        # A single worker (or a single file) is cheaper to run in-process, but a
+        # document can only be killed when it is parsed in a process of its own
+        keys = [key for key, _ in to_parse]
+        files = [file_path for _, file_path in to_parse]
+        if self.budget is None and (self.workers == 1 or len(files) == 1):
+            results = map(extract, files)
+            yield from zip(keys, results)
+            return
+
+        # Results come back in submission order, which keeps the
+        # rows written to Excel identical to the serial path
+        yield from zip(keys, self._map_bounded(extract, files, self.executor))
+
+    def _map_bounded(self, extract, files, executor=None):
+        """
+        Like executor.map, but with at most CHUNKS_AHEAD_PER_WORKER chunks per
+        worker submitted ahead of the consumer. A slow consumer (the workbook,
+        or a printer further down a pipeline) holds the workers back instead of
+        letting finished records pile up in memory.
+
+        Without an executor the engine runs its own pool. When a worker reports
+        more than memory_limit resident after a chunk, the pool is drained and
+        replaced (ProcessPoolExecutor cannot replace a single worker), so a
+        worker's footprint is capped by configuration rather than by the
+        largest document it has parsed. A caller's executor is never replaced;
+        over_memory and pool_broken tell the caller to replace it between runs.
+
+        A worker that dies (killed by its watchdog, or crashed by a malformed
+        PDF) takes the pool down with it. The documents that were in flight
+        are then re-run one at a time, so only the one that kills its worker
+        is lost, and the run continues on a new pool of the engine's own.
+        """
+        owned = executor is None
+        pool_size = min(self.workers, len(files))
+        if owned:
+            executor = ProcessPoolExecutor(max_workers=pool_size)
+        chunk = self.chunk_size(len(files))
+        limit = self.workers * CHUNKS_AHEAD_PER_WORKER
+        window = deque()
+        state = {'recycle': False, 'broken': False}
+
+        def take():
+            future, chunk_files = window.popleft()
+            try:
+                records, over = future.result()
+            except BrokenProcessPool:
+                state['broken'] = True
+                # The window is drained before the pool is replaced, so this future came from the current one
+                self.pool_broken = self.pool_broken or not owned
+                return self._isolate(extract, chunk_files)
+            if over:
+                self.over_memory += 1
+                state['recycle'] = state['recycle'] or owned
+            return records
+
+        try:
+            for start in range(0, len(files), chunk):
+                chunk_files = files[start:start + chunk]
+                while True:
+                    if state['recycle'] or state['broken']:
+                        while window:
+                            yield from take()
+                        if owned:
+                            executor.shutdown()
+                        executor = ProcessPoolExecutor(max_workers=pool_size)
+                        owned = True
+                        if state['recycle']:
+                            self.recycled += 1
+                        state['recycle'] = state['broken'] = False
+                    try:
+                        window.append((executor.submit(_extract_chunk, extract, chunk_files,
+                                                       self.memory_limit, self.budget), chunk_files))
+                        break
+                    except BrokenProcessPool:
+                        state['broken'] = True
+                        self.pool_broken = self.pool_broken or not owned
+                if len(window) >= limit:
+                    yield from take()
+            while window:
+                yield from take()
+        finally:
+            for future, _ in window:
+                future.cancel()
+            if owned:
+                executor.shutdown()
+
+    def _isolate(self, extract, files):
+        """Re-run the documents of a chunk whose worker died, one per task; returns their records"""
+        records = []
+        executor = None
+        try:
+            for file_path in files:
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=1)
+                try:
+                    records += executor.submit(_extract_chunk, extract, [file_path],
+                                               None, self.budget).result()[0]
+                except BrokenProcessPool:
+                    self.crashed += 1
+                    executor.shutdown()
+                    executor = None
+                    records.append(_timeout_record(
+                        file_path, "its worker process died (killed after overrunning its budget, or crashed)"))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return records
+
+    def run(self, pdf_files):
+        """Yield one result record per file, in the same order as pdf_files"""
+        pdf_files = list(pdf_files)
+        if not pdf_files:
+            return
+
+        plan, to_parse = self._plan(pdf_files)
+        extracted = self._extract_all(to_parse)
+        parsed = {}
+        # Copies of each parsed document still to hand out; a result is dropped after its last one
+        uses = Counter(key for key, record in plan if record is None)
+        # Marker page ranges seen, by the template that matched
+        marker_pages = defaultdict(list)
+
+        try:
+            for file_path, (key, record) in zip(pdf_files, plan):
+                if record is None:
+                    # Parse results arrive in the order the plan first needed them
+                    while key not in parsed:
+                        result_key, result = next(extracted)
+                        if self.cache is not None:
+                            self.cache.store(result_key, result)
+                            result['sha256'] = result_key
+                        parsed[result_key] = result
+                    record = dict(parsed[key], file=os.path.basename(file_path), path=file_path)
+                    # Later copies of the same content were not parsed again
+                    parsed[key].pop('timings', None)
+                    uses[key] -= 1
+                    if not uses[key]:
+                        del parsed[key]
+
+                if record.get('marker_pages') and record.get('template'):
+                    marker_pages[record['template']].append(record['marker_pages'])
+                yield record
+        finally:
+            extracted.close()
+            if self.cache is not None:
+                self.cache.flush()
+
+        if self.page_hints:
+            # learn() for every template, not only up to the first that changed
+            learned = [self.page_hints.learn(pages, template) for template, pages in marker_pages.items()]
+            if any(learned):
+                try:
+                    self.page_hints.save()
+                except OSError:
+                    pass
@@ -0,0 +1,346 @@
+"""
+Per-document text extraction for Document Processor Pro
+Runs inside worker processes, so it must not import tkinter or Windows-only modules
+"""
+import hashlib
+import os
+import time
+from bisect import bisect_right
+
+from .address import parse_address
+from .rules import DEFAULT_RULES, compile_rules
+
+# Record statuses returned by extract_document
+STATUS_OK = "ok"
+STATUS_NO_MARKERS = "no_markers"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+
+# Bytes read at a time when hashing a document
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Longest address block kept: the most text an Excel cell can hold
+MAX_BLOCK_CHARS = 32767
+
+# Page text shipped back for the extraction cache, per document; huge statements keep only their first pages
+KEEP_PAGE_CHARS = 1024 * 1024
+
+# PyPDF2 keeps every object it has parsed; dropping them this often bounds memory on long documents
+RELEASE_OBJECTS_EVERY_PAGES = 50
+
+
+def slice_address_block(text, rules=DEFAULT_RULES):
+    """Return the address block between the sender and greeting markers, or None"""
+    scanner = MarkerScanner(rules)
+    scanner.feed(0, text)
+    return scanner.block()
+
+
+def _clean_block(raw, skip_lines):
+    """Drop blank lines and the header lines that follow the sender marker"""
+    lines = raw.split('\n')
+    lines = [line.strip() for line in lines if line.strip() != ""]
+    return '\n'.join(lines[skip_lines:]) if len(lines) > skip_lines else '\n'.join(lines)
+
+
+class MarkerScanner:
+    """
+    Streaming search for the sender and greeting markers over page texts.
+
+    Pages are fed in document order. Each page is searched once for the
+    markers of every template, and the scanner reports completion as soon as
+    no later page could change which template matches, so the caller can stop
+    extracting the rest of the document. Results match a search over the fully
+    concatenated text, including markers that straddle a page break.
+
+    Only the text that can end up in a block is kept: nothing before the first
+    sender marker, and no more than MAX_BLOCK_CHARS after the last one. Memory
+    stays small however many pages are fed.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = rules
+        self.markers = compile_rules(rules)
+        self.overlap = self.markers.overlap
+        # (offset, text) pieces of the fed text that a block could be cut from
+        self.kept = []
+        self.kept_to = 0
+        self.offsets = []
+        self.page_nums = []
+        self.length = 0
+        self.tail = ''
+        # First offset of each marker in the text fed so far
+        self.sender_at = {}
+        self.greeting_at = {}
+        self.template = None
+        self.start = -1
+        self.end = -1
+        self.start_page = None
+        self.end_page = None
+        self.decided = False
+
+    @property
+    def complete(self):
+        """True when some template's two markers have both been found"""
+        return self.template is not None
+
+    def feed(self, page_num, page_text):
+        """Add the next page's text; return True once later pages cannot change the match"""
+        window = self.tail + page_text
+        window_offset = self.length - len(self.tail)
+
+        self.offsets.append(self.length)
+        self.page_nums.append(page_num)
+        self.length += len(page_text)
+
+        self._find(self.markers.sender_re, self.markers.senders, self.sender_at, window, window_offset)
+        self._find(self.markers.greeting_re, self.markers.greetings, self.greeting_at, window, window_offset)
+        self._choose()
+        self._keep(window, window_offset)
+
+        self.tail = window[-self.overlap:] if self.overlap else ''
+        return self.decided
+
+    def _find(self, regex, markers, found, window, window_offset):
+        """Record the first offset of every marker in window not already found"""
+        pos = 0
+        while len(found) < len(markers):
+            match = regex.search(window, pos)
+            if match is None:
+                break
+            at = match.start()
+            for marker in self.markers.markers_at(markers, window, at):
+                found.setdefault(marker, window_offset + at)
+            # Step one character, not past the match, so markers inside it are still seen
+            pos = at + 1
+
+    def _keep(self, window, window_offset):
+        """Hold on to the part of window that a block starting at a sender found so far could use"""
+        if not self.sender_at:
+            return
+        first = min(self.sender_at.values()) + min(0, min(t.start_offset for t in self.markers.templates))
+        last = max(self.sender_at.values()) + max(t.start_offset for t in self.markers.templates) + MAX_BLOCK_CHARS
+        start = max(first, self.kept_to, window_offset)
+        end = min(last, window_offset + len(window))
+        if start < end:
+            self.kept.append((start, window[start - window_offset:end - window_offset]))
+            self.kept_to = end
+
+    def _choose(self):
+        best = None
+        for order, template in enumerate(self.markers.templates):
+            start = self.sender_at.get(template.sender_marker)
+            end = self.greeting_at.get(template.greeting_marker)
+            if start is not None and end is not None and (best is None or start < best[0]):
+                best = (start, order, end, template)
+        if best is None:
+            return
+
+        self.start, best_order, self.end, self.template = best
+        self.start_page = self._page_at(self.start)
+        self.end_page = self._page_at(self.end)
+
+        # Decided unless a template that would rank higher could still match
+        # once its greeting (or, for a sender not seen yet, both markers) turns
+        # up on a later page
+        self.decided = True
+        for order, template in enumerate(self.markers.templates):
+            if order == best_order or template.greeting_marker in self.greeting_at and \
+                    template.sender_marker in self.sender_at:
+                continue
+            start = self.sender_at.get(template.sender_marker)
+            if start is None:
+                # Earliest a sender still to come could start, given the carried-over tail
+                start = self.length - len(template.sender_marker) + 1
+            if (start, order) < (self.start, best_order):
+                self.decided = False
+                break
+
+    def _page_at(self, offset):
+        """Page number containing the given offset into the fed text"""
+        return self.page_nums[bisect_right(self.offsets, offset) - 1]
+
+    def block(self):
+        """Return the cleaned address block, or None if no template matched"""
+        if not self.complete:
+            return None
+        start = self.start + self.template.start_offset
+        end = min(self.end, start + MAX_BLOCK_CHARS)
+        text = ''.join(piece[max(0, start - offset):end - offset] for offset, piece in self.kept
+                       if offset < end and offset + len(piece) > start)
+        return _clean_block(text, self.template.skip_lines)
+
+    def template_name(self):
+        """Name of the matched template, or None"""
+        return self.template.name if self.complete else None
+
+    def marker_pages(self):
+        """Page range (first, last) that held the two markers"""
+        if not self.complete:
+            return None
+        return [min(self.start_page, self.end_page), max(self.start_page, self.end_page)]
+
+
+def _scan_hinted_pages(reader, page_text, template, page_hint, rules):
+    """Try a template's remembered page range; return a finished scanner or None"""
+    page_count = len(reader.pages)
+    first, last = page_hint
+    if first < 0 or first >= page_count:
+        return None
+    last = min(max(first, last), page_count - 1)
+
+    scanner = MarkerScanner(rules)
+    for page_num in range(first, last + 1):
+        scanner.feed(page_num, page_text(page_num))
+
+    # Only trust the hint when it yields a well-formed block of its own template
+    if scanner.complete and scanner.start < scanner.end and scanner.template_name() == template:
+        return scanner
+    return None
+
+
+def _release_objects(reader):
+    """Drop the objects PyPDF2 has parsed so far; any that are needed again are re-read from the file"""
+    resolved = getattr(reader, 'resolved_objects', None)
+    if resolved is not None:
+        resolved.clear()
+
+
+def scan_document(reader, page_hints=None, rules=DEFAULT_RULES, timings=None, keep_chars=None):
+    """
+    Extract page text only until both markers are found; return (scanner, pages_read, kept_pages).
+
+    page_hints is a list of (template name, [first, last]) page ranges, each
+    tried in turn before the whole document is scanned.
+
+    Pages are read one at a time and their text is let go once the scanner
+    has seen it. With keep_chars, kept_pages maps page number to text for the
+    pages read, in reading order, for as long as they fit in keep_chars
+    characters. Time spent in PyPDF2 text extraction is added to
+    timings['page_text'] when a timings dict is given.
+    """
+    read = set()
+    kept = {}
+    budget = [keep_chars]
+
+    def page_text(page_num):
+        started = time.perf_counter()
+        text = reader.pages[page_num].extract_text()
+        if timings is not None:
+            timings['page_text'] = timings.get('page_text', 0.0) + time.perf_counter() - started
+        read.add(page_num)
+        if len(read) % RELEASE_OBJECTS_EVERY_PAGES == 0:
+            _release_objects(reader)
+        # Only a prefix in reading order is useful for re-slicing, so stop at the first page that does not fit
+        if budget[0] is not None:
+            if len(text) <= budget[0]:
+                kept[page_num] = text
+                budget[0] -= len(text)
+            else:
+                budget[0] = None
+        return text
+
+    hinted = {}
+    if page_hints:
+        def hinted_text(page_num):
+            if page_num not in hinted:
+                hinted[page_num] = page_text(page_num)
+            return hinted[page_num]
+
+        for template, page_hint in page_hints:
+            scanner = _scan_hinted_pages(reader, hinted_text, template, page_hint, rules)
+            if scanner is not None:
+                return scanner, len(read), kept
+
+    # Fall back to a front-to-back scan, reusing any pages the hint already read
+    scanner = MarkerScanner(rules)
+    for page_num in range(len(reader.pages)):
+        text = hinted.pop(page_num, None)
+        if text is None:
+            text = page_text(page_num)
+        if scanner.feed(page_num, text):
+            break
+    return scanner, len(read), kept
+
+
+def apply_rules_to_pages(page_texts, page_count, rules=DEFAULT_RULES):
+    """
+    Re-run marker slicing over previously extracted page text.
+
+    Returns a finished scanner, or None when the cached pages are not enough to
+    decide and the document has to be parsed again.
+    """
+    scanner = MarkerScanner(rules)
+    for page_num in range(page_count):
+        if page_num not in page_texts:
+            return None
+        if scanner.feed(page_num, page_texts[page_num]):
+            return scanner
+    return scanner
+
+
+def extract_document(file_path, rules=DEFAULT_RULES, page_hints=None, keep_pages=False, hash_file=False):
+    """
+    Open, parse and marker-slice a single PDF and return a small result record.
+
+    record['timings'] splits the time spent on the document into opening the
+    file and reading the PDF structure, page text extraction and marker search.
+    With hash_file, record['sha256'] is the file's content hash, worked out
+    here so the process writing the rows never reads the PDF itself.
+    """
+    started = time.perf_counter()
+    timings = {}
+    record = {
+        'file': os.path.basename(file_path),
+        'path': file_path,
+        'status': STATUS_OK,
+        'data': None,
+        'error': None,
+        'marker_pages': None,
+        'template': None,
+        'recipient': None,
+        'sha256': None,
+        'pages_read': 0,
+        'page_count': 0,
+        'timings': timings,
+    }
+
+    try:
+        # Imported here so the desktop app can start without loading PyPDF2
+        import PyPDF2
+
+        with open(file_path, 'rb') as pdf_file:
+            reader = PyPDF2.PdfReader(pdf_file)
+            record['page_count'] = len(reader.pages)
+            opened = time.perf_counter()
+            timings['open'] = opened - started
+            scanner, pages_read, page_texts = scan_document(
+                reader, page_hints, rules, timings, keep_chars=KEEP_PAGE_CHARS if keep_pages else None)
+            timings['markers'] = time.perf_counter() - opened - timings.get('page_text', 0.0)
+            record['pages_read'] = pages_read
+            if hash_file:
+                pdf_file.seek(0)
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: pdf_file.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                record['sha256'] = digest.hexdigest()
+
+        # Page text is only shipped back when the caller wants to cache it
+        if keep_pages:
+            record['pages'] = page_texts
+
+        extracted_text = scanner.block()
+        if extracted_text is None:
+            record['status'] = STATUS_NO_MARKERS
+        else:
+            record['data'] = extracted_text
+            record['marker_pages'] = scanner.marker_pages()
+            record['template'] = scanner.template_name()
+            record['recipient'] = parse_address(extracted_text)
+
+    except Exception as e:
+        record['status'] = STATUS_ERROR
+        record['error'] = str(e)
+
+    timings['document'] = time.perf_counter() - started
+    return record
@@ -0,0 +1,100 @@
+"""
+Print journal for Document Processor Pro
+Durable record of every letter sent to the printer, so an interrupted run resumes without reprinting
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from .cache import file_sha256
+
+
+# Print states, in the order a letter moves through them
+PRINT_QUEUED = "queued"
+PRINT_SUBMITTED = "submitted"
+PRINT_CONFIRMED = "confirmed"
+PRINT_FAILED = "failed"
+
+
+class PrintJournal:
+    """
+    Append-only log of print state changes, keyed by letter content hash.
+
+    Rows are only ever inserted, and each change is committed with
+    synchronous=FULL, so it is fsync'd before printing moves on. A crash or a
+    stop leaves the journal at the last state that reached the disk. A
+    letter's state is its newest row, found through an index on (sha256, id),
+    so a lookup stays cheap however many runs the journal covers.
+
+    The scheduler and batch-merger threads may record into the same journal,
+    so writes are serialised with a lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.hashes = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY, sha256 TEXT, file TEXT, state TEXT,"
+            " run_id TEXT, at REAL, error TEXT)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS events_sha256 ON events (sha256, id)")
+        self.conn.commit()
+
+    def content_hash(self, path):
+        """Content hash of a letter, or None when it cannot be read"""
+        if path not in self.hashes:
+            try:
+                self.hashes[path] = file_sha256(path)
+            except OSError:
+                self.hashes[path] = None
+        return self.hashes[path]
+
+    def state(self, sha256):
+        """Latest state recorded for this content, or None if it was never journalled"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT state FROM events WHERE sha256 = ? ORDER BY id DESC LIMIT 1", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def plan(self, pdf_files):
+        """
+        Split a run into letters still to print and letters already printed.
+
+        Returns {'pending', 'printed', 'unconfirmed'} lists of paths, in input
+        order. unconfirmed letters were submitted by a run that ended before
+        the printer confirmed them; they are also in pending, since nothing
+        shows they printed.
+        """
+        plan = {'pending': [], 'printed': [], 'unconfirmed': []}
+        for path in pdf_files:
+            sha256 = self.content_hash(path)
+            state = self.state(sha256) if sha256 else None
+            if state == PRINT_CONFIRMED:
+                plan['printed'].append(path)
+                continue
+            if state == PRINT_SUBMITTED:
+                plan['unconfirmed'].append(path)
+            plan['pending'].append(path)
+        return plan
+
+    def record(self, paths, state, error=None):
+        """Append one state change per path and make it durable before returning"""
+        now = time.time()
+        rows = [(self.content_hash(path), os.path.basename(path), state, self.run_id, now, error)
+                for path in paths]
+        # A letter that cannot be read cannot be recognised on the next run either
+        rows = [row for row in rows if row[0] is not None]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO events (sha256, file, state, run_id, at, error) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,81 @@
+"""
+Thread-safe log pipeline for Document Processor Pro
+Any thread can log; the UI drains events in batches and a background thread writes the rotating log file
+"""
+import collections
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+
+# Lines kept for display; older events are dropped before they reach the UI
+DEFAULT_MAX_LINES = 5000
+DEFAULT_LOG_BYTES = 5 * 1024 * 1024
+DEFAULT_LOG_BACKUPS = 5
+
+LogEvent = collections.namedtuple('LogEvent', ['created', 'level', 'message'])
+
+
+class LogSink:
+    """
+    Callable log target that is safe to hand to worker threads as `log`.
+
+    Events wait in a bounded buffer until the UI calls drain(); if the UI falls
+    behind, the oldest are dropped, since they would scroll out of a capped
+    widget anyway. Every event still reaches the log file, which is written by
+    a QueueListener thread so logging never waits on disk.
+    """
+
+    def __init__(self, log_path=None, max_pending=DEFAULT_MAX_LINES,
+                 max_bytes=DEFAULT_LOG_BYTES, backups=DEFAULT_LOG_BACKUPS):
+        self.log_path = log_path
+        self._pending = collections.deque(maxlen=max_pending)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._listener = None
+
+        if log_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    log_path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+            except OSError:
+                # Without a log file the on-screen log still works
+                self.log_path = None
+            else:
+                handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(message)s'))
+                self._queue = queue.SimpleQueue()
+                self._listener = logging.handlers.QueueListener(self._queue, handler)
+                self._listener.start()
+
+    def __call__(self, message, level=logging.INFO):
+        event = LogEvent(time.time(), level, str(message))
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._dropped += 1
+            self._pending.append(event)
+        if self._queue is not None:
+            self._queue.put(logging.makeLogRecord({
+                'msg': event.message, 'levelno': level,
+                'levelname': logging.getLevelName(level), 'created': event.created}))
+
+    def drain(self):
+        """Take all pending events; returns (events, number dropped since the last drain)"""
+        with self._lock:
+            events = list(self._pending)
+            self._pending.clear()
+            dropped, self._dropped = self._dropped, 0
+        return events, dropped
+
+    def close(self):
+        """Flush the log file and stop the writer thread"""
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+            self._queue = None
@@ -0,0 +1,176 @@
+"""
+Per-stage run metrics for Document Processor Pro
+Collects stage latencies, counts and the slowest files, and exports them as JSON and a Prometheus textfile
+"""
+import heapq
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds, shared by every stage so histograms line up on a dashboard
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_TOP_FILES = 10
+
+# Timings measured inside the worker process for each parsed document
+DOCUMENT_STAGES = ('open', 'page_text', 'markers')
+
+
+def metrics_paths_for(excel_path):
+    """JSON report and Prometheus textfile kept next to the workbook"""
+    return excel_path + ".metrics.json", excel_path + ".metrics.prom"
+
+
+class Histogram:
+    """Latency histogram with fixed bucket bounds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def cumulative(self):
+        """(bound, count of observations <= bound) pairs, as Prometheus expects"""
+        total = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_seconds': round(self.sum, 6),
+            'mean_seconds': round(self.sum / self.count, 6) if self.count else 0.0,
+            'max_seconds': round(self.max, 6),
+            'buckets': {str(bound): count for bound, count in self.cumulative()},
+        }
+
+
+class RunMetrics:
+    """
+    Stage timings for one run.
+
+    Only the thread driving the run records into it, so there is no locking.
+    Worker-side timings arrive on each record under 'timings' and are folded in
+    by observe_record().
+    """
+
+    def __init__(self, top_files=DEFAULT_TOP_FILES):
+        self.started = time.time()
+        self.finished = None
+        self.stages = {}
+        self.counters = {}
+        self.top_files = top_files
+        self._slowest = []
+
+    def observe(self, stage, seconds):
+        if stage not in self.stages:
+            self.stages[stage] = Histogram()
+        self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_record(self, record):
+        """Count a finished record and fold in its worker timings, if it was parsed"""
+        self.count(f"files_{record['status']}")
+        timings = record.get('timings')
+        if not timings:
+            return
+        for stage in DOCUMENT_STAGES:
+            if stage in timings:
+                self.observe(stage, timings[stage])
+        self.observe('document', timings['document'])
+
+        entry = (timings['document'], record['file'])
+        if len(self._slowest) < self.top_files:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def finish(self):
+        self.finished = time.time()
+
+    def report(self):
+        """JSON-serialisable summary of the run"""
+        finished = self.finished or time.time()
+        elapsed = finished - self.started
+        files = sum(count for name, count in self.counters.items() if name.startswith('files_'))
+        return {
+            'started': self.started,
+            'finished': finished,
+            'elapsed_seconds': round(elapsed, 3),
+            'files_per_second': round(files / elapsed, 3) if elapsed > 0 else 0.0,
+            'counters': dict(self.counters),
+            'stages': {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+            'slowest_files': [{'file': filename, 'seconds': round(seconds, 6)}
+                              for seconds, filename in sorted(self._slowest, reverse=True)],
+        }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format, for the node exporter textfile collector"""
+        report = self.report()
+        lines = [
+            "# HELP docprocessor_stage_duration_seconds Time per stage operation in the last run.",
+            "# TYPE docprocessor_stage_duration_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            for bound, count in histogram.cumulative():
+                lines.append(f'docprocessor_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'docprocessor_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'docprocessor_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'docprocessor_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines += [
+            "# HELP docprocessor_last_run_events Files, cache lookups and rows counted in the last run.",
+            "# TYPE docprocessor_last_run_events gauge",
+        ]
+        for name, count in sorted(self.counters.items()):
+            lines.append(f'docprocessor_last_run_events{{event="{name}"}} {count}')
+
+        lines += [
+            "# HELP docprocessor_last_run_duration_seconds Wall time of the last run.",
+            "# TYPE docprocessor_last_run_duration_seconds gauge",
+            f"docprocessor_last_run_duration_seconds {report['elapsed_seconds']}",
+            "# HELP docprocessor_last_run_files_per_second Files finished per second in the last run.",
+            "# TYPE docprocessor_last_run_files_per_second gauge",
+            f"docprocessor_last_run_files_per_second {report['files_per_second']}",
+            "# HELP docprocessor_last_run_timestamp_seconds When the last run finished.",
+            "# TYPE docprocessor_last_run_timestamp_seconds gauge",
+            f"docprocessor_last_run_timestamp_seconds {report['finished']:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path=None, prom_path=None):
+        """Write the report files; each is swapped in whole so collectors never see half a file"""
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.report(), indent=2))
+        if prom_path:
+            _write_atomic(prom_path, self.to_prometheus())
+
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,64 @@
+"""
+Remembered marker page ranges for Document Processor Pro
+Lets later runs read the pages that usually hold the address block first
+"""
+import json
+import os
+from collections import Counter
+
+from .rules import DEFAULT_RULES
+
+
+DEFAULT_TEMPLATE = DEFAULT_RULES.name
+
+
+class PageHints:
+    """Page range hints keyed by template name, persisted as a small JSON file"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hints = {}
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.hints = json.load(f)
+        except (OSError, ValueError):
+            # A damaged hints file only costs us the optimisation
+            self.hints = {}
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.hints, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, template=DEFAULT_TEMPLATE):
+        """Return the [first, last] page range to try first, or None"""
+        hint = self.hints.get(template)
+        return list(hint) if hint else None
+
+    def for_rules(self, rules):
+        """[(template name, [first, last])] for the rules' templates that have a hint, in rule order"""
+        hints = []
+        for template in rules.templates:
+            hint = self.get(template.name)
+            if hint:
+                hints.append((template.name, hint))
+        return hints
+
+    def learn(self, marker_pages, template=DEFAULT_TEMPLATE):
+        """Remember the most common of a run's marker page ranges"""
+        ranges = Counter(tuple(pages) for pages in marker_pages if pages)
+        if not ranges:
+            return False
+        best = list(ranges.most_common(1)[0][0])
+        if self.hints.get(template) == best:
+            return False
+        self.hints[template] = best
+        return True
@@ -0,0 +1,107 @@
+"""
+Overlapped extract, write and print runs for Document Processor Pro
+Each letter goes to the printer as soon as its row is saved, while later letters are still being extracted
+"""
+import queue
+import threading
+
+from .address import DUPLICATES_FLAG, DUPLICATES_SKIP
+from .core import process_files, _no_log
+from .extraction import STATUS_OK
+from .printing import SOURCE_POLL_SECONDS
+
+
+# Letters saved but not yet taken by the printer; when it is full, writing and extraction wait
+PRINT_QUEUE_SIZE = 64
+
+
+class PipelineStopped(Exception):
+    """Raised inside the extraction stage when printing was stopped"""
+
+
+def process_and_print(pdf_files, excel_path, scheduler, printable=None, on_print_event=None,
+                      on_not_printed=None, should_stop=None, log=_no_log,
+                      duplicates=DUPLICATES_FLAG, **options):
+    """
+    Extract pdf_files into excel_path and print each letter through scheduler
+    (a PrintScheduler) as soon as its row is saved.
+
+    Extraction and writing run on a background thread while this thread feeds
+    the printer. A bounded queue sits between them, and the extraction engine
+    only works a few chunks ahead of the writer. A slow printer therefore
+    holds the earlier stages back instead of letting letters pile up in
+    memory, and the run takes about as long as its slowest stage.
+
+    Only letters whose address block was extracted are printed: letters
+    without markers, that could not be read or that were quarantined for
+    overrunning their parse budget are not. Nor are letters not in printable
+    (when given) and, with DUPLICATES_SKIP, letters to a recipient already
+    processed, though their rows are written as usual. on_not_printed(record)
+    is called for each letter not printed. on_print_event is passed to the
+    scheduler. When should_stop() turns true, both printing and extraction
+    stop; rows already written are kept. Other keyword arguments go to
+    process_files.
+
+    Returns (summary, jobs); summary is None when the run was stopped.
+    """
+    ready = queue.Queue(maxsize=PRINT_QUEUE_SIZE)
+    stopped = threading.Event()
+    done = object()
+    result = {'summary': None, 'error': None}
+    printable = set(printable) if printable is not None else None
+
+    def put(item):
+        # Waits while the printer is behind, but gives up once the run is stopped
+        while not stopped.is_set():
+            try:
+                ready.put(item, timeout=SOURCE_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def on_durable(record):
+        if record['status'] != STATUS_OK or \
+                (printable is not None and record['path'] not in printable) or \
+                (duplicates == DUPLICATES_SKIP and record.get('duplicate_of')):
+            if on_not_printed is not None:
+                on_not_printed(record)
+            return
+        put(record['path'])
+
+    def extract_and_write():
+        try:
+            result['summary'] = process_files(pdf_files, excel_path, log=log, duplicates=duplicates,
+                                              on_durable=on_durable, **options)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            result['error'] = e
+        finally:
+            try:
+                put(done)
+            except PipelineStopped:
+                pass
+
+    def letters():
+        while True:
+            try:
+                item = ready.get(timeout=SOURCE_POLL_SECONDS)
+            except queue.Empty:
+                yield None
+                continue
+            if item is done:
+                return
+            yield item
+
+    producer = threading.Thread(target=extract_and_write, daemon=True)
+    producer.start()
+    try:
+        jobs = scheduler.run(letters(), on_event=on_print_event, should_stop=should_stop)
+    finally:
+        stopped.set()
+        producer.join()
+
+    if result['error'] is not None:
+        raise result['error']
+    return result['summary'], jobs
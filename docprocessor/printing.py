@@ -0,0 +1,522 @@
+"""
+Print backends and job scheduling for Document Processor Pro
+Jobs are submitted as earlier ones complete and the printer queue drains, instead of on fixed delays
+"""
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+DEFAULT_JOBS_IN_FLIGHT = 2
+# Submission holds while the printer already has this many jobs queued
+DEFAULT_MAX_QUEUE_DEPTH = 10
+# How long Adobe may take to hand one file to the spooler before the job counts as failed
+ADOBE_JOB_TIMEOUT = 30.0
+# How often lpstat is asked which jobs are still queued
+CUPS_POLL_SECONDS = 1.0
+# Failed lpstat calls in a row (CUPS down, printer removed) before the outstanding jobs count as failed
+CUPS_STATUS_RETRIES = 30
+
+# Longest a free job slot waits on the printer before checking a source that had nothing ready
+SOURCE_POLL_SECONDS = 0.1
+
+# Batch size limits when letters are merged into one print job
+DEFAULT_BATCH_LETTERS = 25
+DEFAULT_BATCH_PAGES = 200
+# Merged batches waiting to be submitted; merging stays this far ahead of the printer
+BATCH_QUEUE_SIZE = 1
+
+# Job states reported by PrintScheduler
+JOB_SUBMITTED = "submitted"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class PrintJob:
+    """One file on its way to the printer: a single letter or a merged batch of letters"""
+
+    def __init__(self, path, letters=None):
+        self.path = path
+        self.file = os.path.basename(path)
+        self.letters = letters if letters is not None else [path]
+        self.pages = None
+        self.state = None
+        self.error = None
+        self.handle = None
+        self.submitted = None
+        self.finished = None
+
+
+class PrintBackend(ABC):
+    """
+    Interface between the scheduler and a print system.
+
+    submit() hands a file over and returns a handle without waiting for it to
+    print. wait() blocks until at least one submitted job finishes or the
+    timeout passes, and returns (handle, error) pairs for the finished ones;
+    error is None on success. queue_depth() is the number of jobs the printer
+    still has queued, or None when the backend cannot tell. A backend must
+    implement submit() and wait(); the others are optional.
+    """
+
+    name = "printer"
+
+    @abstractmethod
+    def submit(self, path):
+        """Hand a file to the print system; returns the job's handle"""
+
+    @abstractmethod
+    def wait(self, timeout):
+        """[(handle, error)] for jobs that finished within timeout seconds"""
+
+    def queue_depth(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class _ProcessBackend(PrintBackend):
+    """Backend whose jobs are finished when a per-job command exits"""
+
+    job_timeout = ADOBE_JOB_TIMEOUT
+
+    def __init__(self):
+        self._finished = queue.Queue()
+
+    @abstractmethod
+    def command(self, path):
+        """Argument list of the command that prints path"""
+
+    def submit(self, path):
+        process = subprocess.Popen(self.command(path), stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, text=True)
+        # One waiter thread per job turns the process exit into a completion event
+        thread = threading.Thread(target=self._wait_for, args=(process,), daemon=True)
+        thread.start()
+        return process
+
+    def _wait_for(self, process):
+        try:
+            stdout, stderr = process.communicate(timeout=self.job_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            self._finished.put((process, f"timed out after {self.job_timeout:.0f}s"))
+            return
+        if process.returncode == 0:
+            self._finished.put((process, None))
+        else:
+            detail = (stderr or stdout or '').strip()
+            self._finished.put((process, f"exit code {process.returncode}" + (f": {detail}" if detail else "")))
+
+    def wait(self, timeout):
+        try:
+            finished = [self._finished.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                finished.append(self._finished.get_nowait())
+            except queue.Empty:
+                return finished
+
+
+class AdobeBackend(_ProcessBackend):
+    """
+    Silent printing through Adobe Reader/Acrobat's /t switch (Windows).
+
+    A job is complete once Adobe has handed the file to the spooler. The
+    spooler's own queue length is read with pywin32 when it is installed.
+    """
+
+    name = "Adobe"
+
+    def __init__(self, adobe_path, printer=None):
+        super().__init__()
+        self.adobe_path = adobe_path
+        self.printer = printer
+
+    def command(self, path):
+        cmd = [self.adobe_path, '/t', path]
+        if self.printer:
+            cmd.append(self.printer)
+        return cmd
+
+    def queue_depth(self):
+        try:
+            import win32print
+        except ImportError:
+            return None
+        try:
+            printer = self.printer or win32print.GetDefaultPrinter()
+            handle = win32print.OpenPrinter(printer)
+            try:
+                return win32print.GetPrinter(handle, 2)['cJobs']
+            finally:
+                win32print.ClosePrinter(handle)
+        except Exception:
+            return None
+
+
+class CupsBackend(PrintBackend):
+    """
+    Printing with lp on Linux and macOS.
+
+    lp returns as soon as CUPS has queued the file; a job is complete once
+    lpstat no longer lists it as not completed. While lpstat fails, jobs are
+    not taken to be complete; after CUPS_STATUS_RETRIES failures in a row the
+    outstanding jobs are reported failed, so they are printed again later
+    rather than recorded as printed.
+    """
+
+    name = "CUPS"
+    REQUEST_ID_RE = re.compile(r'request id is (\S+)')
+
+    def __init__(self, printer=None, poll_seconds=CUPS_POLL_SECONDS):
+        self.printer = printer
+        self.poll_seconds = poll_seconds
+        self.outstanding = set()
+        self._queued = set()
+        self._queued_at = 0.0
+        # lpstat calls failed in a row, and the last failure
+        self._status_failures = 0
+        self._status_error = None
+
+    @staticmethod
+    def available():
+        return shutil.which('lp') is not None and shutil.which('lpstat') is not None
+
+    def submit(self, path):
+        cmd = ['lp']
+        if self.printer:
+            cmd += ['-d', self.printer]
+        result = subprocess.run(cmd + ['--', path], capture_output=True, text=True, timeout=30)
+        if result.returncode != 0:
+            raise OSError((result.stderr or result.stdout).strip() or f"lp exit code {result.returncode}")
+        match = self.REQUEST_ID_RE.search(result.stdout)
+        if not match:
+            raise OSError(f"lp did not report a job id: {result.stdout.strip()}")
+        self.outstanding.add(match.group(1))
+        # The cached lpstat listing predates this job
+        self._queued.add(match.group(1))
+        return match.group(1)
+
+    def _queued_ids(self):
+        """IDs of the jobs CUPS has not completed; raises OSError if lpstat cannot tell"""
+        # lpstat is asked at most once per poll_seconds, however often the scheduler checks
+        if self._queued_at and time.monotonic() - self._queued_at < self.poll_seconds:
+            if self._status_error is not None:
+                raise self._status_error
+            return self._queued
+        cmd = ['lpstat', '-W', 'not-completed', '-o']
+        if self.printer:
+            cmd.append(self.printer)
+        self._queued_at = time.monotonic()
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            if result.returncode != 0:
+                # An empty listing here would look as if every job had printed
+                raise OSError((result.stderr or result.stdout).strip() or f"lpstat exit code {result.returncode}")
+        except (OSError, subprocess.SubprocessError) as e:
+            self._status_failures += 1
+            self._status_error = e if isinstance(e, OSError) else OSError(f"lpstat failed: {e}")
+            raise self._status_error
+        self._status_failures = 0
+        self._status_error = None
+        self._queued = {line.split()[0] for line in result.stdout.splitlines() if line.strip()}
+        return self._queued
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                queued = self._queued_ids()
+            except OSError as e:
+                if self._status_failures >= CUPS_STATUS_RETRIES and self.outstanding:
+                    failed = sorted(self.outstanding)
+                    self.outstanding.clear()
+                    return [(job_id, f"could not read the print queue: {e}") for job_id in failed]
+                # Nothing is known to have finished
+                queued = self.outstanding
+            finished = self.outstanding - queued
+            if finished:
+                self.outstanding -= finished
+                return [(job_id, None) for job_id in sorted(finished)]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(self.poll_seconds, remaining))
+
+    def queue_depth(self):
+        try:
+            return len(self._queued_ids())
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+
+class FakeSpooler(PrintBackend):
+    """
+    In-process stand-in for a printer, for tests and benchmarks.
+
+    Jobs print one after another, each taking seconds_per_job; files whose
+    name is in fail_files finish with an error.
+    """
+
+    name = "fake spooler"
+
+    def __init__(self, seconds_per_job=0.05, fail_files=()):
+        self.seconds_per_job = seconds_per_job
+        self.fail_files = set(fail_files)
+        self.jobs = {}
+        self.printed = []
+        self._next_id = 0
+        self._busy_until = time.monotonic()
+
+    def submit(self, path):
+        self._next_id += 1
+        self._busy_until = max(self._busy_until, time.monotonic()) + self.seconds_per_job
+        self.jobs[self._next_id] = (path, self._busy_until)
+        return self._next_id
+
+    def wait(self, timeout):
+        if not self.jobs:
+            time.sleep(timeout)
+            return []
+        next_done = min(done_at for _, done_at in self.jobs.values())
+        delay = next_done - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        if delay > 0:
+            time.sleep(delay)
+
+        now = time.monotonic()
+        finished = []
+        for job_id, (path, done_at) in sorted(self.jobs.items()):
+            if done_at <= now:
+                del self.jobs[job_id]
+                if os.path.basename(path) in self.fail_files:
+                    finished.append((job_id, "printer error"))
+                else:
+                    self.printed.append(path)
+                    finished.append((job_id, None))
+        return finished
+
+    def queue_depth(self):
+        return len(self.jobs)
+
+
+class BatchMerger:
+    """
+    Merges letters into batch PDFs so each batch prints as one spool job.
+
+    A batch closes at letters_per_batch letters, or before it would pass
+    max_pages pages (a longer letter goes out on its own). Each letter is
+    padded with a blank page to an even page count, so every letter starts on
+    a fresh sheet when printed duplex.
+
+    Merging runs on a background thread and stays at most BATCH_QUEUE_SIZE
+    batches ahead of the consumer, so the next batch is built while the
+    previous one prints and only one batch is held in memory at a time.
+    Iterating yields a PrintJob per batch. Letters that cannot be read are
+    left out and passed to on_error(path, error).
+    """
+
+    def __init__(self, pdf_files, letters_per_batch=DEFAULT_BATCH_LETTERS, max_pages=DEFAULT_BATCH_PAGES,
+                 on_error=None, work_dir=None):
+        self.pdf_files = list(pdf_files)
+        self.letters_per_batch = max(1, int(letters_per_batch))
+        self.max_pages = max(1, int(max_pages))
+        self.on_error = on_error
+        self.work_dir = tempfile.mkdtemp(prefix="docprocessor_print_", dir=work_dir)
+        self.batches = 0
+        self.padded = 0
+        self._ready = queue.Queue(maxsize=BATCH_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __iter__(self):
+        self._thread = threading.Thread(target=self._merge_all, daemon=True)
+        self._thread.start()
+        while True:
+            item = self._ready.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _put(self, item):
+        # Waits while the consumer is behind, but gives up once close() is called
+        while not self._stop.is_set():
+            try:
+                self._ready.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _merge_all(self):
+        try:
+            from PyPDF2 import PdfReader, PdfWriter
+
+            writer, letters, pages = None, [], 0
+            for path in self.pdf_files:
+                if self._stop.is_set():
+                    return
+                try:
+                    reader = PdfReader(path)
+                    letter_pages = len(reader.pages)
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(path, e)
+                    continue
+                padded_pages = letter_pages + letter_pages % 2
+
+                if letters and (len(letters) >= self.letters_per_batch or pages + padded_pages > self.max_pages):
+                    if not self._put(self._write_batch(writer, letters, pages)):
+                        return
+                    writer, letters, pages = None, [], 0
+
+                if writer is None:
+                    writer = PdfWriter()
+                for page in reader.pages:
+                    writer.add_page(page)
+                if letter_pages % 2:
+                    # Same size as the letter's last page
+                    writer.add_blank_page()
+                    self.padded += 1
+                letters.append(path)
+                pages += padded_pages
+
+            if letters and not self._put(self._write_batch(writer, letters, pages)):
+                return
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+    def _write_batch(self, writer, letters, pages):
+        self.batches += 1
+        path = os.path.join(self.work_dir, f"batch_{self.batches:05d}.pdf")
+        with open(path, 'wb') as f:
+            writer.write(f)
+        job = PrintJob(path, letters)
+        job.pages = pages
+        return job
+
+    def release(self, job):
+        """Delete a batch file once its job has finished with it"""
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+
+    def close(self):
+        """Stop merging and remove any batch files left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class PrintScheduler:
+    """
+    Feeds files to a backend as fast as the printer takes them.
+
+    At most jobs_in_flight files are submitted and unfinished at once, and no
+    file is submitted while the printer's queue is at least max_queue_depth
+    long (None turns the check off). The next file goes out as soon as a job completes,
+    not after a fixed delay.
+    """
+
+    def __init__(self, backend, jobs_in_flight=DEFAULT_JOBS_IN_FLIGHT,
+                 max_queue_depth=DEFAULT_MAX_QUEUE_DEPTH, idle_seconds=0.5):
+        self.backend = backend
+        self.jobs_in_flight = max(1, int(jobs_in_flight))
+        self.max_queue_depth = max_queue_depth
+        # Longest wait before re-checking the stop flag or a full printer queue
+        self.idle_seconds = idle_seconds
+
+    def _queue_full(self):
+        if not self.max_queue_depth:
+            return False
+        depth = self.backend.queue_depth()
+        return depth is not None and depth >= self.max_queue_depth
+
+    def run(self, paths, on_event=None, should_stop=None):
+        """
+        Print every path (or PrintJob) in order; returns the list of PrintJob.
+
+        paths is consumed lazily, one item per submission, so a generator such
+        as BatchMerger can prepare the next file while earlier ones print. A
+        source fed by another stage yields None when it has nothing ready yet;
+        it should wait briefly before doing so rather than spin.
+        on_event(job) is called whenever a job is submitted, done or failed.
+        When should_stop() turns true no more files are submitted, and jobs
+        already with the printer are left to finish on their own.
+        """
+        items = iter(paths)
+        end = object()
+        jobs = []
+        pending = []
+        in_flight = {}
+        exhausted = False
+
+        def fill_pending():
+            # Look one item ahead so the loop knows whether work remains
+            nonlocal exhausted
+            if not pending and not exhausted:
+                item = next(items, end)
+                if item is end:
+                    exhausted = True
+                elif item is not None:
+                    pending.append(item if isinstance(item, PrintJob) else PrintJob(item))
+
+        def report(job, state, error=None):
+            job.state = state
+            job.error = error
+            if state != JOB_SUBMITTED:
+                job.finished = time.monotonic()
+            if on_event is not None:
+                on_event(job)
+
+        while pending or in_flight or not exhausted:
+            if should_stop is not None and should_stop():
+                break
+
+            fill_pending()
+            while pending and len(in_flight) < self.jobs_in_flight and not self._queue_full():
+                job = pending.pop()
+                jobs.append(job)
+                fill_pending()
+                job.submitted = time.monotonic()
+                try:
+                    job.handle = self.backend.submit(job.path)
+                except Exception as e:
+                    report(job, JOB_FAILED, str(e))
+                    continue
+                in_flight[job.handle] = job
+                report(job, JOB_SUBMITTED)
+
+            if not in_flight:
+                if pending:
+                    # Printer queue is full and none of ours are outstanding
+                    time.sleep(self.idle_seconds)
+                continue
+
+            # A free slot and a source with nothing ready: check back on the source soon
+            waiting_on_source = not pending and not exhausted and len(in_flight) < self.jobs_in_flight
+            timeout = min(self.idle_seconds, SOURCE_POLL_SECONDS) if waiting_on_source else self.idle_seconds
+            for handle, error in self.backend.wait(timeout):
+                job = in_flight.pop(handle, None)
+                if job is not None:
+                    report(job, JOB_FAILED if error else JOB_DONE, error)
+
+        return jobs
@@ -0,0 +1,71 @@
+"""
+Run progress for Document Processor Pro
+Loops count finished files; the UI reads a snapshot on its own timer, so reporting costs one locked add per file
+"""
+import threading
+import time
+
+
+class ProgressTracker:
+    """Thread-safe counters for one stage of a run (extracting or printing)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.start(0)
+
+    def start(self, total, stage="Processing"):
+        """Reset the counters for a stage of `total` files"""
+        with self._lock:
+            self.stage = stage
+            self.total = total
+            self.done = 0
+            self.bytes_done = 0
+            self.counts = {}
+            self.started = time.monotonic()
+
+    def advance(self, status, nbytes=0):
+        """Count one finished file; status is a STATUS_* value from extraction"""
+        with self._lock:
+            self.done += 1
+            self.bytes_done += nbytes
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def snapshot(self):
+        """Consistent copy of the counters plus rates and ETA"""
+        with self._lock:
+            snapshot = {
+                'stage': self.stage,
+                'total': self.total,
+                'done': self.done,
+                'bytes_done': self.bytes_done,
+                'counts': dict(self.counts),
+                'elapsed_seconds': time.monotonic() - self.started,
+            }
+
+        elapsed = snapshot['elapsed_seconds']
+        files_per_second = snapshot['done'] / elapsed if elapsed > 0 else 0.0
+        remaining = max(snapshot['total'] - snapshot['done'], 0)
+        snapshot['files_per_second'] = files_per_second
+        snapshot['bytes_per_second'] = snapshot['bytes_done'] / elapsed if elapsed > 0 else 0.0
+        snapshot['eta_seconds'] = remaining / files_per_second if files_per_second > 0 else None
+        return snapshot
+
+
+def format_bytes(count):
+    """Human-readable byte count, e.g. 3.2 MB"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def format_duration(seconds):
+    """Short duration for an ETA, e.g. 1h 05m or 42s"""
+    if seconds is None:
+        return "--"
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
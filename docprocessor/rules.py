@@ -0,0 +1,176 @@
+"""
+Marker rules for Document Processor Pro
+Describes where the address block sits in a letter's text, for one or many letter templates
+"""
+import hashlib
+import json
+import re
+
+
+# Text markers that surround the address block in our letters
+SENDER_MARKER = "uk_team_gbmailgps@lilly.com"
+GREETING_MARKER = "Dear"
+
+
+class RuleSet:
+    """
+    The markers and slicing used to cut the address block out of a letter.
+
+    The block starts start_offset characters into the sender marker and ends at
+    the greeting marker; after dropping blank lines, the first skip_lines lines
+    (the rest of the sender line and the reference line) are discarded.
+    Raises ValueError for a blank marker or a negative offset.
+    """
+
+    def __init__(self, sender_marker=SENDER_MARKER, greeting_marker=GREETING_MARKER,
+                 start_offset=5, skip_lines=2, name=None):
+        for field, marker in (('sender_marker', sender_marker), ('greeting_marker', greeting_marker)):
+            if not isinstance(marker, str) or not marker.strip():
+                raise ValueError(f"{field} must be non-empty text")
+        for field, offset in (('start_offset', start_offset), ('skip_lines', skip_lines)):
+            if offset < 0:
+                raise ValueError(f"{field} cannot be negative")
+        self.sender_marker = sender_marker
+        self.greeting_marker = greeting_marker
+        self.start_offset = start_offset
+        self.skip_lines = skip_lines
+        self.name = name or sender_marker
+
+    @property
+    def templates(self):
+        """A single rule set is a collection of one template"""
+        return (self,)
+
+    @property
+    def key(self):
+        """Fingerprint of the rules; cached results made under other rules are re-sliced"""
+        spec = f"{self.sender_marker}|{self.greeting_marker}|+{self.start_offset}|{self.skip_lines}"
+        return hashlib.sha1(spec.encode('utf-8')).hexdigest()[:12]
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'sender_marker': self.sender_marker,
+            'greeting_marker': self.greeting_marker,
+            'start_offset': self.start_offset,
+            'skip_lines': self.skip_lines,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(sender_marker=data.get('sender_marker', SENDER_MARKER),
+                   greeting_marker=data.get('greeting_marker', GREETING_MARKER),
+                   start_offset=int(data.get('start_offset', 5)),
+                   skip_lines=int(data.get('skip_lines', 2)),
+                   name=data.get('name'))
+
+
+class RuleEngine:
+    """
+    Several letter templates matched together.
+
+    A document matches the template whose sender marker occurs first in its
+    text, among the templates whose greeting marker also occurs; ties go to
+    the template listed first. Marker search for all templates is one pass
+    over the text (see CompiledMarkers), so the per-document cost barely
+    grows with the number of templates.
+    """
+
+    def __init__(self, templates, name=None):
+        self.templates = tuple(templates)
+        if not self.templates:
+            raise ValueError("A rule engine needs at least one template")
+        names = [template.name for template in self.templates]
+        if len(set(names)) != len(names):
+            raise ValueError("Template names must be unique")
+        self.name = name or "+".join(names)
+        # Looked up for every document, so worked out once
+        spec = "\n".join(f"{template.name}={template.key}" for template in self.templates)
+        self.key = hashlib.sha1(spec.encode('utf-8')).hexdigest()[:12]
+
+    def to_dict(self):
+        return {'name': self.name, 'templates': [template.to_dict() for template in self.templates]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([RuleSet.from_dict(template) for template in data['templates']],
+                   name=data.get('name'))
+
+
+def _trie_pattern(markers):
+    """
+    Regular expression matching any of the markers, factored into a prefix tree.
+
+    A plain a|b|c alternation tries every marker at each candidate position; the
+    tree shares common prefixes, so a position is rejected after a few characters
+    however many markers there are.
+    """
+    trie = {}
+    for marker in markers:
+        node = trie
+        for char in marker:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A marker ends here, and longer ones continue
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class CompiledMarkers:
+    """
+    Every sender and greeting marker of a rule set compiled into one regular
+    expression each.
+
+    A scan finds the next position where any marker starts; markers_at() then
+    lists all markers starting there, so markers that share a prefix (or sit
+    inside one another) are each found at their first occurrence.
+    """
+
+    def __init__(self, templates):
+        self.templates = templates
+        self.senders = sorted({t.sender_marker for t in templates}, key=len, reverse=True)
+        self.greetings = sorted({t.greeting_marker for t in templates}, key=len, reverse=True)
+        self.sender_re = re.compile(_trie_pattern(self.senders))
+        self.greeting_re = re.compile(_trie_pattern(self.greetings))
+        # Characters to carry over between pages so markers split by a page break are found
+        self.overlap = max(len(marker) for marker in self.senders + self.greetings) - 1
+
+    @staticmethod
+    def markers_at(markers, text, pos):
+        return [marker for marker in markers if text.startswith(marker, pos)]
+
+
+_compiled = {}
+
+
+def compile_rules(rules):
+    """Compiled markers for a RuleSet or RuleEngine, built once per process"""
+    compiled = _compiled.get(rules.key)
+    if compiled is None:
+        compiled = _compiled[rules.key] = CompiledMarkers(rules.templates)
+    return compiled
+
+
+DEFAULT_RULES = RuleSet()
+
+
+def rules_from_dict(data):
+    """A RuleEngine for {"templates": [...]} or a list of templates, else a single RuleSet"""
+    if isinstance(data, list):
+        data = {'templates': data}
+    if 'templates' in data:
+        return RuleEngine.from_dict(data)
+    return RuleSet.from_dict(data)
+
+
+def load_rules(path):
+    """Load a rule set, or a list of templates, from a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return rules_from_dict(json.load(f))
@@ -0,0 +1,654 @@
+"""
+Local HTTP extraction service for Document Processor Pro
+
+    python -m docprocessor.service [--port 8765] [-w WORKERS] [--rules RULES.json]
+
+Keeps a pool of worker processes with PyPDF2 already loaded, so another
+program can have one letter extracted in the time it takes to parse it:
+
+    POST /extract                 a PDF as the body (application/pdf), ?name=letter.pdf
+    POST /extract                 {"path": "C:\\letters\\a.pdf"}
+    POST /extract                 {"paths": [...]} or multipart/form-data uploads, answered
+                                  as NDJSON, one record per document as each finishes
+    GET  /health, /stats, /metrics
+
+The service listens on 127.0.0.1 only unless told otherwise, since it reads
+any PDF path it is given.
+"""
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from .engine import (_extract_chunk, _timeout_record, default_worker_count,
+                     DEFAULT_WORKER_MEMORY_MB)
+from .extraction import extract_document
+from .metrics import RunMetrics
+from .rules import DEFAULT_RULES, load_rules
+from .watchdog import DEFAULT_DOCUMENT_TIMEOUT, DEFAULT_DOCUMENT_CPU_SECONDS
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Requests waiting for a free slot beyond this many are turned away with 503 straight away
+DEFAULT_MAX_QUEUED = 64
+
+# A request that has waited this long for a slot is turned away rather than left hanging
+DEFAULT_QUEUE_TIMEOUT = 30.0
+
+DEFAULT_MAX_UPLOAD_MB = 50
+
+# Latencies kept for the percentiles in /stats
+LATENCY_WINDOW = 10000
+
+# Documents of one batch handed to the pool ahead of the results streamed back, per worker
+BATCH_AHEAD_PER_WORKER = 2
+
+NDJSON = "application/x-ndjson"
+
+
+class RequestError(Exception):
+    """A request the service cannot serve; carries the HTTP status to answer with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _warm_worker():
+    """Pool initializer: load the parser once per worker instead of on its first document"""
+    import PyPDF2  # noqa: F401
+
+
+def _ready():
+    return os.getpid()
+
+
+class WorkerPool:
+    """
+    A process pool kept warm for the life of the service.
+
+    Each document is one task, run under the worker's watchdog as in
+    ExtractionEngine. A worker that dies takes the pool down with every
+    document in flight on it, so the pool is replaced and each of those
+    documents is tried once more on the new pool; a document that breaks
+    that one too is reported as having killed its worker. A worker that
+    grows past worker_memory_mb gets the pool replaced as well, after the
+    documents already submitted to it have finished.
+    """
+
+    def __init__(self, workers=None, rules=DEFAULT_RULES, worker_memory_mb=DEFAULT_WORKER_MEMORY_MB,
+                 document_timeout=DEFAULT_DOCUMENT_TIMEOUT,
+                 document_cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS):
+        self.workers = max(1, int(workers or default_worker_count()))
+        self.extract = partial(extract_document, rules=rules)
+        self.memory_limit = int(worker_memory_mb * 1024 * 1024) if worker_memory_mb else None
+        self.budget = (document_timeout, document_cpu_seconds) \
+            if document_timeout or document_cpu_seconds else None
+        self.recycled = 0
+        self.crashed = 0
+        self._lock = threading.Lock()
+        self.executor = self._start()
+
+    def _start(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # One task per worker gets every process started before the first request arrives
+        wait([executor.submit(_ready) for _ in range(self.workers)])
+        return executor
+
+    def _replace(self, executor):
+        """Swap in a fresh pool unless another thread already replaced this one"""
+        with self._lock:
+            if self.executor is not executor:
+                return
+            self.executor = self._start()
+        # Documents already on the old pool still finish there
+        executor.shutdown(wait=False)
+
+    def _submit(self, path):
+        with self._lock:
+            executor = self.executor
+        try:
+            return executor, executor.submit(_extract_chunk, self.extract, [path],
+                                             self.memory_limit, self.budget)
+        except BrokenProcessPool:
+            self._replace(executor)
+            return self._submit(path)
+
+    def submit(self, path):
+        """Start extracting path; returns a handle for result()"""
+        return path, self._submit(path)
+
+    def result(self, handle):
+        """The record for a submitted document, waiting for it if need be"""
+        path, (executor, future) = handle
+        for attempt in range(2):
+            try:
+                records, over = future.result()
+            except BrokenProcessPool:
+                self._replace(executor)
+                if attempt:
+                    break
+                executor, future = self._submit(path)
+                continue
+            if over:
+                self.recycled += 1
+                self._replace(executor)
+            return records[0]
+        self.crashed += 1
+        return _timeout_record(path, "its worker process died (killed after overrunning its budget, or crashed)")
+
+    def close(self):
+        with self._lock:
+            self.executor.shutdown()
+
+
+class Admission:
+    """
+    Limits how many requests are served at once.
+
+    A request beyond max_active waits its turn, first come first served; one
+    arriving when max_queued are already waiting, or that waits longer than
+    queue_timeout, is refused so callers see back-pressure instead of a
+    growing backlog.
+    """
+
+    def __init__(self, max_active, max_queued=DEFAULT_MAX_QUEUED, queue_timeout=DEFAULT_QUEUE_TIMEOUT):
+        self.max_active = max(1, int(max_active))
+        self.max_queued = max(0, int(max_queued))
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.rejected = 0
+        self._waiting = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def queued(self):
+        return len(self._waiting)
+
+    def enter(self):
+        """Wait for a slot; returns False if the request should be refused"""
+        with self._cond:
+            if not self._waiting and self.active < self.max_active:
+                self.active += 1
+                return True
+            if len(self._waiting) >= self.max_queued:
+                self.rejected += 1
+                return False
+            ticket = object()
+            self._waiting.append(ticket)
+            deadline = time.monotonic() + self.queue_timeout
+            while self._waiting[0] is not ticket or self.active >= self.max_active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    self.rejected += 1
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+            self._waiting.popleft()
+            self.active += 1
+            self._cond.notify_all()
+            return True
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+class ServiceMetrics:
+    """
+    RunMetrics shared by the request threads, plus recent latencies for percentiles.
+
+    'request' is the whole time a request took, 'queue_wait' the part spent
+    waiting for a slot; the per-document stages come from the workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.metrics = RunMetrics()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.metrics.observe(stage, seconds)
+            if stage == 'request':
+                self.latencies.append(seconds)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.metrics.count(name, amount)
+
+    def observe_record(self, record):
+        with self._lock:
+            self.metrics.observe_record(record)
+
+    def percentiles(self):
+        """p50/p95/p99 request latency in seconds over the last LATENCY_WINDOW requests"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {'p50': None, 'p95': None, 'p99': None}
+        return {name: round(latencies[min(len(latencies) - 1, int(len(latencies) * q))], 6)
+                for name, q in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))}
+
+    def report(self):
+        with self._lock:
+            return self.metrics.report()
+
+    def to_prometheus(self):
+        with self._lock:
+            return self.metrics.to_prometheus()
+
+
+class ExtractionService:
+    """The warm pool, admission control and metrics behind the HTTP handler"""
+
+    def __init__(self, workers=None, rules=DEFAULT_RULES, max_active=None, max_queued=DEFAULT_MAX_QUEUED,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT, max_upload_mb=DEFAULT_MAX_UPLOAD_MB,
+                 worker_memory_mb=DEFAULT_WORKER_MEMORY_MB, document_timeout=DEFAULT_DOCUMENT_TIMEOUT,
+                 document_cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS, log=None):
+        self.rules = rules
+        self.log = log or (lambda message: None)
+        self.pool = WorkerPool(workers, rules, worker_memory_mb, document_timeout, document_cpu_seconds)
+        # By default as many requests run as there are workers, so a single letter never queues behind a batch's
+        self.admission = Admission(max_active or self.pool.workers, max_queued, queue_timeout)
+        self.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+        self.metrics = ServiceMetrics()
+        # Uploads are spooled to files here for the workers to open
+        self.spool_dir = tempfile.mkdtemp(prefix="docprocessor-")
+
+    def close(self):
+        self.pool.close()
+        try:
+            os.rmdir(self.spool_dir)
+        except OSError:
+            pass
+
+    def spool(self, data):
+        """Write an uploaded PDF to the spool folder; returns its path"""
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self.spool_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _finish(self, record, name=None, data=None):
+        """Tidy a worker record into the response shape"""
+        self.metrics.observe_record(record)
+        if data is not None:
+            # An upload's path is a spool file nobody else can see
+            record['file'] = name or "upload.pdf"
+            record['path'] = None
+            record['sha256'] = hashlib.sha256(data).hexdigest()
+        return record
+
+    def extract(self, document):
+        """Extract one (name, path, data) document; returns its record"""
+        name, path, data = document
+        if data is not None:
+            path = self.spool(data)
+        try:
+            return self._finish(self.pool.result(self.pool.submit(path)), name, data)
+        finally:
+            if data is not None:
+                os.remove(path)
+
+    def extract_many(self, documents):
+        """
+        Yield the record of each (name, path, data) document as it finishes,
+        with its position in the request as 'index'. At most
+        BATCH_AHEAD_PER_WORKER documents per worker are in flight, so a large
+        batch neither floods the pool nor holds every upload on disk at once.
+        """
+        pending = {}
+        limit = self.pool.workers * BATCH_AHEAD_PER_WORKER
+        documents = iter(enumerate(documents))
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < limit:
+                    try:
+                        index, (name, path, data) = next(documents)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if data is not None:
+                        path = self.spool(data)
+                    handle = self.pool.submit(path)
+                    pending[handle[1][1]] = (index, name, path, data, handle)
+                if not pending:
+                    break
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, name, path, data, handle = pending.pop(future)
+                    try:
+                        record = self._finish(self.pool.result(handle), name, data)
+                    finally:
+                        if data is not None:
+                            os.remove(path)
+                    record['index'] = index
+                    yield record
+        finally:
+            for future, (index, name, path, data, handle) in pending.items():
+                future.cancel()
+                if data is not None:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def stats(self):
+        return {
+            'workers': self.pool.workers,
+            'rules': self.rules.name,
+            'active': self.admission.active,
+            'queued': self.admission.queued,
+            'rejected': self.admission.rejected,
+            'max_active': self.admission.max_active,
+            'max_queued': self.admission.max_queued,
+            'worker_recycles': self.pool.recycled,
+            'worker_crashes': self.pool.crashed,
+            'latency_seconds': self.metrics.percentiles(),
+            'metrics': self.metrics.report(),
+        }
+
+    def prometheus(self):
+        lines = [self.metrics.to_prometheus().rstrip("\n"),
+                 "# HELP docprocessor_service_requests Requests being served and waiting for a slot.",
+                 "# TYPE docprocessor_service_requests gauge",
+                 f'docprocessor_service_requests{{state="active"}} {self.admission.active}',
+                 f'docprocessor_service_requests{{state="queued"}} {self.admission.queued}',
+                 "# HELP docprocessor_service_rejected_total Requests refused because the queue was full.",
+                 "# TYPE docprocessor_service_rejected_total counter",
+                 f"docprocessor_service_rejected_total {self.admission.rejected}"]
+        percentiles = self.metrics.percentiles()
+        if percentiles['p50'] is not None:
+            lines += ["# HELP docprocessor_service_latency_seconds Request latency over recent requests.",
+                      "# TYPE docprocessor_service_latency_seconds summary"]
+            for quantile, name in (("0.5", 'p50'), ("0.95", 'p95'), ("0.99", 'p99')):
+                lines.append(f'docprocessor_service_latency_seconds{{quantile="{quantile}"}} {percentiles[name]}')
+        return "\n".join(lines) + "\n"
+
+
+class ExtractionRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end; the ExtractionService is on self.server.service"""
+
+    # Keep-alive, so a caller sending letter after letter does not pay a new connection for each
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle's algorithm each small response waits for an ACK
+    disable_nagle_algorithm = True
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = 60
+    server_version = "DocumentProcessorPro"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        self.service.log(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status, body, headers=()):
+        payload = (json.dumps(body) + "\n").encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_text(self, text, content_type):
+        payload = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        route = urlsplit(self.path).path
+        if route == "/health":
+            self._send_json(200, {'status': 'ok', 'workers': self.service.pool.workers})
+        elif route == "/stats":
+            self._send_json(200, self.service.stats())
+        elif route == "/metrics":
+            self._send_text(self.service.prometheus(), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {'error': f"No such endpoint: {route}"})
+
+    def do_POST(self):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        if url.path != "/extract":
+            self._discard_body()
+            self._send_json(404, {'error': f"No such endpoint: {url.path}"})
+            return
+        try:
+            documents, batch = self._read_documents(url)
+        except RequestError as e:
+            self.close_connection = True
+            self._send_json(e.status, {'error': str(e)})
+            return
+
+        if not self.service.admission.enter():
+            self.service.metrics.count("requests_rejected")
+            self._send_json(503, {'error': "The service is busy; try again shortly."},
+                            headers=[("Retry-After", "1")])
+            return
+        try:
+            self.service.metrics.observe('queue_wait', time.perf_counter() - started)
+            if batch:
+                self._stream(documents)
+            else:
+                try:
+                    record = self.service.extract(documents[0])
+                except Exception as e:
+                    # e.g. the spool folder's disk is full; the caller gets an answer either way
+                    self._failed(e)
+                    self._send_json(500, {'error': f"Could not extract the document: {e}"})
+                    return
+                self._send_json(200, record)
+        finally:
+            self.service.admission.leave()
+            self.service.metrics.count("requests")
+            self.service.metrics.observe('request', time.perf_counter() - started)
+
+    def _failed(self, error):
+        self.service.log(f"{self.address_string()} request failed: {error}")
+        self.service.metrics.count("requests_failed")
+        self.close_connection = True
+
+    def _discard_body(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise RequestError(400, "Bad Content-Length.")
+        if length > self.service.max_upload_bytes:
+            raise RequestError(413, f"The request is larger than the {self.service.max_upload_bytes} byte limit.")
+        return self.rfile.read(length)
+
+    def _read_documents(self, url):
+        """The request's (name, path, data) documents, and whether to answer as a batch"""
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        body = self._read_body()
+
+        if content_type in ("application/pdf", "application/octet-stream"):
+            if not body:
+                raise RequestError(400, "The request has no PDF in its body.")
+            name = parse_qs(url.query).get('name', ["upload.pdf"])[0]
+            return [(os.path.basename(name), None, body)], False
+
+        if content_type == "application/json":
+            try:
+                request = json.loads(body.decode('utf-8'))
+            except (UnicodeDecodeError, ValueError) as e:
+                raise RequestError(400, f"The request is not valid JSON: {e}")
+            if isinstance(request, dict) and isinstance(request.get('path'), str):
+                return [self._path_document(request['path'])], False
+            if isinstance(request, dict) and isinstance(request.get('paths'), list):
+                return [self._path_document(path) for path in request['paths']], True
+            raise RequestError(400, 'Send {"path": "..."} or {"paths": ["...", ...]}.')
+
+        if content_type == "multipart/form-data":
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode('latin-1') + b"\r\n\r\n" + body)
+            documents = [(os.path.basename(part.get_filename() or "upload.pdf"), None,
+                          part.get_payload(decode=True) or b"")
+                         for part in message.iter_parts() if part.get_filename() is not None]
+            if not documents:
+                raise RequestError(400, "The form has no files in it.")
+            return documents, True
+
+        raise RequestError(415, "Send a PDF (application/pdf), JSON paths (application/json) "
+                                "or file uploads (multipart/form-data).")
+
+    @staticmethod
+    def _path_document(path):
+        if not isinstance(path, str) or not os.path.isfile(path):
+            raise RequestError(404, f"No such file: {path}")
+        return os.path.basename(path), os.path.abspath(path), None
+
+    def _stream(self, documents):
+        """Answer a batch as chunked NDJSON, one line per document as it finishes"""
+        self.send_response(200)
+        self.send_header("Content-Type", NDJSON)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            try:
+                for record in self.service.extract_many(documents):
+                    self._write_chunk(record)
+            except ConnectionError:
+                raise
+            except Exception as e:
+                # The status line has gone out, so the error ends the stream as its last line
+                self._failed(e)
+                self._write_chunk({'error': f"Could not extract the documents: {e}"})
+            self.wfile.write(b"0\r\n\r\n")
+        except ConnectionError:
+            # The caller went away; nothing more can be sent
+            self.close_connection = True
+
+    def _write_chunk(self, body):
+        line = (json.dumps(body) + "\n").encode('utf-8')
+        self.wfile.write(f"{len(line):X}\r\n".encode('ascii') + line + b"\r\n")
+        self.wfile.flush()
+
+
+class ExtractionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        self.service = service
+        super().__init__(address, ExtractionRequestHandler)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, stop_event=None, on_ready=None, **options):
+    """
+    Run the service until stop_event is set; options are ExtractionService's.
+    on_ready(server) is called once it is listening (port 0 picks a free port).
+    """
+    stop_event = stop_event or threading.Event()
+    service = ExtractionService(**options)
+    try:
+        server = ExtractionServer((host, port), service)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        service.log(f"Serving on http://{host}:{server.server_address[1]} with {service.pool.workers} warm worker(s)")
+        if on_ready is not None:
+            on_ready(server)
+        stop_event.wait()
+        server.shutdown()
+        server.server_close()
+    finally:
+        service.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m docprocessor.service",
+        description="Serve address extraction over HTTP from a pool of warm worker processes.")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help="address to listen on; the service reads any PDF path it is sent, so "
+                             "only listen beyond this machine on a trusted network (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=default_worker_count(),
+                        help="extraction worker processes (default: %(default)s)")
+    parser.add_argument("--max-active", type=int, metavar="N",
+                        help="requests served at once (default: one per worker)")
+    parser.add_argument("--max-queued", type=int, default=DEFAULT_MAX_QUEUED, metavar="N",
+                        help="requests that may wait for a slot before more are refused with 503 "
+                             "(default: %(default)s)")
+    parser.add_argument("--queue-timeout", type=float, default=DEFAULT_QUEUE_TIMEOUT, metavar="SECONDS",
+                        help="refuse a request that has waited this long (default: %(default)s)")
+    parser.add_argument("--max-upload", type=float, default=DEFAULT_MAX_UPLOAD_MB, metavar="MB",
+                        help="largest request body accepted (default: %(default)s)")
+    parser.add_argument("--worker-memory", type=int, default=DEFAULT_WORKER_MEMORY_MB, metavar="MB",
+                        help="replace the worker processes when one grows past this many MB "
+                             "resident, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--doc-timeout", type=float, default=DEFAULT_DOCUMENT_TIMEOUT, metavar="SECONDS",
+                        help="give up on a PDF that takes longer than this, 0 for no limit "
+                             "(default: %(default)s)")
+    parser.add_argument("--doc-cpu", type=float, default=DEFAULT_DOCUMENT_CPU_SECONDS, metavar="SECONDS",
+                        help="likewise for CPU time spent on one PDF (default: %(default)s)")
+    parser.add_argument("--rules", help="JSON rule set with the markers to extract between")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not log requests")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    try:
+        rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+    except (OSError, ValueError) as e:
+        print(f"Could not load rule set {args.rules}: {e}", file=sys.stderr)
+        return 2
+
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        serve(args.host, args.port, stop_event=stop_event, workers=args.workers, rules=rules,
+              max_active=args.max_active, max_queued=args.max_queued,
+              queue_timeout=args.queue_timeout, max_upload_mb=args.max_upload,
+              worker_memory_mb=args.worker_memory, document_timeout=args.doc_timeout,
+              document_cpu_seconds=args.doc_cpu, log=log)
+    except OSError as e:
+        print(f"Could not start the service: {e}", file=sys.stderr)
+        return 3
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
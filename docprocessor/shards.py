@@ -0,0 +1,525 @@
+"""
+Streaming, sharded Excel output for Document Processor Pro
+
+Rows are spooled as worksheet XML as they are extracted, so memory does not
+depend on how many rows a run produces. A run carries on in the last shard
+while it has room, then rolls over to a new dated workbook (or a new sheet)
+once a row or size limit is reached, and a small index workbook lists every
+shard.
+
+Like WorkbookWriter, the shard workbooks are assembled zip member by zip
+member rather than through openpyxl: sheets already full are copied over as
+they are, and rows use inline strings so they need no shared string table.
+"""
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+from .workbook import (HEADERS, SHEET_TITLE, MAX_COLUMN_WIDTH, STREAM_CHUNK_SIZE, _replace_durably,
+                       _row_xml, _sheet_members, get_column_letter,
+                       ROW_APPENDED, ROW_UPDATED, ROW_SKIPPED, ROW_DUPLICATE)
+
+
+DEFAULT_SHARD_ROWS = 100000
+DEFAULT_SHARD_BYTES = 50 * 1024 * 1024
+
+# Where to roll over to when a shard is full
+ROLLOVER_WORKBOOK = "workbook"
+ROLLOVER_SHEET = "sheet"
+ROLLOVER_MODES = (ROLLOVER_WORKBOOK, ROLLOVER_SHEET)
+
+INDEX_SHEET_TITLE = "Shards"
+INDEX_HEADERS = ("Workbook", "Sheet", "Rows", "First PDF", "Last PDF", "Created")
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml."
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# Styles of a new shard workbook: the single default cell format Excel expects
+DEFAULT_STYLES = (
+    f'<styleSheet xmlns="{MAIN_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>')
+
+# Parts a continued workbook keeps from the saved file, since the sheets carried
+# over (written by openpyxl in older versions) may refer to them
+STYLES_PART = 'xl/styles.xml'
+SHARED_STRINGS_PART = 'xl/sharedStrings.xml'
+
+_ROW_TAG_RE = re.compile(rb'<row[\s>]')
+
+
+def shard_index_path_for(excel_path):
+    return excel_path + ".shards.sqlite"
+
+
+def index_workbook_path_for(excel_path):
+    return os.path.splitext(excel_path)[0] + "_index.xlsx"
+
+
+def reset_shard_index(excel_path):
+    """Forget which files have been streamed to shards"""
+    try:
+        os.remove(shard_index_path_for(excel_path))
+    except FileNotFoundError:
+        pass
+
+
+def _copy_sheet_rows(src, dst):
+    """Stream the rows of worksheet XML src to dst; returns the number of the last row"""
+    buf = b''
+    while True:
+        pos = buf.find(b'<sheetData')
+        close = buf.find(b'>', pos) if pos != -1 else -1
+        if close != -1:
+            break
+        chunk = src.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            raise ValueError("Worksheet has no sheetData element")
+        buf += chunk
+    if buf[close - 1:close] == b'/':
+        return 0
+
+    rows = 0
+    buf = buf[close + 1:]
+    while True:
+        end = buf.find(b'</sheetData>')
+        if end != -1:
+            rows += len(_ROW_TAG_RE.findall(buf, 0, end))
+            dst.write(buf[:end])
+            return rows
+        # Cut before the last tag, which may not have fully arrived yet
+        cut = buf.rfind(b'<')
+        if cut == -1:
+            cut = len(buf)
+        rows += len(_ROW_TAG_RE.findall(buf, 0, cut))
+        dst.write(buf[:cut])
+        buf = buf[cut:]
+        chunk = src.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            raise ValueError("Worksheet sheetData is not closed")
+        buf += chunk
+
+
+class _Sheet:
+    """A worksheet of the open workbook: carried over unchanged from the saved file, or open for rows"""
+
+    def __init__(self, title, shard_id, member=None):
+        self.title = title
+        self.shard_id = shard_id
+        # Zip member of the saved workbook that a carried sheet is copied from
+        self.member = member
+        # Row XML of an open sheet, spooled to disk as rows arrive
+        self.rows_xml = tempfile.TemporaryFile() if member is None else None
+        self.last_row = 0
+
+    def append(self, values):
+        """Add a row after the last one; returns the bytes of XML it took"""
+        self.last_row += 1
+        xml = _row_xml(self.last_row, values)
+        self.rows_xml.write(xml)
+        return len(xml)
+
+    def close(self):
+        if self.rows_xml is not None:
+            self.rows_xml.close()
+
+
+class StreamingWorkbookWriter:
+    """
+    Writes rows to a series of dated workbooks.
+
+    A shard is one worksheet. With ROLLOVER_WORKBOOK every shard gets its own
+    dated workbook; with ROLLOVER_SHEET a full shard starts a new sheet in the
+    same workbook, and a new workbook is only started when the size limit is
+    hit. Rows of the open shard are spooled to a temp file, and a workbook is
+    saved when it rolls over or the writer is closed, so load and save times
+    do not grow with the mailroom's history.
+
+    A run starts in the last workbook of the previous run while it has room:
+    that workbook's full sheets are carried over as they are, only its last
+    sheet's rows are read back, and the new file replaces it when saved. So a
+    schedule of small runs fills shards instead of leaving one small workbook
+    per run, and continuing costs at most one shard's rows per run.
+
+    Files already streamed with the same content are skipped, and renamed
+    copies of content already written are reported as duplicates. Full
+    shards are never rewritten, so a file whose content changed gets a new row.
+    """
+
+    def __init__(self, excel_path, max_rows=DEFAULT_SHARD_ROWS, max_bytes=DEFAULT_SHARD_BYTES,
+                 rollover=ROLLOVER_WORKBOOK):
+        if rollover not in ROLLOVER_MODES:
+            raise ValueError(f"Unknown shard rollover {rollover!r}; expected one of {', '.join(ROLLOVER_MODES)}")
+        self.excel_path = excel_path
+        self.max_rows = max(1, int(max_rows))
+        self.max_bytes = max_bytes
+        self.rollover = rollover
+        self.counts = {ROW_APPENDED: 0, ROW_UPDATED: 0, ROW_SKIPPED: 0, ROW_DUPLICATE: 0}
+        self.shards_written = []
+        # Rows passed to add(), and how many of those are settled on disk
+        self.rows_added = 0
+        self.rows_saved = 0
+        # Rows read back from saved workbooks that were continued
+        self.rows_copied = 0
+        # Seconds spent saving shard and index workbooks
+        self.timings = {'save': 0.0}
+
+        # Sheets of the open workbook, or None when no workbook is open
+        self.sheets = None
+        self.wb_path = None
+        # Saved file the open workbook continues, whose carried sheets and styles are copied from
+        self.wb_source = None
+        self.wb_bytes = 0
+        self.sheet = None
+        self.shard_id = None
+        self.shard_rows = 0
+        self.max_lens = {}
+        # Whether the last workbook of an earlier run has been considered for reuse
+        self.reuse_checked = False
+
+        self.conn = sqlite3.connect(shard_index_path_for(excel_path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " filename TEXT PRIMARY KEY, sha256 TEXT, shard INTEGER, row INTEGER)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS rows_sha256 ON rows (sha256)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS shards ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, workbook TEXT, sheet TEXT, rows INTEGER,"
+            " first_pdf TEXT, last_pdf TEXT, created TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS columns (col INTEGER PRIMARY KEY, max_len INTEGER)")
+        # Rows flushed but not yet saved in their workbook
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " shard INTEGER, row INTEGER, filename TEXT, data TEXT, PRIMARY KEY (shard, row))")
+        self.conn.commit()
+
+    # -- shard lifecycle -----------------------------------------------------
+
+    def _next_workbook_path(self):
+        base = os.path.splitext(self.excel_path)[0]
+        date = time.strftime('%Y-%m-%d')
+        seq = 1
+        while True:
+            path = f"{base}_{date}_{seq:03d}.xlsx"
+            if not os.path.exists(path):
+                return path
+            seq += 1
+
+    def _column_widths(self):
+        """Widths from the longest values seen in this and earlier shards"""
+        max_lens = {col: len(header) for col, header in enumerate(HEADERS, start=1)}
+        for col, length in self.conn.execute("SELECT col, max_len FROM columns"):
+            max_lens[col] = max(max_lens.get(col, 0), length)
+        for col, length in self.max_lens.items():
+            max_lens[col] = max(max_lens.get(col, 0), length)
+        return {col: min(length + 2, MAX_COLUMN_WIDTH) for col, length in max_lens.items()}
+
+    def _reopen_last_workbook(self):
+        """
+        Continue the last workbook written if it has room, or if it is missing
+        rows that were flushed but never saved into it (the writer that
+        flushed them stopped before closing).
+
+        Its full sheets are carried over unchanged; the last sheet, and any
+        sheet missing flushed rows, is read back and its missing rows replayed.
+        """
+        last = self.conn.execute("SELECT workbook FROM shards ORDER BY id DESC LIMIT 1").fetchone()
+        if last is None:
+            return
+        path = os.path.join(os.path.dirname(os.path.abspath(self.excel_path)), last[0])
+        shards = self.conn.execute(
+            "SELECT id, sheet, rows FROM shards WHERE workbook = ? ORDER BY id", (last[0],)).fetchall()
+        pending = {shard for shard, in self.conn.execute(
+            "SELECT DISTINCT shard FROM pending WHERE shard IN"
+            " (SELECT id FROM shards WHERE workbook = ?)", (last[0],))}
+        saved = os.path.exists(path)
+        if not pending and not saved:
+            return
+
+        source = zipfile.ZipFile(path) if saved else None
+        try:
+            members = dict(_sheet_members(source)) if source is not None else {}
+            if not pending:
+                last_full = shards[-1][2] >= self.max_rows
+                size = sum(source.getinfo(member).file_size for member in members.values())
+                if (last_full and self.rollover == ROLLOVER_WORKBOOK) or \
+                        (self.max_bytes and size >= self.max_bytes):
+                    return
+
+            self.sheets = []
+            self.wb_path = path
+            self.wb_source = path if saved else None
+            self.wb_bytes = 0
+            for index, (shard_id, title, rows) in enumerate(shards):
+                member = members.get(title)
+                has_room = index == len(shards) - 1 and rows < self.max_rows
+                if member is not None and shard_id not in pending and not has_room:
+                    self.sheets.append(_Sheet(title, shard_id, member))
+                    self.wb_bytes += source.getinfo(member).file_size
+                    continue
+
+                sheet = _Sheet(title, shard_id)
+                if member is not None:
+                    with source.open(member) as src:
+                        sheet.last_row = _copy_sheet_rows(src, sheet.rows_xml)
+                    self.rows_copied += max(0, sheet.last_row - 1)
+                if sheet.last_row == 0:
+                    sheet.append(HEADERS)
+                # Rows already in the file were saved by a writer stopped before it could say so
+                for filename, data in self.conn.execute(
+                        "SELECT filename, data FROM pending WHERE shard = ? AND row > ? ORDER BY row",
+                        (shard_id, sheet.last_row)).fetchall():
+                    sheet.append((filename, data))
+                self.wb_bytes += sheet.rows_xml.tell()
+                self.sheets.append(sheet)
+        finally:
+            if source is not None:
+                source.close()
+
+        sheet = self.sheets[-1]
+        if sheet.member is None:
+            self.sheet, self.shard_id, self.shard_rows = sheet, sheet.shard_id, sheet.last_row - 1
+
+    def _open_shard(self):
+        if self.sheets is None:
+            self.sheets = []
+            self.wb_path = self._next_workbook_path()
+            self.wb_source = None
+            self.wb_bytes = 0
+
+        sheet_title = SHEET_TITLE
+        if self.rollover == ROLLOVER_SHEET:
+            sheet_title = f"{SHEET_TITLE} {len(self.sheets) + 1}"
+        cursor = self.conn.execute(
+            "INSERT INTO shards (workbook, sheet, rows, created) VALUES (?, ?, 0, ?)",
+            (os.path.basename(self.wb_path), sheet_title, time.strftime('%Y-%m-%d %H:%M:%S')))
+        self.sheet = _Sheet(sheet_title, cursor.lastrowid)
+        self.wb_bytes += self.sheet.append(HEADERS)
+        self.sheets.append(self.sheet)
+        self.shard_id = self.sheet.shard_id
+        self.shard_rows = 0
+
+    def _sheet_xml(self, sheet, dst, widths):
+        cols = ''.join(f'<col min="{col}" max="{col}" width="{width}" customWidth="1"/>'
+                       for col, width in sorted(widths.items()))
+        dst.write((f'{XML_DECLARATION}<worksheet xmlns="{MAIN_NS}">'
+                   f'<dimension ref="A1:{get_column_letter(len(HEADERS))}{sheet.last_row}"/>'
+                   f'<cols>{cols}</cols><sheetData>').encode('utf-8'))
+        sheet.rows_xml.seek(0)
+        shutil.copyfileobj(sheet.rows_xml, dst, STREAM_CHUNK_SIZE)
+        sheet.rows_xml.seek(0, os.SEEK_END)
+        dst.write(b'</sheetData></worksheet>')
+
+    def _save(self, tmp_path):
+        """Write the open workbook to tmp_path"""
+        widths = self._column_widths()
+        source = zipfile.ZipFile(self.wb_source) if self.wb_source else None
+        try:
+            kept = [part for part in (STYLES_PART, SHARED_STRINGS_PART)
+                    if source is not None and part in source.namelist()]
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+                sheets_xml, rels_xml, overrides = [], [], []
+                for index, sheet in enumerate(self.sheets, start=1):
+                    member = f"xl/worksheets/sheet{index}.xml"
+                    with zout.open(member, 'w', force_zip64=True) as dst:
+                        if sheet.member is not None:
+                            with source.open(sheet.member) as src:
+                                shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+                        else:
+                            self._sheet_xml(sheet, dst, widths)
+                    sheets_xml.append(f'<sheet name={quoteattr(sheet.title)}'
+                                      f' sheetId="{index}" r:id="rId{index}"/>')
+                    rels_xml.append(f'<Relationship Id="rId{index}" Type="{REL_NS}/worksheet"'
+                                    f' Target="worksheets/sheet{index}.xml"/>')
+                    overrides.append(f'<Override PartName="/{member}"'
+                                     f' ContentType="{CONTENT_TYPE}worksheet+xml"/>')
+
+                for part in kept:
+                    with source.open(part) as src, zout.open(part, 'w') as dst:
+                        shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+                if STYLES_PART not in kept:
+                    zout.writestr(STYLES_PART, XML_DECLARATION + DEFAULT_STYLES)
+                parts = [(STYLES_PART, 'styles'), (SHARED_STRINGS_PART, 'sharedStrings')]
+                for number, (part, kind) in enumerate(parts, start=len(self.sheets) + 1):
+                    if part == STYLES_PART or part in kept:
+                        rels_xml.append(f'<Relationship Id="rId{number}" Type="{REL_NS}/{kind}"'
+                                        f' Target="{part[3:]}"/>')
+                        overrides.append(f'<Override PartName="/{part}"'
+                                         f' ContentType="{CONTENT_TYPE}{kind}+xml"/>')
+
+                zout.writestr('xl/workbook.xml', (
+                    f'{XML_DECLARATION}<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+                    f'<sheets>{"".join(sheets_xml)}</sheets></workbook>'))
+                zout.writestr('xl/_rels/workbook.xml.rels', (
+                    f'{XML_DECLARATION}<Relationships xmlns="{PACKAGE_REL_NS}">'
+                    f'{"".join(rels_xml)}</Relationships>'))
+                zout.writestr('_rels/.rels', (
+                    f'{XML_DECLARATION}<Relationships xmlns="{PACKAGE_REL_NS}">'
+                    f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+                    '</Relationships>'))
+                zout.writestr('[Content_Types].xml', (
+                    f'{XML_DECLARATION}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                    '<Default Extension="xml" ContentType="application/xml"/>'
+                    f'<Override PartName="/xl/workbook.xml" ContentType="{CONTENT_TYPE}sheet.main+xml"/>'
+                    f'{"".join(overrides)}</Types>'))
+        finally:
+            if source is not None:
+                source.close()
+
+    def _record_widths(self):
+        self.conn.executemany(
+            "INSERT INTO columns (col, max_len) VALUES (?, ?)"
+            " ON CONFLICT(col) DO UPDATE SET max_len = MAX(max_len, excluded.max_len)",
+            self.max_lens.items())
+
+    def _close_workbook(self):
+        if self.sheets is None:
+            return
+        started = time.perf_counter()
+        # Saved beside the shard first, since a continued shard replaces the earlier run's file
+        tmp_path = self.wb_path + ".tmp"
+        try:
+            self._save(tmp_path)
+            _replace_durably(tmp_path, self.wb_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.timings['save'] += time.perf_counter() - started
+        if self.wb_path not in self.shards_written:
+            self.shards_written.append(self.wb_path)
+        self.conn.executemany("DELETE FROM pending WHERE shard = ?",
+                              [(sheet.shard_id,) for sheet in self.sheets])
+        self._record_widths()
+        self.conn.commit()
+        self.rows_saved = self.rows_added
+        for sheet in self.sheets:
+            sheet.close()
+        self.sheets = None
+        self.sheet = None
+        self.wb_source = None
+
+    def _roll_over_if_full(self):
+        if not self.reuse_checked:
+            self.reuse_checked = True
+            self._reopen_last_workbook()
+
+        workbook_full = self.sheets is not None and self.max_bytes and self.wb_bytes >= self.max_bytes
+        shard_full = self.sheet is None or self.shard_rows >= self.max_rows
+        if workbook_full or (shard_full and self.rollover == ROLLOVER_WORKBOOK):
+            self._close_workbook()
+            self._open_shard()
+        elif shard_full:
+            self._open_shard()
+
+    # -- writing -------------------------------------------------------------
+
+    def add(self, filename, sha256, data):
+        """Stream one row into the current shard; returns the row outcome"""
+        existing = self.conn.execute(
+            "SELECT sha256 FROM rows WHERE filename = ?", (filename,)).fetchone()
+        if existing is not None and existing[0] == sha256:
+            self.rows_added += 1
+            self._settle_unwritten()
+            self.counts[ROW_SKIPPED] += 1
+            return ROW_SKIPPED
+        if existing is None and sha256 and self.conn.execute(
+                "SELECT 1 FROM rows WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+            self.rows_added += 1
+            self._settle_unwritten()
+            self.counts[ROW_DUPLICATE] += 1
+            return ROW_DUPLICATE
+
+        # Saving a full workbook settles the rows before this one, not this one
+        self._roll_over_if_full()
+        self.rows_added += 1
+        values = (filename, data)
+        self.wb_bytes += self.sheet.append(values)
+        self.shard_rows += 1
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO rows (filename, sha256, shard, row) VALUES (?, ?, ?, ?)",
+            (filename, sha256, self.shard_id, self.sheet.last_row))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pending (shard, row, filename, data) VALUES (?, ?, ?, ?)",
+            (self.shard_id, self.sheet.last_row, filename, data))
+        self.conn.execute(
+            "UPDATE shards SET rows = ?, first_pdf = COALESCE(first_pdf, ?), last_pdf = ? WHERE id = ?",
+            (self.shard_rows, filename, filename, self.shard_id))
+        for col, value in enumerate(values, start=1):
+            if value is not None:
+                self.max_lens[col] = max(self.max_lens.get(col, 0), len(str(value)))
+
+        outcome = ROW_UPDATED if existing is not None else ROW_APPENDED
+        self.counts[outcome] += 1
+        return outcome
+
+    def _settle_unwritten(self):
+        # A row that needs no write is settled as soon as every row before it is
+        if self.sheets is None:
+            self.rows_saved = self.rows_added
+
+    def flush(self):
+        """
+        Make the rows added so far durable.
+
+        They are committed to the shard index's pending table, not saved into
+        the workbook, so a flush costs the rows added since the last one
+        however large the open shard is. The workbook takes them in when it
+        is saved, on rolling over or closing, or, if this writer stops before
+        then, when the next one continues it (see _reopen_last_workbook).
+        """
+        self._record_widths()
+        self.conn.commit()
+        self.rows_saved = self.rows_added
+        return self.counts
+
+    def write_index_workbook(self):
+        """Rewrite the small workbook that lists every shard"""
+        from openpyxl import Workbook
+
+        started = time.perf_counter()
+        wb = Workbook(write_only=True)
+        sheet = wb.create_sheet(INDEX_SHEET_TITLE)
+        for col, width in enumerate((34, 20, 10, 30, 30, 20), start=1):
+            sheet.column_dimensions[get_column_letter(col)].width = width
+        sheet.append(list(INDEX_HEADERS))
+        for row in self.conn.execute(
+                "SELECT workbook, sheet, rows, first_pdf, last_pdf, created FROM shards"
+                " WHERE rows > 0 ORDER BY id"):
+            sheet.append(list(row))
+        wb.save(index_workbook_path_for(self.excel_path))
+        wb.close()
+        self.timings['save'] += time.perf_counter() - started
+
+    def close(self):
+        try:
+            if not self.reuse_checked and self.conn.execute("SELECT 1 FROM pending LIMIT 1").fetchone():
+                # Rows an earlier writer flushed but never saved
+                self.reuse_checked = True
+                self._reopen_last_workbook()
+            self._close_workbook()
+            # Drop shard entries for sheets that never received a row
+            self.conn.execute("DELETE FROM shards WHERE rows = 0")
+            self.conn.commit()
+            if self.shards_written:
+                self.write_index_workbook()
+            self.rows_saved = self.rows_added
+        finally:
+            self.conn.close()
+        return self.counts
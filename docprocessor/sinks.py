@@ -0,0 +1,526 @@
+"""
+Output sinks for Document Processor Pro
+
+Every output takes rows through the same add/flush/close interface as the
+Excel writers: CSV, newline-delimited JSON (to a file or stdout), SQLite and
+Parquet sit alongside the .xlsx workbook, and a SinkGroup fans each row out
+to several of them in one run. The format is chosen from the file extension.
+"""
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from abc import ABC, abstractmethod
+
+from .shards import StreamingWorkbookWriter, DEFAULT_SHARD_ROWS, ROLLOVER_WORKBOOK
+from .workbook import (WorkbookWriter, index_path_for, _replace_durably,
+                       ROW_APPENDED, ROW_UPDATED, ROW_SKIPPED, ROW_DUPLICATE)
+
+
+FORMAT_XLSX = "xlsx"
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+FORMAT_SQLITE = "sqlite"
+FORMAT_PARQUET = "parquet"
+
+EXTENSIONS = {
+    ".csv": FORMAT_CSV,
+    ".ndjson": FORMAT_NDJSON,
+    ".jsonl": FORMAT_NDJSON,
+    ".sqlite": FORMAT_SQLITE,
+    ".sqlite3": FORMAT_SQLITE,
+    ".db": FORMAT_SQLITE,
+    ".parquet": FORMAT_PARQUET,
+}
+
+# Output path that writes NDJSON to standard output
+STDOUT = "-"
+
+# Columns of every non-Excel output, in order
+FIELDS = ("file", "sha256", "data", "written_at")
+
+# Rows per SQLite transaction
+SQLITE_BATCH_ROWS = 1000
+
+# Rows per Parquet row group, and per part file before a new one is started
+PARQUET_ROW_GROUP_ROWS = 50000
+PARQUET_PART_ROWS = 1000000
+
+# Files in a Parquet output folder for the part being written and its durable rows
+PARQUET_UNFINISHED_PART = "_unfinished.parquet"
+PARQUET_STAGING_FILE = "_staging.ndjson"
+
+
+def sink_format(path):
+    """Output format for a path; anything not recognised is an Excel workbook, as before"""
+    if path == STDOUT:
+        return FORMAT_NDJSON
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), FORMAT_XLSX)
+
+
+def open_sink(path, streaming=False, shard_rows=DEFAULT_SHARD_ROWS, shard_rollover=ROLLOVER_WORKBOOK):
+    """Open the writer for an output path; raises ValueError if it cannot be written in that format"""
+    output_format = sink_format(path)
+    if streaming and output_format != FORMAT_XLSX:
+        raise ValueError(f"Streaming to dated workbooks needs an .xlsx output, not {path}.")
+    if output_format == FORMAT_XLSX:
+        if streaming:
+            return StreamingWorkbookWriter(path, max_rows=shard_rows, rollover=shard_rollover)
+        return WorkbookWriter(path)
+    if output_format == FORMAT_CSV:
+        return CsvSink(path)
+    if output_format == FORMAT_NDJSON:
+        return NdjsonSink(path)
+    if output_format == FORMAT_SQLITE:
+        return SqliteSink(path)
+    return ParquetSink(path)
+
+
+def _sink_path(sink):
+    # The Excel writers predate the other sinks and name their path excel_path
+    return getattr(sink, 'path', None) or sink.excel_path
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _new_counts():
+    return {ROW_APPENDED: 0, ROW_UPDATED: 0, ROW_SKIPPED: 0, ROW_DUPLICATE: 0}
+
+
+class RowIndex:
+    """
+    Which files, and which file contents, an append-only output already holds.
+
+    Kept in <output>.index.sqlite, like the workbook's row index. Rows are
+    recorded as they are written and committed once the output has them on
+    disk, so after a crash a row can be written twice but never lost.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows (filename TEXT PRIMARY KEY, sha256 TEXT)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS rows_sha256 ON rows (sha256)")
+        self.conn.commit()
+
+    def outcome(self, filename, sha256):
+        """What writing this row would be: appended, updated, skipped or duplicate"""
+        existing = self.conn.execute(
+            "SELECT sha256 FROM rows WHERE filename = ?", (filename,)).fetchone()
+        if existing is not None:
+            return ROW_SKIPPED if existing[0] == sha256 else ROW_UPDATED
+        if sha256 and self.conn.execute(
+                "SELECT 1 FROM rows WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+            return ROW_DUPLICATE
+        return ROW_APPENDED
+
+    def remember(self, filename, sha256):
+        self.conn.execute("INSERT OR REPLACE INTO rows (filename, sha256) VALUES (?, ?)",
+                          (filename, sha256))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class AppendOnlySink(ABC):
+    """
+    Base for outputs that can only be appended to.
+
+    Files already written with the same content are skipped and renamed
+    copies are reported as duplicates, as in the workbook. Rows are never
+    rewritten, so a file whose content changed gets a new row; the latest
+    written_at wins downstream. Subclasses must implement _write_row, _save
+    (returning True once every row written is on disk) and _close; one that
+    does not cannot be instantiated.
+    """
+
+    def __init__(self, path, indexed=True):
+        self.path = path
+        self.counts = _new_counts()
+        # Rows passed to add(), and how many of those are settled on disk
+        self.rows_added = 0
+        self.rows_saved = 0
+        # Seconds spent serialising rows and forcing them to disk
+        self.timings = {'write': 0.0, 'save': 0.0}
+        self.index = RowIndex(index_path_for(path)) if indexed else None
+
+    def add(self, filename, sha256, data):
+        """Write one row (or skip it); returns the row outcome"""
+        self.rows_added += 1
+        outcome = self.index.outcome(filename, sha256) if self.index is not None else ROW_APPENDED
+        if outcome in (ROW_SKIPPED, ROW_DUPLICATE):
+            self.counts[outcome] += 1
+            return outcome
+
+        started = time.perf_counter()
+        self._write_row({'file': filename, 'sha256': sha256, 'data': data, 'written_at': _now()})
+        self.timings['write'] += time.perf_counter() - started
+        if self.index is not None:
+            self.index.remember(filename, sha256)
+        self.counts[outcome] += 1
+        return outcome
+
+    def _settled(self):
+        if self.index is not None:
+            self.index.commit()
+        self.rows_saved = self.rows_added
+
+    def flush(self):
+        """Force the rows written so far to disk where the format allows it"""
+        started = time.perf_counter()
+        if self._save():
+            self._settled()
+        self.timings['save'] += time.perf_counter() - started
+        return self.counts
+
+    def close(self):
+        try:
+            started = time.perf_counter()
+            self._close()
+            self.timings['save'] += time.perf_counter() - started
+            self._settled()
+        finally:
+            if self.index is not None:
+                self.index.close()
+        return self.counts
+
+    @abstractmethod
+    def _write_row(self, row):
+        """Write one row dict with the FIELDS keys"""
+
+    @abstractmethod
+    def _save(self):
+        """Force the rows written to disk; returns True if they all are"""
+
+    @abstractmethod
+    def _close(self):
+        """Save the rows written and release the output"""
+
+
+class _TextFileSink(AppendOnlySink):
+    """A text file opened for appending and fsync'd on flush"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.file = open(path, 'a', encoding='utf-8', newline='')
+        self.new_file = self.file.tell() == 0
+
+    def _save(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return True
+
+    def _close(self):
+        try:
+            self._save()
+        finally:
+            self.file.close()
+
+
+class CsvSink(_TextFileSink):
+    """Rows appended to a UTF-8 CSV file with a header line"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.writer = csv.writer(self.file)
+        if self.new_file:
+            self.writer.writerow(FIELDS)
+
+    def _write_row(self, row):
+        self.writer.writerow([row[field] for field in FIELDS])
+
+
+class NdjsonSink(_TextFileSink):
+    """
+    One JSON object per line, appended to a file or written to stdout.
+
+    Stdout is a pipe to another program, so it has no row index: every row
+    of the run is written.
+    """
+
+    def __init__(self, path):
+        if path == STDOUT:
+            AppendOnlySink.__init__(self, path, indexed=False)
+            self.file = sys.stdout
+        else:
+            super().__init__(path)
+
+    def _write_row(self, row):
+        self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def _save(self):
+        if self.path == STDOUT:
+            self.file.flush()
+            return True
+        return super()._save()
+
+    def _close(self):
+        if self.path == STDOUT:
+            self.file.flush()
+        else:
+            super()._close()
+
+
+class SqliteSink:
+    """
+    Rows kept in the extracted_data table of a SQLite database.
+
+    Keyed by filename like the workbook, so a file whose content changed has
+    its row replaced rather than added again. Rows are written in
+    transactions of SQLITE_BATCH_ROWS, and the database is in WAL mode so
+    other programs can read it while a run is writing.
+    """
+
+    def __init__(self, path, batch_rows=SQLITE_BATCH_ROWS):
+        self.path = path
+        self.batch_rows = max(1, int(batch_rows))
+        self.counts = _new_counts()
+        self.rows_added = 0
+        self.rows_saved = 0
+        self.timings = {'write': 0.0, 'save': 0.0}
+        self._pending = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS extracted_data ("
+            " file TEXT PRIMARY KEY, sha256 TEXT, data TEXT, written_at TEXT)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS extracted_data_sha256 ON extracted_data (sha256)")
+        self.conn.commit()
+
+    def add(self, filename, sha256, data):
+        """Write one row in the open transaction; returns the row outcome"""
+        self.rows_added += 1
+        started = time.perf_counter()
+        existing = self.conn.execute(
+            "SELECT sha256 FROM extracted_data WHERE file = ?", (filename,)).fetchone()
+        if existing is not None and existing[0] == sha256:
+            outcome = ROW_SKIPPED
+        elif existing is None and sha256 and self.conn.execute(
+                "SELECT 1 FROM extracted_data WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+            outcome = ROW_DUPLICATE
+        else:
+            outcome = ROW_UPDATED if existing is not None else ROW_APPENDED
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extracted_data (file, sha256, data, written_at) VALUES (?, ?, ?, ?)",
+                (filename, sha256, data, _now()))
+            self._pending += 1
+        self.timings['write'] += time.perf_counter() - started
+        self.counts[outcome] += 1
+        if self._pending >= self.batch_rows:
+            self.flush()
+        return outcome
+
+    def flush(self):
+        """Commit the open transaction"""
+        started = time.perf_counter()
+        self.conn.commit()
+        self._pending = 0
+        self.rows_saved = self.rows_added
+        self.timings['save'] += time.perf_counter() - started
+        return self.counts
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+        return self.counts
+
+
+class ParquetSink(AppendOnlySink):
+    """
+    Rows written as a Parquet dataset: a folder of part files.
+
+    Each run adds part-<date>-<time>-<nnn>.parquet files to the folder, which
+    pandas, DuckDB, Spark and Arrow read back as one table. A Parquet file is
+    only readable once its footer is written, so the open part is written as
+    _unfinished.parquet (readers skip names starting with '_') and renamed
+    once it reaches PARQUET_PART_ROWS rows or the run ends. Until then its
+    rows are also appended to _staging.ndjson, which flush() fsyncs, so
+    frequent flushes cost a line per row rather than a small part each. A
+    run that stops early leaves its rows there and the next run starts its
+    first part with them. Needs pyarrow, which is imported when the first
+    part is opened.
+    """
+
+    def __init__(self, path, row_group_rows=PARQUET_ROW_GROUP_ROWS, part_rows=PARQUET_PART_ROWS):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow).")
+        os.makedirs(path, exist_ok=True)
+        super().__init__(path)
+        self.row_group_rows = max(1, int(row_group_rows))
+        self.part_rows = max(self.row_group_rows, int(part_rows))
+        self.columns = {field: [] for field in FIELDS}
+        self.writer = None
+        self.unfinished_path = os.path.join(path, PARQUET_UNFINISHED_PART)
+        self.part_written = 0
+        self.parts_written = []
+        # Rows carried over from a run that stopped before finishing its part
+        self.rows_recovered = 0
+
+        # An unfinished part left by such a run is rebuilt from the staged rows
+        if os.path.exists(self.unfinished_path):
+            os.remove(self.unfinished_path)
+        self.staging = open(os.path.join(path, PARQUET_STAGING_FILE), 'a+b')
+        self._recover_staged_rows()
+
+    def _recover_staged_rows(self):
+        self.staging.seek(0)
+        good_end = 0
+        for line in self.staging:
+            try:
+                row = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                row = None
+            if row is None:
+                # Cut short by the crash; it was never flushed
+                self.staging.truncate(good_end)
+                break
+            good_end += len(line)
+            self._buffer(row)
+            self.rows_recovered += 1
+
+    def _next_part_path(self):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        seq = 1
+        while True:
+            path = os.path.join(self.path, f"part-{stamp}-{seq:03d}.parquet")
+            if not os.path.exists(path):
+                return path
+            seq += 1
+
+    def _write_row_group(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.columns['file']:
+            return
+        table = pa.table({field: pa.array(values, type=pa.string())
+                          for field, values in self.columns.items()})
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.unfinished_path, table.schema)
+        self.writer.write_table(table)
+        self.part_written += table.num_rows
+        self.columns = {field: [] for field in FIELDS}
+
+    def _finish_part(self):
+        self._write_row_group()
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.writer = None
+        part_path = self._next_part_path()
+        _replace_durably(self.unfinished_path, part_path)
+        self.parts_written.append(part_path)
+        self.part_written = 0
+        # Its rows are in the finished part now
+        self.staging.truncate(0)
+        self._sync_staging()
+
+    def _sync_staging(self):
+        self.staging.flush()
+        os.fsync(self.staging.fileno())
+
+    def _buffer(self, row):
+        for field in FIELDS:
+            self.columns[field].append(row[field])
+        if len(self.columns['file']) >= self.row_group_rows:
+            self._write_row_group()
+
+    def _write_row(self, row):
+        self.staging.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b"\n")
+        self._buffer(row)
+        if self.part_written >= self.part_rows:
+            self._finish_part()
+            self._settled()
+
+    def _save(self):
+        self._sync_staging()
+        return True
+
+    def _close(self):
+        try:
+            self._finish_part()
+        finally:
+            self.staging.close()
+        os.remove(self.staging.name)
+
+
+class SinkGroup:
+    """
+    Several outputs written together.
+
+    Each row goes to every sink in turn, each keeping its own row index, so
+    one output can be added to a run without disturbing the others. The
+    first sink is the primary output: its counts are the run's row counts.
+    A row counts as saved once every sink has it on disk.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self.primary = self.sinks[0]
+
+    @property
+    def rows_added(self):
+        return self.primary.rows_added
+
+    @property
+    def rows_saved(self):
+        return min(sink.rows_saved for sink in self.sinks)
+
+    @property
+    def counts(self):
+        return self.primary.counts
+
+    @property
+    def timings(self):
+        """The primary's timings, then every other sink's prefixed with its format"""
+        timings = dict(self.primary.timings)
+        for sink in self.sinks[1:]:
+            for stage, seconds in sink.timings.items():
+                key = f"{sink_format(_sink_path(sink))}_{stage}"
+                timings[key] = timings.get(key, 0.0) + seconds
+        return timings
+
+    def add(self, filename, sha256, data):
+        outcome = None
+        for sink in self.sinks:
+            result = sink.add(filename, sha256, data)
+            if sink is self.primary:
+                outcome = result
+        return outcome
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+        return self.counts
+
+    def close(self):
+        """Close every sink, even if one fails; the first failure is raised"""
+        error = None
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return self.counts
+
+    def outputs(self):
+        """[{'output', 'format', 'rows'}] for every sink, for the run summary"""
+        result = []
+        for sink in self.sinks:
+            path = _sink_path(sink)
+            result.append({'output': path if path == STDOUT else os.path.abspath(path),
+                           'format': sink_format(path), 'rows': dict(sink.counts)})
+        return result
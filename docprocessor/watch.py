@@ -0,0 +1,165 @@
+"""
+Watch-folder mode for Document Processor Pro
+Polls a folder and processes PDFs as they arrive, once they have finished writing
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .address import DUPLICATES_FLAG
+from .core import process_files
+from .discovery import list_directory, DEFAULT_INCLUDE, DEFAULT_EXCLUDE
+from .engine import default_worker_count, DEFAULT_WORKER_MEMORY_MB
+from .watchdog import DEFAULT_DOCUMENT_TIMEOUT, DEFAULT_DOCUMENT_CPU_SECONDS
+from .rules import DEFAULT_RULES
+
+
+DEFAULT_POLL_SECONDS = 1.0
+DEFAULT_SETTLE_SECONDS = 2.0
+RETRY_SECONDS = 10.0
+
+# Directory mtimes do not change when a file is rewritten in place, so list
+# the folder at least this often even when it looks untouched
+FULL_RESCAN_SECONDS = 30.0
+
+
+def _no_log(message):
+    pass
+
+
+def _readable(path):
+    """False while another process still holds the file open for writing (Windows)"""
+    try:
+        with open(path, 'rb'):
+            return True
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """
+    Tracks a folder and reports PDFs that are new or changed and have settled.
+
+    A file is ready once its size and mtime have stayed the same for
+    settle_seconds, so half-copied scans and mail-merge exports are not picked
+    up early. While nothing is pending, a poll is a single stat of the folder.
+    """
+
+    def __init__(self, folder_path, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 full_rescan_seconds=FULL_RESCAN_SECONDS, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE):
+        self.folder_path = folder_path
+        self.include = include
+        self.exclude = exclude
+        self.settle_seconds = settle_seconds
+        self.full_rescan_seconds = full_rescan_seconds
+        self.processed = {}
+        self.pending = {}
+        self.dir_mtime = None
+        self.last_listing = None
+
+    def _list(self):
+        files, _ = list_directory(self.folder_path, self.include, self.exclude)
+        return {os.path.join(self.folder_path, name): signature for name, signature in files.items()}
+
+    def poll(self, now=None):
+        """Return the sorted list of files ready to process"""
+        now = time.monotonic() if now is None else now
+        dir_mtime = os.stat(self.folder_path).st_mtime_ns
+        if (not self.pending and dir_mtime == self.dir_mtime
+                and now - self.last_listing < self.full_rescan_seconds):
+            return []
+        self.dir_mtime = dir_mtime
+        self.last_listing = now
+
+        files = self._list()
+        ready = []
+        for path, signature in files.items():
+            if self.processed.get(path) == signature:
+                self.pending.pop(path, None)
+                continue
+            seen = self.pending.get(path)
+            if seen is None or seen[0] != signature:
+                self.pending[path] = (signature, now)
+                continue
+            if (now - seen[1] >= self.settle_seconds and signature[0] > 0
+                    and _readable(path)):
+                ready.append(path)
+
+        # Forget files that have been moved or deleted
+        for path in [p for p in self.pending if p not in files]:
+            del self.pending[path]
+        for path in [p for p in self.processed if p not in files]:
+            del self.processed[path]
+
+        return sorted(ready)
+
+    def mark_processed(self, paths):
+        for path in paths:
+            seen = self.pending.pop(path, None)
+            if seen is not None:
+                self.processed[path] = seen[0]
+
+
+def watch_folder(folder_path, excel_path, workers=None, rules=DEFAULT_RULES, use_cache=True,
+                 poll_seconds=DEFAULT_POLL_SECONDS, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 log=_no_log, on_batch=None, stop_event=None, metrics_textfile=None,
+                 duplicates=DUPLICATES_FLAG, worker_memory_mb=DEFAULT_WORKER_MEMORY_MB,
+                 document_timeout=DEFAULT_DOCUMENT_TIMEOUT,
+                 document_cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS,
+                 include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, outputs=()):
+    """
+    Process PDFs in folder_path as they arrive until stop_event is set.
+
+    Files already in the folder are processed first; the extraction cache and
+    the workbook's row index make that cheap for files seen by earlier runs.
+    Each batch is appended to excel_path (and to every path in outputs) and
+    its summary passed to on_batch.
+    A batch that fails (for example because the workbook is open in Excel) is
+    retried on the next poll. The warm pool is replaced after a batch in which
+    a worker grew past worker_memory_mb or died. A PDF that overruns its
+    document_timeout or document_cpu_seconds budget is quarantined.
+    """
+    if not os.path.isdir(folder_path):
+        raise ValueError("PDF folder does not exist.")
+
+    stop_event = stop_event or threading.Event()
+    workers = max(1, int(workers or default_worker_count()))
+    watcher = FolderWatcher(folder_path, settle_seconds, include=include, exclude=exclude)
+    executor = None
+
+    log(f"👁️ Watching {folder_path} for new PDF files...")
+    try:
+        while not stop_event.is_set():
+            ready = watcher.poll()
+            if ready:
+                # Keep the pool warm between batches so each drop is picked up quickly
+                if executor is None and (workers > 1 or document_timeout or document_cpu_seconds):
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                try:
+                    summary = process_files(ready, excel_path, workers, rules,
+                                            use_cache=use_cache, log=log, executor=executor,
+                                            metrics_textfile=metrics_textfile,
+                                            duplicates=duplicates,
+                                            worker_memory_mb=worker_memory_mb,
+                                            document_timeout=document_timeout,
+                                            document_cpu_seconds=document_cpu_seconds,
+                                            outputs=outputs, root=folder_path)
+                except Exception as e:
+                    log(f"❌ Batch of {len(ready)} file(s) failed, retrying in {RETRY_SECONDS:.0f}s: {e}")
+                    stop_event.wait(RETRY_SECONDS)
+                else:
+                    if executor is not None and (summary['workers_over_memory'] or summary['worker_crashes']
+                                                 or summary['pool_broken']):
+                        log("♻️ A worker went over its memory limit or died; starting a fresh pool.")
+                        executor.shutdown()
+                        executor = None
+                    watcher.mark_processed(ready)
+                    summary['folder'] = os.path.abspath(folder_path)
+                    if on_batch is not None:
+                        on_batch(summary)
+            stop_event.wait(poll_seconds)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        log("👁️ Stopped watching folder.")
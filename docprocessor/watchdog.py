@@ -0,0 +1,175 @@
+"""
+Per-document time budget for Document Processor Pro
+Runs inside worker processes, so a malformed PDF cannot hold a whole batch hostage
+"""
+import ctypes
+import os
+import threading
+import time
+
+
+# Budget per document: wall-clock seconds and CPU seconds; 0 turns either check off
+DEFAULT_DOCUMENT_TIMEOUT = 120.0
+DEFAULT_DOCUMENT_CPU_SECONDS = 60.0
+
+# Time a document gets to unwind after being interrupted before its worker process is killed
+KILL_GRACE_SECONDS = 5.0
+
+# How often the watchdog looks at the running document
+CHECK_SECONDS = 0.1
+
+# Exit status of a worker killed by its watchdog
+KILLED_EXIT_CODE = 70
+
+# Folder, next to the PDF, that documents over their budget are moved to
+QUARANTINE_DIR = "quarantine"
+
+
+class DocumentTimeout(BaseException):
+    """
+    Raised in the thread parsing a document that went over its budget.
+
+    It derives from BaseException so that the `except Exception` handlers in
+    PyPDF2 and in extract_document do not swallow it.
+    """
+
+
+class Watchdog:
+    """
+    Background thread that keeps one document at a time within its budget.
+
+    When the running document uses more wall-clock or CPU time than allowed,
+    DocumentTimeout is raised in the thread parsing it, which abandons the
+    document at the next Python instruction. A parser stuck inside C code
+    never gets there, so if the document is still running KILL_GRACE_SECONDS
+    later the whole process exits. That is only safe in a worker process,
+    whose pool notices the loss and carries on without it.
+    """
+
+    def __init__(self, kill=True):
+        self.kill = kill
+        self._lock = threading.Lock()
+        self._current = None
+        self.reason = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def watch(self, timeout=DEFAULT_DOCUMENT_TIMEOUT, cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS):
+        """Context manager that runs its body under the budget; raises DocumentTimeout when it is exceeded"""
+        return _Watch(self, timeout, cpu_seconds)
+
+    def _start(self, timeout, cpu_seconds):
+        with self._lock:
+            self.reason = None
+            self._current = {
+                'thread': threading.get_ident(),
+                'wall': time.monotonic(),
+                'cpu': time.process_time(),
+                'timeout': timeout,
+                'cpu_seconds': cpu_seconds,
+                'interrupted': None,
+            }
+
+    def _stop(self):
+        """Finish the current document; returns True if it was interrupted"""
+        with self._lock:
+            current, self._current = self._current, None
+        if current is None or current['interrupted'] is None:
+            return False
+        # The document may have finished just as it was interrupted; drop an exception not yet delivered
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(current['thread']), None)
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(CHECK_SECONDS)
+            with self._lock:
+                current = self._current
+                if current is None:
+                    continue
+                now = time.monotonic()
+                if current['interrupted'] is not None:
+                    if self.kill and now - current['interrupted'] >= KILL_GRACE_SECONDS:
+                        os._exit(KILLED_EXIT_CODE)
+                    continue
+
+                reason = self._over_budget(current, now)
+                if reason is not None:
+                    self.reason = reason
+                    current['interrupted'] = now
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                        ctypes.c_ulong(current['thread']), ctypes.py_object(DocumentTimeout))
+
+    @staticmethod
+    def _over_budget(current, now):
+        elapsed = now - current['wall']
+        if current['timeout'] and elapsed > current['timeout']:
+            return f"took longer than {current['timeout']:g}s"
+        cpu = time.process_time() - current['cpu']
+        if current['cpu_seconds'] and cpu > current['cpu_seconds']:
+            return f"used more than {current['cpu_seconds']:g}s of CPU"
+        return None
+
+
+class _Watch:
+    def __init__(self, watchdog, timeout, cpu_seconds):
+        self.watchdog = watchdog
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+
+    def __enter__(self):
+        self.watchdog._start(self.timeout, self.cpu_seconds)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        interrupted = self.watchdog._stop()
+        if interrupted and exc_type is None:
+            raise DocumentTimeout()
+        return False
+
+
+_watchdog = None
+
+
+def worker_watchdog():
+    """The watchdog of this worker process, started on first use"""
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = Watchdog()
+    return _watchdog
+
+
+def _quarantine_target(folder, name):
+    """Reserve a free name in the quarantine folder, "letter (2).pdf" if "letter.pdf" is taken"""
+    stem, ext = os.path.splitext(name)
+    seq = 1
+    while True:
+        target = os.path.join(folder, name if seq == 1 else f"{stem} ({seq}){ext}")
+        try:
+            os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return target
+        except FileExistsError:
+            seq += 1
+
+
+def quarantine(file_path):
+    """
+    Move a document into the quarantine folder next to it; returns the new
+    path, or None if it could not be moved. An earlier document of the same
+    name already there is kept, and this one gets a numbered name.
+    """
+    folder = os.path.join(os.path.dirname(file_path), QUARANTINE_DIR)
+    target = None
+    try:
+        os.makedirs(folder, exist_ok=True)
+        target = _quarantine_target(folder, os.path.basename(file_path))
+        # Replaces only the empty file that reserved the name
+        os.replace(file_path, target)
+    except OSError:
+        if target is not None:
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+        return None
+    return target
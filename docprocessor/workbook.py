@@ -0,0 +1,522 @@
+"""
+Append-only, idempotent Excel writer for Document Processor Pro
+
+Instead of loading the whole workbook with openpyxl, new rows are spliced into
+the worksheet XML in a single streaming pass, and a SQLite index next to the
+workbook remembers which files (and which file contents) have already been
+written and how wide each column needs to be.
+
+An .xlsx file is a zip archive with the sheet as one compressed member, so
+each write still inflates and deflates the whole sheet: a write costs time in
+proportion to the workbook, not the batch (about 0.5 s for 500 rows into a
+200,000-row workbook), though memory stays flat. Callers keep this bounded by
+writing less often as writes get slower (see FLUSH_COST_RATIO in core).
+"""
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape, unescape
+
+# openpyxl is imported where it is used so that importing this module (and
+# starting the desktop app) stays fast
+
+
+SHEET_TITLE = "Extracted Data"
+HEADERS = ("PDF File", "Extracted Data")
+MAX_COLUMN_WIDTH = 50
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Row outcomes reported by WorkbookWriter.write
+ROW_APPENDED = "appended"
+ROW_UPDATED = "updated"
+ROW_SKIPPED = "skipped"
+ROW_DUPLICATE = "duplicate"
+
+
+# Control characters that are not allowed in worksheet XML (same set openpyxl rejects)
+ILLEGAL_CHARACTERS_RE = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+
+def get_column_letter(col):
+    """Spreadsheet column letter for a 1-based column number"""
+    letters = ''
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def index_path_for(excel_path):
+    return excel_path + ".index.sqlite"
+
+
+def new_workbook(excel_path):
+    """Write an empty workbook containing only the header row"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    sheet = wb.active
+    sheet.title = SHEET_TITLE
+    sheet['A1'] = HEADERS[0]
+    sheet['B1'] = HEADERS[1]
+    wb.save(excel_path)
+    wb.close()
+
+
+def reset_index(excel_path):
+    """Forget everything written to a workbook, e.g. after it has been cleared"""
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(index_path_for(excel_path) + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _fsync_directory(directory):
+    """Make a rename in directory durable; Windows cannot open a directory to fsync it"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _replace_durably(tmp_path, path):
+    """
+    Swap a finished temp file in for path. The temp file is fsync'd first and
+    the directory after, so a power loss leaves either the old file or the
+    new one whole, never an empty or truncated one.
+    """
+    # Windows only commits a file opened for writing
+    with open(tmp_path, 'r+b') as f:
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def _cell_text(value):
+    return ILLEGAL_CHARACTERS_RE.sub('', str(value))
+
+
+def _row_xml(row_num, values):
+    """Serialise one row using inline strings so the shared string table is untouched"""
+    cells = []
+    for col, value in enumerate(values, start=1):
+        if value is None:
+            continue
+        ref = f"{get_column_letter(col)}{row_num}"
+        cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">'
+                     f'{escape(_cell_text(value))}</t></is></c>')
+    return f'<row r="{row_num}">{"".join(cells)}</row>'.encode('utf-8')
+
+
+def _sheet_members(zin):
+    """(title, zip member name) of each worksheet, in workbook order"""
+    workbook_xml = zin.read('xl/workbook.xml').decode('utf-8')
+    rels_xml = zin.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+    targets = {}
+    for rel in re.finditer(r'<Relationship\b[^>]*>', rels_xml):
+        rel_id = re.search(r'\bId="([^"]+)"', rel.group(0))
+        target = re.search(r'\bTarget="([^"]+)"', rel.group(0))
+        if rel_id and target:
+            targets[rel_id.group(1)] = target.group(1)
+    members = []
+    for sheet in re.finditer(r'<(?:\w+:)?sheet\b[^>]*>', workbook_xml):
+        title = re.search(r'\bname="([^"]*)"', sheet.group(0)).group(1)
+        target = targets[re.search(r'\br:id="([^"]+)"', sheet.group(0)).group(1)]
+        member = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+        members.append((unescape(title, {'&quot;': '"', '&apos;': "'"}), member))
+    return members
+
+
+def _first_sheet_member(zin):
+    """Zip member name of the workbook's first worksheet"""
+    try:
+        return _sheet_members(zin)[0][1]
+    except (KeyError, AttributeError, IndexError):
+        return 'xl/worksheets/sheet1.xml'
+
+
+class _StaleIndex(Exception):
+    """Rows recorded in the index were not found in the worksheet"""
+
+
+class _SheetPatcher:
+    """Streams worksheet XML from src to dst, replacing and appending rows on the way"""
+
+    def __init__(self, src, dst):
+        self.src = src
+        self.dst = dst
+        self.buf = b''
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.src.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _find(self, pattern, flush=True):
+        """Index of pattern in the buffer, streaming earlier bytes to dst; -1 at EOF"""
+        while True:
+            pos = self.buf.find(pattern)
+            if pos != -1:
+                return pos
+            if flush and len(self.buf) > len(pattern):
+                keep = len(pattern) - 1
+                self.dst.write(self.buf[:-keep] if keep else self.buf)
+                self.buf = self.buf[-keep:] if keep else b''
+            if not self._fill():
+                return -1
+
+    def _find_row(self, row_num):
+        """
+        Index of row row_num in the buffer, streaming earlier bytes to dst, or
+        -1 if the sheet data ends first. Nothing past </sheetData> is streamed,
+        so the appended rows can still go in before it.
+        """
+        pattern = b'<row r="%d"' % row_num
+        end_tag = b'</sheetData>'
+        keep = max(len(pattern), len(end_tag)) - 1
+        while True:
+            pos = self.buf.find(pattern)
+            end = self.buf.find(end_tag)
+            if end != -1 and (pos == -1 or end < pos):
+                return -1
+            if pos != -1:
+                return pos
+            if len(self.buf) > keep:
+                self.dst.write(self.buf[:-keep])
+                self.buf = self.buf[-keep:]
+            if not self._fill():
+                return -1
+
+    def patch(self, last_row, cols_xml, replacements, appended):
+        """Returns the row numbers from replacements that were not found"""
+        # Head: everything before <sheetData> is small, so patch it in memory
+        pos = self._find(b'<sheetData', flush=False)
+        if pos == -1:
+            raise ValueError("Worksheet has no sheetData element")
+        head, self.buf = self.buf[:pos], self.buf[pos:]
+        head = re.sub(rb'<dimension ref="[^"]*"\s*/>',
+                      f'<dimension ref="A1:B{last_row}"/>'.encode('ascii'), head)
+        if cols_xml:
+            if re.search(rb'<cols>.*?</cols>', head, re.S):
+                head = re.sub(rb'<cols>.*?</cols>', cols_xml, head, flags=re.S)
+            else:
+                head += cols_xml
+        self.dst.write(head)
+
+        while b'>' not in self.buf and self._fill():
+            pass
+        close = self.buf.find(b'>')
+        if self.buf[close - 1:close] == b'/':
+            # Empty sheet written as <sheetData/>
+            self.buf = b'<sheetData></sheetData>' + self.buf[close + 1:]
+
+        # Rows are stored in ascending order, so replacements are a forward scan
+        missing = []
+        for row_num in sorted(replacements):
+            start = self._find_row(row_num)
+            if start == -1:
+                missing.append(row_num)
+                continue
+            while True:
+                tag_end = self.buf.find(b'>', start)
+                if tag_end != -1:
+                    break
+                if not self._fill():
+                    raise ValueError(f"Unterminated row {row_num} in worksheet")
+            if self.buf[tag_end - 1:tag_end] == b'/':
+                end = tag_end + 1
+            else:
+                while True:
+                    end = self.buf.find(b'</row>', tag_end)
+                    if end != -1:
+                        end += len(b'</row>')
+                        break
+                    if not self._fill():
+                        raise ValueError(f"Unterminated row {row_num} in worksheet")
+            self.dst.write(self.buf[:start])
+            self.dst.write(replacements[row_num])
+            self.buf = self.buf[end:]
+
+        pos = self._find(b'</sheetData>')
+        if pos == -1:
+            raise ValueError("Worksheet sheetData is not closed")
+        self.dst.write(self.buf[:pos])
+        for row in appended:
+            self.dst.write(row)
+        self.dst.write(self.buf[pos:])
+        self.buf = b''
+        while self._fill():
+            self.dst.write(self.buf)
+            self.buf = b''
+        return missing
+
+
+class WorkbookWriter:
+    """
+    Writes extraction results to an .xlsx file without reloading it.
+
+    Each row is keyed by PDF filename. A file already written with the same
+    content is skipped, a file whose content changed has its row rewritten in
+    place, and a new filename carrying content that was already written under
+    another name is reported as a duplicate. Column widths only grow, from the
+    lengths of the rows written in this call.
+    """
+
+    def __init__(self, excel_path):
+        self.excel_path = excel_path
+        self.rebuilt = False
+        self.pending = []
+        self.counts = {ROW_APPENDED: 0, ROW_UPDATED: 0, ROW_SKIPPED: 0, ROW_DUPLICATE: 0}
+        # Rows passed to add(), and how many of those are saved in the workbook on disk
+        self.rows_added = 0
+        self.rows_saved = 0
+        # Seconds spent rebuilding the index, in the row and width pass, and saving the sheet
+        self.timings = {'rebuild': 0.0, 'index': 0.0, 'save': 0.0}
+        self.conn = sqlite3.connect(index_path_for(excel_path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " filename TEXT PRIMARY KEY, sha256 TEXT, row INTEGER)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS rows_sha256 ON rows (sha256)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS columns (col INTEGER PRIMARY KEY, max_len INTEGER)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+        if not os.path.exists(excel_path):
+            new_workbook(excel_path)
+            self._clear_index()
+            self.conn.executemany("INSERT INTO columns (col, max_len) VALUES (?, ?)",
+                                  [(col, len(header)) for col, header in enumerate(HEADERS, start=1)])
+            self._set_meta('next_row', 2)
+            self._stamp()
+            self.conn.commit()
+        elif not self._index_matches_workbook():
+            self._rebuild_index()
+
+    # -- index bookkeeping -------------------------------------------------
+
+    def _get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                          (key, str(value)))
+
+    def _stamp(self):
+        """Record the workbook's size and mtime so outside edits can be detected"""
+        st = os.stat(self.excel_path)
+        self._set_meta('wb_size', st.st_size)
+        self._set_meta('wb_mtime_ns', st.st_mtime_ns)
+
+    def _index_matches_workbook(self):
+        st = os.stat(self.excel_path)
+        return (self._get_meta('wb_size') == str(st.st_size)
+                and self._get_meta('wb_mtime_ns') == str(st.st_mtime_ns))
+
+    def _clear_index(self):
+        self.conn.execute("DELETE FROM rows")
+        self.conn.execute("DELETE FROM columns")
+        self.conn.execute("DELETE FROM meta")
+
+    def _rebuild_index(self):
+        """One-off full read of a workbook that was created or edited elsewhere"""
+        from openpyxl import load_workbook
+
+        started = time.perf_counter()
+        # Opening and saving the workbook elsewhere changes its stamp but not the
+        # files in it, so content hashes are kept for filenames still in the sheet
+        known = dict(self.conn.execute("SELECT filename, sha256 FROM rows WHERE sha256 IS NOT NULL"))
+        self._clear_index()
+        wb = load_workbook(self.excel_path, read_only=True)
+        try:
+            sheet = wb.worksheets[0]
+            last_row = 0
+            max_lens = {}
+            for row_num, values in enumerate(sheet.iter_rows(values_only=True), start=1):
+                if not any(value is not None for value in values):
+                    continue
+                last_row = row_num
+                for col, value in enumerate(values, start=1):
+                    if value is not None:
+                        max_lens[col] = max(max_lens.get(col, 0), len(str(value)))
+                if row_num > 1 and values and values[0] is not None:
+                    # Content hashes of rows written elsewhere or by older versions are unknown
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO rows (filename, sha256, row) VALUES (?, ?, ?)",
+                        (str(values[0]), known.get(str(values[0])), row_num))
+        finally:
+            wb.close()
+
+        self.conn.executemany("INSERT INTO columns (col, max_len) VALUES (?, ?)",
+                              max_lens.items())
+        self._set_meta('next_row', last_row + 1 if last_row else 1)
+        self._stamp()
+        self.conn.commit()
+        self.rebuilt = True
+        self.timings['rebuild'] += time.perf_counter() - started
+
+    # -- writing -------------------------------------------------------------
+
+    def _cols_xml(self, max_lens):
+        cols = ''.join(
+            f'<col min="{col}" max="{col}" width="{min(length + 2, MAX_COLUMN_WIDTH)}" customWidth="1"/>'
+            for col, length in sorted(max_lens.items()))
+        return f'<cols>{cols}</cols>'.encode('utf-8') if cols else b''
+
+    def write(self, rows):
+        """
+        Write (filename, sha256, data) rows; returns a dict of outcome -> count.
+
+        The sheet is only rewritten when at least one row is appended or updated.
+        """
+        rows = list(rows)
+        try:
+            return self._write(rows)
+        except _StaleIndex:
+            # The workbook no longer matches the index; re-read it and try once more
+            self._rebuild_index()
+            return self._write(rows)
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        counts = {ROW_APPENDED: 0, ROW_UPDATED: 0, ROW_SKIPPED: 0, ROW_DUPLICATE: 0}
+        next_row = int(self._get_meta('next_row', 2))
+        max_lens = dict(self.conn.execute("SELECT col, max_len FROM columns"))
+        appended = []
+        replacements = {}
+
+        if next_row == 1:
+            # Empty sheet: start with the header row
+            appended.append(_row_xml(1, HEADERS))
+            for col, header in enumerate(HEADERS, start=1):
+                max_lens[col] = max(max_lens.get(col, 0), len(header))
+            next_row = 2
+
+        # A file queued more than once is written once, with its latest content
+        latest = {}
+        for filename, sha256, data in rows:
+            latest[filename] = (sha256, data)
+        counts[ROW_SKIPPED] += len(rows) - len(latest)
+
+        for filename, (sha256, data) in latest.items():
+            existing = self.conn.execute(
+                "SELECT sha256, row FROM rows WHERE filename = ?", (filename,)).fetchone()
+
+            if existing is not None:
+                old_sha256, row_num = existing
+                if old_sha256 is None or old_sha256 == sha256:
+                    if old_sha256 is None and sha256:
+                        self.conn.execute("UPDATE rows SET sha256 = ? WHERE filename = ?",
+                                          (sha256, filename))
+                    counts[ROW_SKIPPED] += 1
+                    continue
+                replacements[row_num] = _row_xml(row_num, (filename, data))
+                self.conn.execute("UPDATE rows SET sha256 = ? WHERE filename = ?",
+                                  (sha256, filename))
+                counts[ROW_UPDATED] += 1
+            else:
+                if sha256 and self.conn.execute(
+                        "SELECT 1 FROM rows WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+                    counts[ROW_DUPLICATE] += 1
+                    continue
+                appended.append(_row_xml(next_row, (filename, data)))
+                self.conn.execute("INSERT INTO rows (filename, sha256, row) VALUES (?, ?, ?)",
+                                  (filename, sha256, next_row))
+                next_row += 1
+                counts[ROW_APPENDED] += 1
+
+            for col, value in enumerate((filename, data), start=1):
+                if value is not None:
+                    max_lens[col] = max(max_lens.get(col, 0), len(str(value)))
+
+        if not appended and not replacements:
+            self.conn.commit()
+            self.timings['index'] += time.perf_counter() - started
+            return counts
+
+        try:
+            cols_xml = self._cols_xml(max_lens)
+            saving = time.perf_counter()
+            self.timings['index'] += saving - started
+            missing = self._rewrite_sheet(next_row - 1, cols_xml, replacements, appended)
+            self.timings['save'] += time.perf_counter() - saving
+            if missing:
+                raise _StaleIndex(missing)
+            self.conn.execute("DELETE FROM columns")
+            self.conn.executemany("INSERT INTO columns (col, max_len) VALUES (?, ?)",
+                                  max_lens.items())
+            self._set_meta('next_row', next_row)
+            self._stamp()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return counts
+
+    def _rewrite_sheet(self, last_row, cols_xml, replacements, appended):
+        """Copy the workbook to a temp file with the sheet patched, then swap it in"""
+        directory = os.path.dirname(os.path.abspath(self.excel_path))
+        fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', dir=directory)
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(self.excel_path) as zin, \
+                    zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+                sheet_member = _first_sheet_member(zin)
+                missing = []
+                for item in zin.infolist():
+                    if item.filename == sheet_member:
+                        with zin.open(item) as src, \
+                                zout.open(item.filename, 'w', force_zip64=True) as dst:
+                            missing = _SheetPatcher(src, dst).patch(
+                                last_row, cols_xml, replacements, appended)
+                    else:
+                        with zin.open(item) as src, zout.open(item, 'w') as dst:
+                            shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+            if missing:
+                return missing
+            shutil.copymode(self.excel_path, tmp_path)
+            _replace_durably(tmp_path, self.excel_path)
+            return []
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def add(self, filename, sha256, data):
+        """Queue a row; queued rows are written together by flush() or close()"""
+        self.pending.append((filename, sha256, data))
+        self.rows_added += 1
+
+    def flush(self):
+        """Write the queued rows; once this returns they are saved in the workbook"""
+        if self.pending:
+            for outcome, count in self.write(self.pending).items():
+                self.counts[outcome] += count
+            self.pending = []
+        self.rows_saved = self.rows_added
+        return self.counts
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+        return self.counts
@@ -0,0 +1,493 @@
+"""
+Shared work queue for Document Processor Pro
+
+Several workstations (or processes) can work through one network folder
+together. They coordinate through lease files in a queue folder on the share
+rather than a database, because SQLite's locking cannot be trusted over SMB
+or NFS, while creating a file exclusively and renaming one are atomic there.
+Each participant claims batches of PDFs, extracts them and drops the results
+in the queue; one of them, the merger, is the only one to touch the output.
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .address import RecipientIndex, recipient_index_path_for, DUPLICATES_OFF, DUPLICATES_FLAG, DUPLICATES_SKIP
+from .core import extract_files, open_output_writer, export_metrics, check_recipient, _no_log
+from .discovery import FileIndex, QUEUE_DIR, DEFAULT_INCLUDE, DEFAULT_EXCLUDE
+from .engine import default_worker_count, DEFAULT_WORKER_MEMORY_MB
+from .extraction import STATUS_OK
+from .metrics import RunMetrics
+from .rules import DEFAULT_RULES
+from .shards import StreamingWorkbookWriter, index_workbook_path_for, DEFAULT_SHARD_ROWS, ROLLOVER_WORKBOOK
+from .sinks import SinkGroup
+from .watchdog import DEFAULT_DOCUMENT_TIMEOUT, DEFAULT_DOCUMENT_CPU_SECONDS
+from .workbook import ROW_APPENDED, ROW_UPDATED, ROW_SKIPPED, ROW_DUPLICATE
+
+
+DEFAULT_BATCH_FILES = 50
+
+# A lease whose beat has not changed for this long belongs to a participant that died or lost the share
+LEASE_SECONDS = 60.0
+HEARTBEAT_SECONDS = 10.0
+
+# How long to wait before looking again when other participants hold all the remaining work
+POLL_SECONDS = 2.0
+
+MERGER_LEASE = "merger.lease"
+
+# Record fields carried from a participant to the merger
+RESULT_FIELDS = ('file', 'path', 'sha256', 'status', 'data', 'error', 'template', 'recipient',
+                 'quarantined_to')
+
+
+def file_key(rel_path, size, mtime_ns):
+    """Queue key of one version of a file; a file rewritten later gets a new key and is processed again"""
+    return hashlib.sha1(f"{rel_path}|{size}|{mtime_ns}".encode('utf-8')).hexdigest()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _merge_stats(total, stats):
+    """Add one batch's extract_files counts to the running totals"""
+    for name, value in stats.items():
+        if isinstance(value, list):
+            total.setdefault(name, []).extend(value)
+        elif isinstance(value, dict):
+            counts = total.setdefault(name, {})
+            for key, count in value.items():
+                counts[key] = counts.get(key, 0) + count
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[name] = total.get(name, 0) + value
+
+
+class SharedQueue:
+    """
+    Lease files in a queue folder on the share.
+
+    A lease is a file created exclusively by its holder, who rewrites the
+    beat counter in it every HEARTBEAT_SECONDS. Other participants never
+    compare file times, which come from whichever workstation last wrote
+    the file: a lease counts as expired once this participant has seen its
+    contents stay the same for LEASE_SECONDS of its own monotonic clock. So
+    workstation clocks need not agree, but a lease first seen by a
+    participant cannot be taken over for LEASE_SECONDS, however long ago its
+    holder died. Takeovers of one lease are serialised by a second,
+    short-lived lock file.
+
+        claims/<key>          lease on one PDF
+        done/<key>            the PDF's result has been handed in
+        results/<id>.ndjson   results of one batch, waiting for the merger
+        workers/<id>          heartbeat of each participant
+        merger.lease          lease of the participant that owns the output
+    """
+
+    def __init__(self, queue_dir, worker_id=None, lease_seconds=None):
+        self.queue_dir = queue_dir
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds if lease_seconds is not None else LEASE_SECONDS
+        for name in ('claims', 'done', 'results', 'workers'):
+            os.makedirs(os.path.join(queue_dir, name), exist_ok=True)
+        self.heartbeat_path = os.path.join(queue_dir, 'workers', self.worker_id)
+        self.held = set()
+        self.beats = 0
+        # Other participants' leases: path -> (contents, when they last changed, whether they ever did)
+        self.seen = {}
+        self.batches_written = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _path(self, *parts):
+        return os.path.join(self.queue_dir, *parts)
+
+    # -- leases --------------------------------------------------------------
+
+    def _contents(self):
+        # Fixed width, so a beat overwrites the last one in place and the file is never seen truncated
+        return f"{self.worker_id}\n{self.beats:020d}".encode('utf-8')
+
+    def _create(self, path):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        try:
+            os.write(fd, self._contents())
+        finally:
+            os.close(fd)
+        return True
+
+    def _observe(self, path):
+        """Read a lease and note when its contents last changed; returns its entry in seen, or None if it is gone"""
+        try:
+            with open(path, 'rb') as f:
+                contents = f.read()
+        except FileNotFoundError:
+            self.seen.pop(path, None)
+            return None
+        previous = self.seen.get(path)
+        if previous is None or previous[0] != contents:
+            self.seen[path] = (contents, time.monotonic(), previous is not None)
+        return self.seen[path]
+
+    def _expired(self, path):
+        entry = self._observe(path)
+        return entry is None or time.monotonic() - entry[1] > self.lease_seconds
+
+    def alive(self, path):
+        """Whether the lease at path has been seen to beat within LEASE_SECONDS, i.e. its holder is live"""
+        entry = self._observe(path)
+        return entry is not None and entry[2] and time.monotonic() - entry[1] <= self.lease_seconds
+
+    def acquire(self, path):
+        """Take the lease at path if it is free or expired; returns True if we now hold it"""
+        if not self._create(path):
+            if not self._expired(path):
+                return False
+            steal_lock = path + ".steal"
+            if not self._create(steal_lock):
+                # A participant that died while taking over leaves its lock behind
+                if self._expired(steal_lock):
+                    _remove(steal_lock)
+                return False
+            try:
+                # Someone may have taken the lease over between our checks
+                if not self._expired(path):
+                    return False
+                _remove(path)
+                if not self._create(path):
+                    return False
+            finally:
+                _remove(steal_lock)
+                self.seen.pop(steal_lock, None)
+        self.seen.pop(path, None)
+        with self._lock:
+            self.held.add(path)
+        return True
+
+    def holds(self, path):
+        """Whether the lease at path is still ours, i.e. was not taken over while we were away"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read().split('\n', 1)[0] == self.worker_id
+        except FileNotFoundError:
+            return False
+
+    def release(self, path):
+        with self._lock:
+            self.held.discard(path)
+        # A lease taken over after it expired belongs to someone else now
+        if self.holds(path):
+            _remove(path)
+
+    def heartbeat(self):
+        """Write the next beat into our heartbeat file and every lease we still hold"""
+        with self._lock:
+            self.beats += 1
+            contents = self._contents()
+            held = list(self.held)
+        for path in [self.heartbeat_path] + held:
+            if path != self.heartbeat_path and not self.holds(path):
+                continue
+            try:
+                # Not created if it is gone: a released or taken-over lease is not ours to revive
+                fd = os.open(path, os.O_WRONLY)
+            except OSError:
+                continue
+            try:
+                os.write(fd, contents)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            self.heartbeat()
+
+    def start(self):
+        with open(self.heartbeat_path, 'wb') as f:
+            f.write(self._contents())
+        self._thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop heartbeating and give up every lease still held"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            held = list(self.held)
+        for path in held:
+            self.release(path)
+        _remove(self.heartbeat_path)
+
+    # -- work ----------------------------------------------------------------
+
+    def done_keys(self):
+        return set(os.listdir(self._path('done')))
+
+    def claim(self, candidates, limit):
+        """
+        Lease up to limit of the (key, path) candidates not yet done.
+        Returns (claimed, done) lists; done are candidates found finished by someone else.
+        """
+        claimed = []
+        done = []
+        for key, path in candidates:
+            if len(claimed) >= limit:
+                break
+            if os.path.exists(self._path('done', key)):
+                done.append((key, path))
+                continue
+            lease = self._path('claims', key)
+            if not self.acquire(lease):
+                continue
+            # Finished and released just before we took the lease
+            if os.path.exists(self._path('done', key)):
+                self.release(lease)
+                done.append((key, path))
+                continue
+            claimed.append((key, path))
+        return claimed, done
+
+    def hand_in(self, claimed, records):
+        """Publish a batch's results, then mark its files done and release their leases"""
+        self.batches_written += 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.worker_id}-{self.batches_written:06d}.ndjson"
+        tmp_path = self._path('results', name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps({field: record.get(field) for field in RESULT_FIELDS}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path('results', name))
+        for key, path in claimed:
+            with open(self._path('done', key), 'w'):
+                pass
+            self.release(self._path('claims', key))
+
+    def result_files(self):
+        """Batches waiting to be merged, oldest first"""
+        return sorted(os.path.join(self._path('results'), name)
+                      for name in os.listdir(self._path('results')) if name.endswith(".ndjson"))
+
+    @staticmethod
+    def read_results(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+class _Merger:
+    """The output writer, held by the one participant that has the merger lease"""
+
+    def __init__(self, excel_path, streaming, shard_rows, shard_rollover, outputs, duplicates, log):
+        self.excel_path = excel_path
+        self.duplicates = duplicates
+        self.log = log
+        self.metrics = RunMetrics()
+        self.writer = open_output_writer(excel_path, streaming, shard_rows, log, outputs, shard_rollover)
+        self.recipients = None
+        if duplicates != DUPLICATES_OFF:
+            self.recipients = RecipientIndex(recipient_index_path_for(excel_path))
+        self.duplicate_recipients = []
+        self.merged = 0
+
+    def merge(self, queue):
+        """Write every waiting batch to the output, deleting each once its rows are saved"""
+        for path in queue.result_files():
+            for record in queue.read_results(path):
+                if record['status'] != STATUS_OK:
+                    continue
+                if self.recipients is not None:
+                    first_file = check_recipient(self.recipients, record, self.log)
+                    if first_file is not None:
+                        self.duplicate_recipients.append({'file': record['file'], 'duplicate_of': first_file})
+                        if self.duplicates == DUPLICATES_SKIP:
+                            continue
+                with self.metrics.timer('workbook_append'):
+                    self.writer.add(record['file'], record['sha256'], record['data'])
+            with self.metrics.timer('workbook_flush'):
+                self.writer.flush()
+            # Merged again after a crash before this point, the rows are skipped by the output's index
+            _remove(path)
+            self.merged += 1
+
+    def close(self):
+        try:
+            with self.metrics.timer('workbook_close'):
+                return self.writer.close()
+        finally:
+            if self.recipients is not None:
+                self.recipients.close()
+
+
+def run_shared(folder_path, excel_path, queue_dir=None, workers=None, rules=DEFAULT_RULES,
+               streaming=False, shard_rows=DEFAULT_SHARD_ROWS, log=_no_log, metrics_textfile=None,
+               duplicates=DUPLICATES_FLAG, worker_memory_mb=DEFAULT_WORKER_MEMORY_MB,
+               document_timeout=DEFAULT_DOCUMENT_TIMEOUT,
+               document_cpu_seconds=DEFAULT_DOCUMENT_CPU_SECONDS, recursive=False,
+               include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, outputs=(),
+               batch_files=DEFAULT_BATCH_FILES, worker_id=None, stop_event=None,
+               shard_rollover=ROLLOVER_WORKBOOK):
+    """
+    Take part in processing folder_path together with other workstations.
+
+    Every participant runs this with the same folder and excel_path. The
+    queue lives in queue_dir, by default a QUEUE_DIR folder inside the PDF
+    folder. A participant claims batch_files PDFs at a time, extracts them
+    with its own worker processes and hands the results in. Whichever
+    participant holds the merger lease writes them to excel_path (and
+    outputs), so the workbook has a single writer however many machines take
+    part. A participant returns once the files left are done or held by
+    others it has seen heartbeating (which takes up to HEARTBEAT_SECONDS);
+    the merger stays until every file is done and merged. Leases left by a
+    participant that died are taken over after LEASE_SECONDS, so results
+    left by a merger that stopped early are merged by the next run, which
+    waits that long for its lease if need be.
+
+    The extraction cache is not used: it is a SQLite database next to the
+    workbook, and SQLite's locking is unreliable on the SMB and NFS shares a
+    shared run is pointed at, so files are always parsed.
+
+    Returns this participant's summary, shaped like process_documents'.
+    """
+    if not folder_path:
+        raise ValueError("Please select a PDF folder.")
+    if not excel_path:
+        raise ValueError("Please specify an Excel file.")
+    if not os.path.isdir(folder_path):
+        raise ValueError("PDF folder does not exist.")
+
+    started = time.time()
+    stop_event = stop_event or threading.Event()
+    workers = max(1, int(workers or default_worker_count()))
+    queue = SharedQueue(queue_dir or os.path.join(folder_path, QUEUE_DIR), worker_id)
+    log(f"Joining the shared queue in {queue.queue_dir} as {queue.worker_id}")
+
+    index = FileIndex(folder_path, recursive, include, exclude)
+    index.refresh()
+    root = os.path.abspath(folder_path)
+    candidates = sorted((file_key(os.path.relpath(path, root).replace(os.sep, '/'), size, mtime_ns), path)
+                        for path, (size, mtime_ns) in index.entries().items())
+    done = queue.done_keys()
+    candidates = [(key, path) for key, path in candidates if key not in done]
+    # Start each participant at a different point so they rarely contend for the same files
+    if candidates:
+        offset = int(hashlib.sha1(queue.worker_id.encode('utf-8')).hexdigest(), 16) % len(candidates)
+        candidates = candidates[offset:] + candidates[:offset]
+    log(f"Found {len(candidates)} PDF files not yet done by any workstation.")
+
+    stats = {'files': 0, 'extracted': 0, 'no_markers': 0, 'errors': 0, 'error_files': [],
+             'templates': {}, 'timeouts': 0, 'quarantined': [], 'workers_over_memory': 0,
+             'worker_recycles': 0, 'worker_crashes': 0, 'pool_broken': False}
+    merger = None
+    executor = None
+    batches = 0
+    queue.start()
+    try:
+        while not stop_event.is_set():
+            merger_lease = queue._path(MERGER_LEASE)
+            claimed, finished = queue.claim(candidates, batch_files)
+            taken = {key for key, _ in claimed + finished}
+            candidates = [candidate for candidate in candidates if candidate[0] not in taken]
+
+            # A merger finishing up releases its lease; there is nothing to take it over for once all is
+            # merged, which is known only after claiming has dropped the files others finished meanwhile
+            if merger is None and (claimed or candidates or queue.result_files()) and queue.acquire(merger_lease):
+                log(f"This workstation merges the results into {excel_path}")
+                merger = _Merger(excel_path, streaming, shard_rows, shard_rollover, outputs, duplicates, log)
+
+            if claimed:
+                batches += 1
+                records = []
+                if executor is None and (workers > 1 or document_timeout or document_cpu_seconds):
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                batch_stats = extract_files([path for _, path in claimed], None, workers, rules,
+                                            use_cache=False, log=log, executor=executor,
+                                            on_finished=records.append,
+                                            worker_memory_mb=worker_memory_mb,
+                                            document_timeout=document_timeout,
+                                            document_cpu_seconds=document_cpu_seconds, root=root)
+                _merge_stats(stats, batch_stats)
+                stats['pool_broken'] = stats['pool_broken'] or batch_stats['pool_broken']
+                if executor is not None and (batch_stats['workers_over_memory'] or batch_stats['worker_crashes']
+                                             or batch_stats['pool_broken']):
+                    log("♻️ A worker went over its memory limit or died; starting a fresh pool.")
+                    executor.shutdown()
+                    executor = None
+                queue.hand_in(claimed, records)
+
+            if merger is not None:
+                if not queue.holds(merger_lease):
+                    # Our lease expired (e.g. the share was unreachable) and another participant merges now
+                    raise RuntimeError("Lost the merger lease to another workstation; stopping.")
+                merger.merge(queue)
+
+            if not claimed:
+                if merger is not None:
+                    if not candidates and not queue.result_files():
+                        break
+                elif not candidates and (queue.alive(merger_lease) or not queue.result_files()):
+                    break
+                elif candidates and queue.alive(merger_lease) and all(
+                        queue.alive(queue._path('claims', key)) for key, _ in candidates):
+                    # The files left are leased by live participants, which will hand them in
+                    log(f"{len(candidates)} file(s) are being processed by other workstations.")
+                    break
+                # Otherwise a lease has not yet been seen to beat or go stale; look again until it has
+                stop_event.wait(POLL_SECONDS)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        counts = merger.close() if merger is not None else {
+            ROW_APPENDED: 0, ROW_UPDATED: 0, ROW_SKIPPED: 0, ROW_DUPLICATE: 0}
+        queue.stop()
+
+    summary = {
+        'folder': root,
+        'output': os.path.abspath(excel_path),
+        'queue': os.path.abspath(queue.queue_dir),
+        'worker_id': queue.worker_id,
+        'merger': merger is not None,
+        'batches': batches,
+        'merged_batches': merger.merged if merger is not None else 0,
+        'workers': workers,
+        'rules': rules.name,
+        'streaming': bool(streaming),
+        'rows': counts,
+        'shards': [],
+        'shard_index': None,
+        'outputs': [],
+        'cache': None,
+        'elapsed_seconds': 0.0,
+        'metrics': None,
+        'duplicate_recipients': merger.duplicate_recipients if merger is not None else [],
+        'duplicates_skipped': 0,
+    }
+    summary.update(stats)
+    if duplicates == DUPLICATES_SKIP:
+        summary['duplicates_skipped'] = len(summary['duplicate_recipients'])
+
+    if merger is not None:
+        writer = merger.writer
+        group = writer if isinstance(writer, SinkGroup) else SinkGroup([writer])
+        summary['outputs'] = group.outputs()
+        if isinstance(group.primary, StreamingWorkbookWriter) and group.primary.shards_written:
+            summary['shards'] = [os.path.abspath(path) for path in group.primary.shards_written]
+            summary['shard_index'] = os.path.abspath(index_workbook_path_for(excel_path))
+        # Only the merger reports metrics, so participants do not overwrite each other's
+        summary['metrics'] = export_metrics(merger.metrics, writer, summary, excel_path,
+                                            metrics_textfile, log)
+    summary['elapsed_seconds'] = round(time.time() - started, 3)
+    return summary
@@ -15,21 +15,12 @@ def simple_build():
     
     print("🔨 Building Document Processor Pro...")
     
-    # Create ICO file from PNG
-    try:
-        from PIL import Image
-        png_path = os.path.join(current_dir, icon_path)
-        ico_path = os.path.join(current_dir, "app_icon.ico")
-        
-        if os.path.exists(png_path):
-            img = Image.open(png_path)
-            img.save(ico_path, format='ICO', sizes=[(32, 32), (48, 48)])
-            print("✅ Created ICO file for Windows")
-        else:
-            print("⚠️ PNG icon not found")
-            ico_path = None
-    except Exception as e:
-        print(f"⚠️ Could not create ICO: {e}")
+    # Use the pre-rendered ICO shipped with the app (regenerate with build_icons.py)
+    ico_path = os.path.join(current_dir, "app_icon.ico")
+    if os.path.exists(ico_path):
+        print("✅ Using app_icon.ico")
+    else:
+        print("⚠️ app_icon.ico not found - run 'python build_icons.py' first")
         ico_path = None
     
     # Build command
@@ -45,6 +36,11 @@ def simple_build():
     if ico_path and os.path.exists(ico_path):
         cmd.extend(["--icon", ico_path])
     
+    # Bundle the pre-rendered icons loaded at startup
+    for asset in ("app_icon_16.png", "app_icon_32.png", "app_icon.ico"):
+        if os.path.exists(os.path.join(current_dir, asset)):
+            cmd.extend(["--add-data", f"{asset};."])
+    
     cmd.append(script_path)
     
     print(f"📦 Command: {' '.join(cmd)}")
@@ -64,13 +60,7 @@ def simple_build():
         print(f"❌ Build failed: {e}")
         print(f"Output: {e.stdout}")
         print(f"Error: {e.stderr}")
-    
-    # Clean up
-    if ico_path and os.path.exists(ico_path):
-        try:
-            os.remove(ico_path)
-        except:
-            pass
+
 
 if __name__ == "__main__":
     simple_build()
@@ -0,0 +1,113 @@
+"""
+Tests for address parsing and duplicate-recipient detection
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from docprocessor.address import RecipientIndex, parse_address, recipient_index_path_for  # noqa: E402
+
+BLOCK = "Mr John Smith\n12 High Street\nYork\nYO1 7HH"
+
+# The same recipient as BLOCK, written the ways different templates and typists write it
+VARIANTS = [
+    "John Smith\n12 High Street\nYork\nYO1 7HH",
+    "MR. JOHN SMITH\n12 High St.\nYork\nyo17hh",
+    "Dr John  Smith\n12, High St\nYORK\nYO1  7HH",
+    "Mr John Smith\n12 high street\nYork YO1 7HH",
+]
+
+
+class ParseAddressTest(unittest.TestCase):
+
+    def test_parts_are_split_out(self):
+        recipient = parse_address(BLOCK)
+
+        self.assertEqual(recipient['name'], "Mr John Smith")
+        self.assertEqual(recipient['lines'], ["12 High Street", "York"])
+        self.assertEqual(recipient['postcode'], "YO1 7HH")
+
+    def test_postcode_on_a_line_with_the_town(self):
+        recipient = parse_address("John Smith\n12 High Street\nYork, YO17HH")
+
+        self.assertEqual(recipient['lines'], ["12 High Street", "York"])
+        self.assertEqual(recipient['postcode'], "YO1 7HH")
+
+    def test_normalisation_variants_share_a_key(self):
+        key = parse_address(BLOCK)['key']
+        for block in VARIANTS:
+            with self.subTest(block=block):
+                self.assertEqual(parse_address(block)['key'], key)
+
+    def test_different_recipients_do_not_match(self):
+        key = parse_address(BLOCK)['key']
+        for block in ["Jane Smith\n12 High Street\nYork\nYO1 7HH",
+                      "John Smith\n14 High Street\nYork\nYO1 7HH",
+                      "John Smith\n12 High Street\nYork\nYO1 7HJ"]:
+            with self.subTest(block=block):
+                self.assertNotEqual(parse_address(block)['key'], key)
+
+    def test_without_a_postcode_the_whole_block_has_to_agree(self):
+        key = parse_address("Mrs Ann Lee\n3 Mill Road\nLeeds")['key']
+
+        self.assertIsNone(parse_address("Ann Lee\n3 Mill Rd\nLeeds")['postcode'])
+        self.assertEqual(parse_address("Ann Lee\n3 Mill Rd\nLeeds")['key'], key)
+        self.assertNotEqual(parse_address("Ann Lee\n3 Mill Road\nBradford")['key'], key)
+
+    def test_empty_block(self):
+        self.assertIsNone(parse_address(""))
+        self.assertIsNone(parse_address(None))
+        self.assertIsNone(parse_address(" \n\n "))
+
+
+class RecipientIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = recipient_index_path_for(os.path.join(self.tmp, "out.xlsx"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_variants_are_flagged_against_the_first_letter(self):
+        index = RecipientIndex(self.path)
+        try:
+            self.assertIsNone(index.check(parse_address(BLOCK), "first.pdf"))
+            for number, block in enumerate(VARIANTS):
+                self.assertEqual(index.check(parse_address(block), f"copy{number}.pdf"), "first.pdf")
+            self.assertIsNone(index.check(parse_address("Jane Smith\n12 High Street\nYork\nYO1 7HH"),
+                                          "other.pdf"))
+            self.assertEqual(index.duplicates, len(VARIANTS))
+        finally:
+            index.close()
+
+    def test_rerunning_the_first_letter_is_not_a_duplicate(self):
+        index = RecipientIndex(self.path)
+        try:
+            self.assertIsNone(index.check(parse_address(BLOCK), "first.pdf"))
+            self.assertIsNone(index.check(parse_address(VARIANTS[1]), "first.pdf"))
+            self.assertEqual(index.duplicates, 0)
+        finally:
+            index.close()
+
+    def test_recipients_are_remembered_across_runs(self):
+        index = RecipientIndex(self.path)
+        index.check(parse_address(BLOCK), "first.pdf")
+        index.close()
+
+        index = RecipientIndex(self.path)
+        try:
+            self.assertEqual(index.check(parse_address(VARIANTS[2]), "later.pdf"), "first.pdf")
+        finally:
+            index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
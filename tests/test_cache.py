@@ -0,0 +1,89 @@
+"""
+Tests for the persistent extraction cache
+
+    python -m pytest tests
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus, pdf_bytes, letter_pages  # noqa: E402
+from docprocessor import cache as cache_module  # noqa: E402
+from docprocessor.cache import ExtractionCache  # noqa: E402
+from docprocessor.engine import ExtractionEngine  # noqa: E402
+from docprocessor.extraction import STATUS_OK  # noqa: E402
+
+
+class ExtractionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.pdf_files = generate_corpus(os.path.join(self.tmp, "letters"), 3, pages=1)
+        self.cache_path = os.path.join(self.tmp, "out.xlsx.cache.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_engine(self, pdf_files):
+        cache = ExtractionCache(self.cache_path)
+        try:
+            engine = ExtractionEngine(workers=1, cache=cache, document_timeout=0, document_cpu_seconds=0)
+            return list(engine.run(pdf_files)), cache.stats()
+        finally:
+            cache.close()
+
+    def test_unchanged_files_are_served_from_the_cache(self):
+        first, stats = self.run_engine(self.pdf_files)
+        self.assertEqual((stats['hits'], stats['misses']), (0, 3))
+
+        with mock.patch('docprocessor.engine.extract_document') as extract:
+            second, stats = self.run_engine(self.pdf_files)
+
+        extract.assert_not_called()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 0))
+        self.assertTrue(all(record['cached'] for record in second))
+        self.assertEqual([(record['status'], record['data'], record['sha256']) for record in second],
+                         [(record['status'], record['data'], record['sha256']) for record in first])
+
+    def test_unchanged_size_and_mtime_skip_hashing(self):
+        cache = ExtractionCache(self.cache_path)
+        try:
+            sha256 = cache.content_hash(self.pdf_files[0])
+            with mock.patch.object(cache_module, 'file_sha256') as hash_file:
+                self.assertEqual(cache.content_hash(self.pdf_files[0]), sha256)
+            hash_file.assert_not_called()
+
+            # Touched but not changed: hashed again, to the same content
+            st = os.stat(self.pdf_files[0])
+            os.utime(self.pdf_files[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+            with mock.patch.object(cache_module, 'file_sha256', wraps=cache_module.file_sha256) as hash_file:
+                self.assertEqual(cache.content_hash(self.pdf_files[0]), sha256)
+            hash_file.assert_called_once()
+        finally:
+            cache.close()
+
+    def test_changed_file_is_parsed_again(self):
+        first, _ = self.run_engine(self.pdf_files)
+
+        # Rewritten with another letter, so its size changes too
+        with open(self.pdf_files[1], 'wb') as f:
+            f.write(pdf_bytes(letter_pages(random.Random(99), 99, pages=2)))
+        second, stats = self.run_engine(self.pdf_files)
+
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+        self.assertFalse(second[1].get('cached'))
+        self.assertEqual(second[1]['status'], STATUS_OK)
+        self.assertNotEqual(second[1]['sha256'], first[1]['sha256'])
+        self.assertNotEqual(second[1]['data'], first[1]['data'])
+
+
+if __name__ == "__main__":
+    unittest.main()
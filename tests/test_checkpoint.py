@@ -0,0 +1,128 @@
+"""
+Tests for the run checkpoints
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor.checkpoint import RunCheckpoint, checkpoint_path_for, RUN_FINISHED, RUN_RUNNING  # noqa: E402
+from docprocessor.core import process_documents  # noqa: E402
+from docprocessor.extraction import STATUS_OK, STATUS_NO_MARKERS, STATUS_ERROR, STATUS_TIMEOUT  # noqa: E402
+
+
+class RunCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "out.xlsx.runs.sqlite")
+        self.checkpoint = RunCheckpoint(self.path)
+
+    def tearDown(self):
+        self.checkpoint.close()
+        shutil.rmtree(self.tmp)
+
+    def test_failed_files_are_tried_again(self):
+        run_id = self.checkpoint.start(["a.pdf", "b.pdf", "c.pdf"], self.tmp)
+        self.checkpoint.mark_done([{'path': "a.pdf", 'status': STATUS_OK},
+                                   {'path': "b.pdf", 'status': STATUS_ERROR},
+                                   {'path': "c.pdf", 'status': STATUS_NO_MARKERS}])
+        self.checkpoint.close()
+
+        self.checkpoint = RunCheckpoint(self.path)
+        self.assertEqual(self.checkpoint.resume(run_id), ["b.pdf"])
+        self.assertEqual(self.checkpoint.resumed_files, 2)
+
+    def test_quarantined_files_are_not_tried_again(self):
+        run_id = self.checkpoint.start(["a.pdf", "b.pdf", "c.pdf"], self.tmp)
+        self.checkpoint.mark_done([
+            {'path': "a.pdf", 'status': STATUS_TIMEOUT, 'quarantined_to': os.path.join("quarantine", "a.pdf")},
+            # Left where it was, so it can be tried again
+            {'path': "b.pdf", 'status': STATUS_TIMEOUT, 'quarantined_to': None}])
+        self.checkpoint.close()
+
+        self.checkpoint = RunCheckpoint(self.path)
+        self.assertEqual(self.checkpoint.resume(run_id), ["b.pdf", "c.pdf"])
+
+    def test_finished_run_cannot_be_resumed(self):
+        run_id = self.checkpoint.start(["a.pdf"], self.tmp)
+        self.checkpoint.mark_done([{'path': "a.pdf", 'status': STATUS_OK}])
+        self.assertTrue(self.checkpoint.finish())
+
+        with self.assertRaises(ValueError):
+            self.checkpoint.resume(run_id)
+        self.assertEqual(self.checkpoint.run(run_id)['state'], "finished")
+
+    def test_run_with_failed_files_stays_resumable(self):
+        run_id = self.checkpoint.start(["a.pdf", "b.pdf", "c.pdf"], self.tmp)
+        self.checkpoint.mark_done([{'path': "a.pdf", 'status': STATUS_OK},
+                                   {'path': "b.pdf", 'status': STATUS_ERROR},
+                                   {'path': "c.pdf", 'status': STATUS_TIMEOUT, 'quarantined_to': None}])
+        self.assertFalse(self.checkpoint.finish())
+        self.checkpoint.close()
+
+        self.checkpoint = RunCheckpoint(self.path)
+        self.assertEqual(self.checkpoint.unfinished(self.tmp)['run_id'], run_id)
+        self.assertEqual(self.checkpoint.resume(run_id), ["b.pdf", "c.pdf"])
+        self.assertEqual(self.checkpoint.resumed_files, 1)
+        self.checkpoint.mark_done([{'path': "b.pdf", 'status': STATUS_OK},
+                                   {'path': "c.pdf", 'status': STATUS_OK}])
+        self.assertTrue(self.checkpoint.finish())
+        self.assertEqual(self.checkpoint.run(run_id)['done'], 3)
+
+    def test_resume_from_another_folder_is_refused(self):
+        run_id = self.checkpoint.start(["a.pdf"], self.tmp)
+        self.checkpoint.close()
+
+        self.checkpoint = RunCheckpoint(self.path)
+        with self.assertRaises(ValueError):
+            self.checkpoint.resume(run_id, os.path.join(self.tmp, "elsewhere"))
+        self.assertEqual(self.checkpoint.resume(run_id, self.tmp), ["a.pdf"])
+
+
+class ResumeAfterErrorsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp, "letters")
+        generate_corpus(self.folder, 3, pages=1)
+        self.output = os.path.join(self.tmp, "out.xlsx")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_state(self, run_id):
+        checkpoint = RunCheckpoint(checkpoint_path_for(self.output))
+        try:
+            return checkpoint.run(run_id)['state']
+        finally:
+            checkpoint.close()
+
+    def test_run_with_an_error_is_resumed_for_that_file(self):
+        broken = os.path.join(self.folder, "letter_000001.pdf")
+        os.rename(broken, broken + ".good")
+        with open(broken, 'wb') as f:
+            f.write(b"%PDF-1.4 not really a PDF")
+
+        summary = process_documents(self.folder, self.output, workers=1, use_cache=False)
+        self.assertEqual((summary['extracted'], summary['errors']), (2, 1))
+        self.assertEqual(self.run_state(summary['run_id']), RUN_RUNNING)
+
+        os.replace(broken + ".good", broken)
+        resumed = process_documents(self.folder, self.output, workers=1, use_cache=False,
+                                    resume_run=summary['run_id'])
+        self.assertEqual(resumed['resumed_files'], 2)
+        self.assertEqual((resumed['files'], resumed['extracted'], resumed['errors']), (1, 1, 0))
+        self.assertEqual(self.run_state(summary['run_id']), RUN_FINISHED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests for the headless command line
+
+    python -m pytest tests
+"""
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor import core  # noqa: E402
+from docprocessor.checkpoint import RunCheckpoint, checkpoint_path_for  # noqa: E402
+from docprocessor.cli import main, EXIT_FAILED, EXIT_OK  # noqa: E402
+
+
+class CommandLineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp, "letters")
+        generate_corpus(self.folder, 2, pages=1)
+        self.output = os.path.join(self.tmp, "out.xlsx")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_ctrl_c_reports_the_run_to_resume(self):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        # Ctrl-C once the run has been checkpointed
+        with mock.patch.object(core, 'process_files', side_effect=KeyboardInterrupt), \
+                redirect_stdout(stdout), redirect_stderr(stderr):
+            code = main([self.folder, "-o", self.output, "-w", "1", "-q"])
+
+        checkpoint = RunCheckpoint(checkpoint_path_for(self.output))
+        try:
+            run = checkpoint.unfinished(self.folder)
+        finally:
+            checkpoint.close()
+        self.assertEqual(code, EXIT_FAILED)
+        self.assertEqual(json.loads(stdout.getvalue()), {'status': 'interrupted', 'run_id': run['run_id']})
+        self.assertIn(f"--resume {run['run_id']}", stderr.getvalue())
+
+    def test_shared_rejects_no_cache(self):
+        stderr = io.StringIO()
+        with mock.patch('docprocessor.cli.run_shared') as run_shared, redirect_stderr(stderr), \
+                self.assertRaises(SystemExit) as exit_:
+            main([self.folder, "-o", self.output, "--shared", "--no-cache"])
+
+        self.assertEqual(exit_.exception.code, 2)
+        self.assertIn("--no-cache", stderr.getvalue())
+        run_shared.assert_not_called()
+
+    def test_streamed_shards_can_roll_over_to_sheets(self):
+        from openpyxl import load_workbook
+
+        generate_corpus(self.folder, 5, pages=1)
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            code = main([self.folder, "-o", self.output, "-w", "1", "-q", "--stream",
+                         "--shard-rows", "2", "--shard-rollover", "sheet"])
+
+        summary = json.loads(stdout.getvalue())
+        self.assertEqual(code, EXIT_OK)
+        self.assertEqual(len(summary['shards']), 1)
+        wb = load_workbook(summary['shards'][0], read_only=True)
+        try:
+            self.assertEqual([sheet.max_row - 1 for sheet in wb.worksheets], [2, 2, 1])
+        finally:
+            wb.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
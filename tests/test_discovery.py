@@ -0,0 +1,140 @@
+"""
+Tests for PDF discovery and the incremental file index
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from docprocessor.discovery import FileIndex, file_index_path_for, row_name  # noqa: E402
+from docprocessor.watchdog import QUARANTINE_DIR  # noqa: E402
+
+
+class FileIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "letters")
+        for rel_path in ["a.pdf", "notes.txt", "north/b.pdf", "north/leeds/c.PDF",
+                         "south/d.pdf", f"{QUARANTINE_DIR}/bad.pdf"]:
+            self.touch(rel_path)
+        self.settle()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def path(self, rel_path):
+        return os.path.join(self.root, *rel_path.split('/'))
+
+    def touch(self, rel_path):
+        path = self.path(rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b"%PDF-1.4\n")
+
+    def settle(self):
+        """Date every folder back past the racy window, as if the tree had been left alone a while"""
+        past = time.time() - 60
+        for folder, _, _ in os.walk(self.root):
+            os.utime(folder, (past, past))
+
+    def names(self, index):
+        return [row_name(path, self.root) for path in index.files()]
+
+    def test_recursive_listing_skips_excluded_and_unmatched(self):
+        index = FileIndex(self.root, recursive=True)
+
+        self.assertEqual(self.names(index), ["a.pdf", "north/b.pdf", "north/leeds/c.PDF", "south/d.pdf"])
+        self.assertEqual(self.names(FileIndex(self.root)), ["a.pdf"])
+
+    def test_unchanged_tree_is_not_listed_again(self):
+        index = FileIndex(self.root, recursive=True)
+        index.refresh()
+
+        self.assertEqual(index.refresh(), 0)
+
+    def test_file_added_in_a_subfolder(self):
+        index = FileIndex(self.root, recursive=True)
+        index.refresh()
+        self.touch("north/leeds/e.pdf")
+
+        self.assertIn("north/leeds/e.pdf", self.names(index))
+        # Only the folder that changed was listed again
+        self.assertEqual(index.listed, 1)
+
+    def test_file_removed_from_a_subfolder(self):
+        index = FileIndex(self.root, recursive=True)
+        index.refresh()
+        os.remove(self.path("north/b.pdf"))
+
+        self.assertEqual(self.names(index), ["a.pdf", "north/leeds/c.PDF", "south/d.pdf"])
+
+    def test_file_renamed_and_moved_between_subfolders(self):
+        index = FileIndex(self.root, recursive=True)
+        index.refresh()
+        os.rename(self.path("south/d.pdf"), self.path("south/renamed.pdf"))
+        os.rename(self.path("north/b.pdf"), self.path("north/leeds/b.pdf"))
+
+        self.assertEqual(self.names(index), ["a.pdf", "north/leeds/b.pdf", "north/leeds/c.PDF",
+                                             "south/renamed.pdf"])
+
+    def test_subfolders_added_and_removed(self):
+        index = FileIndex(self.root, recursive=True)
+        index.refresh()
+        self.touch("east/hull/f.pdf")
+        shutil.rmtree(self.path("north/leeds"))
+
+        self.assertEqual(self.names(index), ["a.pdf", "east/hull/f.pdf", "north/b.pdf", "south/d.pdf"])
+        self.assertNotIn("north/leeds", index.dirs)
+
+    def test_index_on_disk_is_reused_with_the_same_options(self):
+        path = file_index_path_for(os.path.join(self.tmp, "out.xlsx"))
+        FileIndex(self.root, recursive=True, path=path).refresh()
+
+        index = FileIndex(self.root, recursive=True, path=path)
+        self.assertEqual(index.refresh(), 0)
+        self.assertEqual(len(index.files()), 4)
+
+        # Different options start from a full listing
+        index = FileIndex(self.root, recursive=True, include=["*.txt"], path=path)
+        self.assertEqual(index.refresh(), 4)
+        self.assertEqual(self.names(index), ["notes.txt"])
+
+
+class RowNameTest(unittest.TestCase):
+
+    def test_paths_below_root(self):
+        root = os.path.join(os.sep, "share", "letters")
+
+        self.assertEqual(row_name(os.path.join(root, "a.pdf"), root), "a.pdf")
+        self.assertEqual(row_name(os.path.join(root, "north", "leeds", "c.pdf"), root), "north/leeds/c.pdf")
+
+    def test_plain_name_without_root_or_outside_it(self):
+        root = os.path.join(os.sep, "share", "letters")
+        elsewhere = os.path.join(os.sep, "share", "other", "x.pdf")
+
+        self.assertEqual(row_name(os.path.join(root, "north", "b.pdf")), "b.pdf")
+        self.assertEqual(row_name(elsewhere, root), "x.pdf")
+        self.assertEqual(row_name(os.path.join(os.sep, "share", "x.pdf"), root), "x.pdf")
+
+    def test_relative_paths_are_resolved_against_the_working_folder(self):
+        cwd = os.getcwd()
+        tmp = tempfile.mkdtemp()
+        try:
+            os.chdir(tmp)
+            self.assertEqual(row_name(os.path.join("letters", "north", "b.pdf"), "letters"), "north/b.pdf")
+            self.assertEqual(row_name(os.path.join(tmp, "letters", "b.pdf"), "letters"), "b.pdf")
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    unittest.main()
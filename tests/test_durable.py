@@ -0,0 +1,118 @@
+"""
+Tests that rows are handed on once saved, before the run's writer is closed
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor import core  # noqa: E402
+from docprocessor.checkpoint import RunCheckpoint, checkpoint_path_for  # noqa: E402
+from docprocessor.core import process_files  # noqa: E402
+
+LETTERS = 6
+
+
+class DurableRowsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = tempfile.mkdtemp()
+        cls.pdf_files = generate_corpus(cls.corpus, LETTERS, pages=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.corpus)
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def durable_before_close(self, output, streaming=False, outputs=()):
+        """Records handed to on_durable while the writer was still open"""
+        closed = []
+        open_output_writer = core.open_output_writer
+
+        def opened(*args, **kwargs):
+            writer = open_output_writer(*args, **kwargs)
+            close = writer.close
+
+            def close_and_note():
+                closed.append(True)
+                return close()
+
+            writer.close = close_and_note
+            return writer
+
+        early = []
+
+        def on_durable(record):
+            if not closed:
+                early.append(record['file'])
+
+        with mock.patch.object(core, 'open_output_writer', opened), \
+                mock.patch.object(core, 'DURABLE_FLUSH_ROWS', 1), \
+                mock.patch.object(core, 'FLUSH_COST_RATIO', 0):
+            summary = process_files(self.pdf_files, os.path.join(self.tmp, output), workers=1,
+                                    use_cache=False, on_durable=on_durable, streaming=streaming,
+                                    outputs=[os.path.join(self.tmp, path) for path in outputs],
+                                    root=self.corpus)
+        self.assertEqual(summary['extracted'], LETTERS)
+        return early
+
+    def test_every_output_saves_rows_before_close(self):
+        for output, streaming, outputs in [("out.xlsx", False, ()), ("out.xlsx", True, ()),
+                                           ("out.csv", False, ()), ("out.ndjson", False, ()),
+                                           ("out.sqlite", False, ()), ("out.xlsx", False, ("rows.parquet",))]:
+            with self.subTest(output=output, streaming=streaming, outputs=outputs):
+                early = self.durable_before_close(output, streaming, outputs)
+                # The last row may only be saved by close()
+                self.assertGreaterEqual(len(early), LETTERS - 1)
+                shutil.rmtree(self.tmp)
+                os.makedirs(self.tmp)
+
+    def test_interrupted_run_keeps_saved_files_done(self):
+        excel_path = os.path.join(self.tmp, "out.xlsx")
+        checkpoint = RunCheckpoint(checkpoint_path_for(excel_path))
+        run_id = checkpoint.start(self.pdf_files, self.corpus)
+        open_output_writer = core.open_output_writer
+
+        def opened(*args, **kwargs):
+            writer = open_output_writer(*args, **kwargs)
+            add = writer.add
+
+            def add_until_full(filename, sha256, data):
+                if writer.rows_added == 3:
+                    raise OSError("disk full")
+                return add(filename, sha256, data)
+
+            writer.add = add_until_full
+            return writer
+
+        # Rows 1-2 are saved when row 3 starts a new shard, and row 4 fails
+        with mock.patch.object(core, 'open_output_writer', opened):
+            with self.assertRaises(OSError):
+                process_files(self.pdf_files, excel_path, workers=1, use_cache=False,
+                              streaming=True, shard_rows=2, checkpoint=checkpoint, root=self.corpus)
+        checkpoint.close()
+
+        checkpoint = RunCheckpoint(checkpoint_path_for(excel_path))
+        try:
+            self.assertEqual(checkpoint.resume(run_id, self.corpus), self.pdf_files[3:])
+        finally:
+            checkpoint.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+Tests for the extraction engine's worker pools
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor import engine as engine_module  # noqa: E402
+from docprocessor.engine import ExtractionEngine, CHUNKS_AHEAD_PER_WORKER  # noqa: E402
+from docprocessor.extraction import extract_document, STATUS_OK, STATUS_TIMEOUT  # noqa: E402
+
+# Record fields that must not depend on where a document was parsed
+RESULT_FIELDS = ('file', 'path', 'status', 'data', 'error', 'template', 'marker_pages', 'sha256')
+
+
+def broken_executor():
+    """A warm pool whose worker has died, as a caller might still be holding"""
+    executor = ProcessPoolExecutor(max_workers=1)
+    pid = executor.submit(os.getpid).result()
+    os.kill(pid, 9)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            executor.submit(os.getpid).result()
+        except BrokenProcessPool:
+            return executor
+        time.sleep(0.05)
+    raise RuntimeError("The pool did not notice its worker had died")
+
+
+def crash_on_marked(file_path, **kwargs):
+    """extract_document, except that a worker given crash.pdf dies as a malformed PDF might kill it"""
+    if os.path.basename(file_path) == "crash.pdf":
+        os._exit(1)
+    return extract_document(file_path, **kwargs)
+
+
+class InlineExecutor:
+    """Runs each task as it is submitted, and remembers how many were submitted"""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def fake_extract(file_path):
+    return {'path': file_path}
+
+
+class ExtractionEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.pdf_files = generate_corpus(self.tmp, 4, pages=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_broken_caller_pool_is_reported(self):
+        executor = broken_executor()
+        engine = ExtractionEngine(workers=2, executor=executor, document_timeout=0, document_cpu_seconds=0)
+        try:
+            records = list(engine.run(self.pdf_files))
+        finally:
+            executor.shutdown()
+
+        # The run finishes on a pool of the engine's own, without blaming any document
+        self.assertEqual([record['status'] for record in records], [STATUS_OK] * 4)
+        self.assertEqual(engine.crashed, 0)
+        self.assertTrue(engine.pool_broken)
+
+    def test_healthy_caller_pool_is_kept(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            engine = ExtractionEngine(workers=2, executor=executor)
+            records = list(engine.run(self.pdf_files))
+
+        self.assertEqual(len(records), 4)
+        self.assertFalse(engine.pool_broken)
+
+    def results(self, records):
+        return [tuple(record.get(field) for field in RESULT_FIELDS) for record in records]
+
+    def test_pool_matches_in_process_extraction(self):
+        pdf_files = generate_corpus(self.tmp, 9, pages=2)
+        in_process = ExtractionEngine(workers=1, document_timeout=0, document_cpu_seconds=0)
+        pooled = ExtractionEngine(workers=2, document_timeout=0, document_cpu_seconds=0)
+
+        serial = self.results(in_process.run(pdf_files))
+        parallel = self.results(pooled.run(pdf_files))
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual([result[1] for result in parallel], pdf_files)
+        self.assertEqual([result[2] for result in parallel], [STATUS_OK] * 9)
+
+    def test_crashed_worker_loses_only_its_document(self):
+        crash = os.path.join(self.tmp, "crash.pdf")
+        shutil.copy(self.pdf_files[0], crash)
+        pdf_files = self.pdf_files[:2] + [crash] + self.pdf_files[2:]
+        engine = ExtractionEngine(workers=2, document_timeout=0, document_cpu_seconds=0)
+
+        with mock.patch.object(engine_module, 'extract_document', crash_on_marked):
+            records = list(engine.run(pdf_files))
+
+        # Documents in flight with it are re-run one at a time and still come back, in order
+        self.assertEqual([record['path'] for record in records], pdf_files)
+        self.assertEqual([record['status'] for record in records],
+                         [STATUS_OK, STATUS_OK, STATUS_TIMEOUT, STATUS_OK, STATUS_OK])
+        self.assertEqual(engine.crashed, 1)
+        self.assertFalse(engine.pool_broken)
+
+    def test_submission_window_is_bounded(self):
+        executor = InlineExecutor()
+        engine = ExtractionEngine(workers=2, executor=executor, worker_memory_mb=0)
+        files = [f"letter_{index}.pdf" for index in range(20)]
+        limit = 2 * CHUNKS_AHEAD_PER_WORKER
+
+        # One file per chunk, so each record handed out is one chunk consumed
+        with mock.patch.object(engine, 'chunk_size', return_value=1):
+            submitted = []
+            for record in engine._map_bounded(fake_extract, files, executor):
+                submitted.append(executor.submitted)
+
+        # Nothing is handed out until the window is full, and it never runs further ahead
+        self.assertEqual(submitted, [min(index + limit, len(files)) for index in range(len(files))])
+
+    def test_worker_over_memory_limit_is_recycled(self):
+        pdf_files = generate_corpus(self.tmp, 16, pages=1)
+        # Every worker is over a 1 MB limit after its first chunk
+        engine = ExtractionEngine(workers=2, worker_memory_mb=1, document_timeout=0, document_cpu_seconds=0)
+
+        records = list(engine.run(pdf_files))
+
+        self.assertEqual([record['path'] for record in records], pdf_files)
+        self.assertEqual([record['status'] for record in records], [STATUS_OK] * 16)
+        self.assertEqual(engine.over_memory, 16 // engine.chunk_size(16))
+        self.assertGreaterEqual(engine.recycled, 1)
+
+    def test_caller_pool_over_memory_limit_is_only_reported(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            engine = ExtractionEngine(workers=2, executor=executor, worker_memory_mb=1)
+            records = list(engine.run(self.pdf_files))
+
+        self.assertEqual(len(records), 4)
+        self.assertGreater(engine.over_memory, 0)
+        self.assertEqual(engine.recycled, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
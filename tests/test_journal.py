@@ -0,0 +1,75 @@
+"""
+Tests for the print journal
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docprocessor.journal import (PrintJournal, PRINT_QUEUED, PRINT_SUBMITTED,  # noqa: E402
+                                  PRINT_CONFIRMED, PRINT_FAILED)
+
+
+class PrintJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "print_journal.sqlite")
+        self.letters = []
+        for name in ["a", "b", "c", "d", "e"]:
+            letter = os.path.join(self.tmp, f"{name}.pdf")
+            with open(letter, 'wb') as f:
+                f.write(f"%PDF-1.4 letter {name}".encode())
+            self.letters.append(letter)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_interrupted_run_is_planned_from_disk(self):
+        a, b, c, d, e = self.letters
+        journal = PrintJournal(self.path)
+        journal.record(self.letters, PRINT_QUEUED)
+        journal.record([a, b, c, d], PRINT_SUBMITTED)
+        journal.record([a], PRINT_CONFIRMED)
+        journal.record([d], PRINT_FAILED, "printer error")
+        # The run stops here with b and c still at the printer
+        journal.close()
+
+        journal = PrintJournal(self.path)
+        try:
+            plan = journal.plan(self.letters)
+        finally:
+            journal.close()
+
+        self.assertEqual(plan['printed'], [a])
+        self.assertEqual(plan['unconfirmed'], [b, c])
+        self.assertEqual(plan['pending'], [b, c, d, e])
+
+    def test_letters_are_recognised_by_content(self):
+        journal = PrintJournal(self.path)
+        journal.record([self.letters[0]], PRINT_SUBMITTED)
+        journal.record([self.letters[0]], PRINT_CONFIRMED)
+        journal.close()
+
+        # Same letter under a new name, and a changed letter under an old one
+        renamed = os.path.join(self.tmp, "renamed.pdf")
+        shutil.copy(self.letters[0], renamed)
+        with open(self.letters[0], 'ab') as f:
+            f.write(b" reissued")
+
+        journal = PrintJournal(self.path)
+        try:
+            plan = journal.plan([self.letters[0], renamed])
+        finally:
+            journal.close()
+        self.assertEqual(plan['printed'], [renamed])
+        self.assertEqual(plan['pending'], [self.letters[0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
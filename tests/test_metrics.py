@@ -0,0 +1,71 @@
+"""
+Tests for the per-stage run metrics
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docprocessor.metrics import Histogram, RunMetrics  # noqa: E402
+
+
+def record(filename, seconds, status="ok"):
+    return {'file': filename, 'status': status,
+            'timings': {'open': seconds / 4, 'page_text': seconds / 2, 'document': seconds}}
+
+
+class RunMetricsTest(unittest.TestCase):
+
+    def test_buckets_and_slowest_files(self):
+        histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+        for seconds in (0.05, 0.1, 0.5, 2.0, 60.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.bucket_counts, [2, 1, 1])
+        self.assertEqual(list(histogram.cumulative()), [(0.1, 2), (1.0, 3), (10.0, 4)])
+        self.assertEqual((histogram.count, histogram.max), (5, 60.0))
+
+        metrics = RunMetrics(top_files=3)
+        for n, seconds in enumerate((0.2, 3.0, 0.1, 1.5, 0.9)):
+            metrics.observe_record(record(f"{n}.pdf", seconds))
+        metrics.observe_record({'file': "cached.pdf", 'status': "ok"})
+
+        report = metrics.report()
+        self.assertEqual(report['slowest_files'], [{'file': "1.pdf", 'seconds': 3.0},
+                                                   {'file': "3.pdf", 'seconds': 1.5},
+                                                   {'file': "4.pdf", 'seconds': 0.9}])
+        self.assertEqual(report['counters'], {'files_ok': 6})
+        self.assertEqual(report['stages']['document']['count'], 5)
+        self.assertNotIn('markers', report['stages'])
+
+    def test_prometheus_textfile(self):
+        metrics = RunMetrics()
+        metrics.observe('discovery', 0.003)
+        metrics.observe('discovery', 0.2)
+        metrics.count('files_ok', 2)
+        metrics.finish()
+        lines = metrics.to_prometheus().splitlines()
+
+        for name, kind in (("docprocessor_stage_duration_seconds", "histogram"),
+                           ("docprocessor_last_run_events", "gauge"),
+                           ("docprocessor_last_run_duration_seconds", "gauge")):
+            self.assertTrue(any(line.startswith(f"# HELP {name} ") for line in lines), name)
+            self.assertIn(f"# TYPE {name} {kind}", lines)
+        self.assertIn('docprocessor_stage_duration_seconds_bucket{stage="discovery",le="0.0025"} 0', lines)
+        self.assertIn('docprocessor_stage_duration_seconds_bucket{stage="discovery",le="0.005"} 1', lines)
+        self.assertIn('docprocessor_stage_duration_seconds_bucket{stage="discovery",le="0.25"} 2', lines)
+        self.assertIn('docprocessor_stage_duration_seconds_bucket{stage="discovery",le="+Inf"} 2', lines)
+        self.assertIn('docprocessor_stage_duration_seconds_sum{stage="discovery"} 0.203000', lines)
+        self.assertIn('docprocessor_stage_duration_seconds_count{stage="discovery"} 2', lines)
+        self.assertIn('docprocessor_last_run_events{event="files_ok"} 2', lines)
+        # Every sample follows its metric's TYPE line
+        types = [line.split()[2] for line in lines if line.startswith("# TYPE ")]
+        for line in lines:
+            if not line.startswith("#"):
+                self.assertTrue(any(line.startswith(name) for name in types), line)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+"""
+Tests for the remembered marker page ranges
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docprocessor.pagehints import PageHints  # noqa: E402
+from docprocessor.rules import RuleEngine, RuleSet  # noqa: E402
+
+
+class PageHintsTest(unittest.TestCase):
+
+    def test_hints_are_kept_per_template(self):
+        rules = RuleEngine([RuleSet("a@example.com", name="a"), RuleSet("b@example.com", name="b")])
+        hints = PageHints()
+
+        self.assertTrue(hints.learn([[2, 3], [2, 3], [0, 0]], "b"))
+        self.assertTrue(hints.learn([[0, 0]], "a"))
+
+        self.assertEqual(hints.for_rules(rules), [("a", [0, 0]), ("b", [2, 3])])
+        self.assertEqual(hints.for_rules(RuleSet("b@example.com", name="b")), [("b", [2, 3])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Tests for overlapped extract-and-print runs against the fake spooler
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus, pdf_bytes  # noqa: E402
+from docprocessor.extraction import STATUS_NO_MARKERS, STATUS_ERROR  # noqa: E402
+from docprocessor.pipeline import process_and_print  # noqa: E402
+from docprocessor.printing import FakeSpooler, PrintScheduler, JOB_DONE  # noqa: E402
+
+
+class ProcessAndPrintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp, "letters")
+        self.letters = generate_corpus(self.folder, 3, pages=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def add_file(self, name, contents):
+        path = os.path.join(self.folder, name)
+        with open(path, 'wb') as f:
+            f.write(contents)
+        return path
+
+    def test_only_extracted_letters_are_printed(self):
+        unreadable = self.add_file("unreadable.pdf", b"%PDF-1.4\nnot really a PDF")
+        no_markers = self.add_file("no_markers.pdf", pdf_bytes([["Just a note, with no address block."]]))
+        pdf_files = sorted(self.letters + [unreadable, no_markers])
+        spooler = FakeSpooler(seconds_per_job=0.01)
+        not_printed = []
+
+        summary, jobs = process_and_print(
+            pdf_files, os.path.join(self.tmp, "out.xlsx"), PrintScheduler(spooler, idle_seconds=0.05),
+            on_not_printed=lambda record: not_printed.append((record['path'], record['status'])),
+            workers=1, use_cache=False, document_timeout=0, document_cpu_seconds=0, root=self.folder)
+
+        self.assertEqual(summary['extracted'], 3)
+        self.assertEqual(spooler.printed, self.letters)
+        self.assertEqual([job.state for job in jobs], [JOB_DONE] * 3)
+        self.assertEqual(sorted(not_printed), [(no_markers, STATUS_NO_MARKERS), (unreadable, STATUS_ERROR)])
+
+
+if __name__ == "__main__":
+    unittest.main()
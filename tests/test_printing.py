@@ -0,0 +1,108 @@
+"""
+Tests for print scheduling against the fake spooler
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor.printing import (FakeSpooler, BatchMerger, PrintScheduler,  # noqa: E402
+                                   JOB_SUBMITTED, JOB_DONE, JOB_FAILED)
+
+
+class PrintSchedulerTest(unittest.TestCase):
+
+    def run_scheduler(self, spooler, paths, jobs_in_flight=2):
+        events = []
+        scheduler = PrintScheduler(spooler, jobs_in_flight=jobs_in_flight, idle_seconds=0.05)
+        jobs = scheduler.run(paths, on_event=lambda job: events.append((job.file, job.state)))
+        return jobs, events
+
+    def test_every_letter_prints(self):
+        paths = [f"letter_{i}.pdf" for i in range(5)]
+        spooler = FakeSpooler(seconds_per_job=0.01)
+
+        jobs, events = self.run_scheduler(spooler, paths)
+
+        self.assertEqual([job.state for job in jobs], [JOB_DONE] * 5)
+        self.assertEqual(spooler.printed, paths)
+        self.assertEqual(spooler.jobs, {})
+        # Each letter is reported submitted before it is reported done
+        for path in paths:
+            self.assertLess(events.index((path, JOB_SUBMITTED)), events.index((path, JOB_DONE)))
+
+    def test_failed_letter_prints_on_retry(self):
+        paths = ["a.pdf", "b.pdf", "c.pdf"]
+        spooler = FakeSpooler(seconds_per_job=0.01, fail_files=["b.pdf"])
+
+        jobs, _ = self.run_scheduler(spooler, paths)
+
+        self.assertEqual([job.state for job in jobs], [JOB_DONE, JOB_FAILED, JOB_DONE])
+        self.assertEqual(jobs[1].error, "printer error")
+        self.assertEqual(spooler.printed, ["a.pdf", "c.pdf"])
+
+        # The printer recovers and only the failed letter is sent again
+        spooler.fail_files.clear()
+        retry = [job.path for job in jobs if job.state == JOB_FAILED]
+        jobs, _ = self.run_scheduler(spooler, retry)
+
+        self.assertEqual([(job.file, job.state) for job in jobs], [("b.pdf", JOB_DONE)])
+        self.assertEqual(spooler.printed, ["a.pdf", "c.pdf", "b.pdf"])
+
+    def test_submit_failure_is_reported(self):
+        class Refusing(FakeSpooler):
+            def submit(self, path):
+                if path == "b.pdf":
+                    raise OSError("printer offline")
+                return super().submit(path)
+
+        jobs, _ = self.run_scheduler(Refusing(seconds_per_job=0.01), ["a.pdf", "b.pdf", "c.pdf"])
+
+        self.assertEqual([job.state for job in jobs], [JOB_DONE, JOB_FAILED, JOB_DONE])
+        self.assertEqual(jobs[1].error, "printer offline")
+
+
+class BatchMergerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_odd_page_letters_are_padded(self):
+        from PyPDF2 import PdfReader
+
+        pdf_files = generate_corpus(os.path.join(self.tmp, "letters"), 3, pages=1)
+        spooler = FakeSpooler(seconds_per_job=0.01)
+        merger = BatchMerger(pdf_files, letters_per_batch=2, work_dir=self.tmp)
+        page_counts = []
+
+        def on_event(job):
+            if job.state == JOB_SUBMITTED:
+                page_counts.append(len(PdfReader(job.path).pages))
+
+        try:
+            jobs = PrintScheduler(spooler, idle_seconds=0.05).run(merger, on_event=on_event)
+        finally:
+            merger.close()
+
+        # Every one-page letter gets a blank back page, so each starts on a fresh sheet
+        self.assertEqual(merger.padded, 3)
+        self.assertEqual([job.letters for job in jobs], [pdf_files[:2], pdf_files[2:]])
+        self.assertEqual([job.pages for job in jobs], [4, 2])
+        self.assertEqual(page_counts, [4, 2])
+        self.assertEqual([job.state for job in jobs], [JOB_DONE, JOB_DONE])
+        self.assertFalse(os.path.exists(merger.work_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
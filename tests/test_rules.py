@@ -0,0 +1,127 @@
+"""
+Tests for matching several letter templates and their page hints
+
+    python -m pytest tests
+"""
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import pdf_bytes  # noqa: E402
+from docprocessor.engine import ExtractionEngine  # noqa: E402
+from docprocessor.extraction import extract_document, slice_address_block, STATUS_OK  # noqa: E402
+from docprocessor.pagehints import PageHints  # noqa: E402
+from docprocessor.rules import RuleEngine, RuleSet, rules_from_dict  # noqa: E402
+
+RULES = RuleEngine([
+    RuleSet("letters@lilly.example", "Dear", start_offset=0, skip_lines=1, name="lilly"),
+    RuleSet("letters@acme.example", "Greetings", start_offset=0, skip_lines=1, name="acme"),
+])
+
+FILLER = ["Terms and conditions apply to every account."] * 5
+
+
+def letter(sender, greeting, name):
+    return [sender, name, "1 High Street", "York", f"{greeting} {name},"]
+
+
+class RuleEngineTest(unittest.TestCase):
+
+    def test_each_letter_matches_its_own_template(self):
+        lilly = "\n".join(letter("letters@lilly.example", "Dear", "Alex Smith"))
+        acme = "\n".join(letter("letters@acme.example", "Greetings", "Sam Jones"))
+
+        self.assertEqual(slice_address_block(lilly, RULES), "Alex Smith\n1 High Street\nYork")
+        self.assertEqual(slice_address_block(acme, RULES), "Sam Jones\n1 High Street\nYork")
+
+    def test_first_sender_with_a_greeting_wins(self):
+        # The acme sender comes first, but only lilly's greeting is present
+        text = "letters@acme.example\n" + "\n".join(letter("letters@lilly.example", "Dear", "Alex Smith"))
+        self.assertEqual(slice_address_block(text, RULES), "Alex Smith\n1 High Street\nYork")
+
+        # With both greetings present the earlier sender decides
+        text = "\n".join(letter("letters@acme.example", "Greetings", "Sam Jones")) + "\nDear reader"
+        self.assertEqual(slice_address_block(text, RULES), "Sam Jones\n1 High Street\nYork")
+
+    def test_rules_from_a_template_list(self):
+        rules = rules_from_dict([template.to_dict() for template in RULES.templates])
+        self.assertEqual([template.name for template in rules.templates], ["lilly", "acme"])
+        self.assertEqual(rules.key, RULES.key)
+
+    def test_blank_markers_and_negative_offsets_are_refused(self):
+        for bad in ({'sender_marker': ""}, {'greeting_marker': "  \t"}, {'greeting_marker': None},
+                    {'start_offset': -1}, {'skip_lines': "-2"}):
+            with self.subTest(bad=bad), self.assertRaises(ValueError):
+                RuleSet.from_dict(dict(RULES.templates[0].to_dict(), **bad))
+
+    def test_bad_rules_file_is_a_usage_error(self):
+        from docprocessor.cli import main, EXIT_USAGE
+
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "rules.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'templates': [{'name': "blank", 'sender_marker': " "}]}, f)
+            with redirect_stderr(io.StringIO()) as stderr:
+                code = main([tmp, "-o", os.path.join(tmp, "out.xlsx"), "--rules", path])
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(code, EXIT_USAGE)
+        self.assertIn("sender_marker", stderr.getvalue())
+
+
+class TemplatePageHintsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        # lilly letters carry the address on page 1, acme letters on page 3
+        self.lilly = self.write("lilly.pdf", [letter("letters@lilly.example", "Dear", "Alex Smith"),
+                                              FILLER, FILLER])
+        self.acme = self.write("acme.pdf", [FILLER, FILLER,
+                                            letter("letters@acme.example", "Greetings", "Sam Jones")])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, pages):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(pdf_bytes(pages))
+        return path
+
+    def test_hint_is_used_for_its_own_template_only(self):
+        hinted = extract_document(self.acme, RULES, page_hints=[("acme", [2, 2])])
+        self.assertEqual((hinted['status'], hinted['template'], hinted['pages_read']), (STATUS_OK, "acme", 1))
+
+        # Each template's range is tried in turn until one yields its own letter
+        both = extract_document(self.acme, RULES, page_hints=[("lilly", [0, 0]), ("acme", [2, 2])])
+        self.assertEqual((both['template'], both['pages_read']), ("acme", 2))
+
+        # lilly's range holds no lilly letter here, so the whole document is scanned
+        unhinted = extract_document(self.acme, RULES, page_hints=[("lilly", [2, 2])])
+        self.assertEqual(unhinted['template'], "acme")
+        self.assertEqual(unhinted['pages_read'], 3)
+        self.assertEqual(unhinted['data'], hinted['data'])
+
+    def test_engine_learns_a_range_per_template(self):
+        hints = PageHints(os.path.join(self.tmp, "out.xlsx.pagehints.json"))
+        engine = ExtractionEngine(workers=1, page_hints=hints, rules=RULES,
+                                  document_timeout=0, document_cpu_seconds=0)
+        records = list(engine.run([self.lilly, self.acme]))
+
+        self.assertEqual([record['template'] for record in records], ["lilly", "acme"])
+        saved = PageHints(hints.path)
+        self.assertEqual(saved.for_rules(RULES), [("lilly", [0, 0]), ("acme", [2, 2])])
+
+
+if __name__ == "__main__":
+    unittest.main()
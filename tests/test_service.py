@@ -0,0 +1,126 @@
+"""
+Tests for the local HTTP extraction service
+
+    python -m pytest tests
+"""
+import http.client
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor.service import serve  # noqa: E402
+
+
+class ExtractionServiceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = tempfile.mkdtemp()
+        cls.pdf_files = generate_corpus(cls.corpus, 3, pages=1)
+        cls.stop_event = threading.Event()
+        ready = threading.Event()
+        servers = []
+
+        def on_ready(server):
+            servers.append(server)
+            ready.set()
+
+        cls.thread = threading.Thread(target=serve, kwargs=dict(
+            port=0, stop_event=cls.stop_event, on_ready=on_ready, workers=1, max_active=1))
+        cls.thread.start()
+        if not ready.wait(60):
+            raise RuntimeError("The service did not start")
+        cls.server = servers[0]
+        cls.service = cls.server.service
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stop_event.set()
+        cls.thread.join()
+        shutil.rmtree(cls.corpus)
+
+    def post(self, body, content_type="application/json"):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=30)
+        try:
+            if not isinstance(body, bytes):
+                body = json.dumps(body)
+            connection.request("POST", "/extract", body, {"Content-Type": content_type})
+            response = connection.getresponse()
+            return response.status, response.getheader("Content-Type"), response.read().decode('utf-8')
+        finally:
+            connection.close()
+
+    def test_single_document(self):
+        status, _, body = self.post({'path': self.pdf_files[0]})
+
+        record = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual(record['status'], "ok")
+        self.assertEqual(record['file'], os.path.basename(self.pdf_files[0]))
+        self.assertTrue(record['data'])
+
+    def test_upload(self):
+        with open(self.pdf_files[1], 'rb') as f:
+            status, _, body = self.post(f.read(), "application/pdf")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['status'], "ok")
+        self.assertEqual(os.listdir(self.service.spool_dir), [])
+
+    def test_batch_is_streamed_as_ndjson(self):
+        status, content_type, body = self.post({'paths': self.pdf_files})
+
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(status, 200)
+        self.assertEqual(content_type, "application/x-ndjson")
+        self.assertEqual(sorted(record['index'] for record in records), [0, 1, 2])
+        self.assertTrue(all(record['status'] == "ok" for record in records))
+
+    def test_busy_service_refuses_with_503(self):
+        # The one slot is taken (waiting for it if the last request's thread
+        # still holds it), and no request may queue for it
+        self.assertTrue(self.service.admission.enter())
+        try:
+            with mock.patch.object(self.service.admission, 'max_queued', 0):
+                status, _, body = self.post({'path': self.pdf_files[0]})
+        finally:
+            self.service.admission.leave()
+
+        self.assertEqual(status, 503)
+        self.assertIn('error', json.loads(body))
+        self.assertEqual(self.post({'path': self.pdf_files[0]})[0], 200)
+
+    def test_failed_extraction_is_answered(self):
+        with mock.patch.object(self.service, 'spool', side_effect=OSError("No space left on device")):
+            with open(self.pdf_files[0], 'rb') as f:
+                status, _, body = self.post(f.read(), "application/pdf")
+        self.assertEqual(status, 500)
+        self.assertIn("No space left", json.loads(body)['error'])
+
+    def test_failed_batch_ends_the_stream(self):
+        def failing(documents):
+            yield {'index': 0, 'status': "ok"}
+            raise OSError("No space left on device")
+
+        with mock.patch.object(self.service, 'extract_many', failing):
+            status, _, body = self.post({'paths': self.pdf_files})
+
+        # read() raises IncompleteRead if the final chunk is missing
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(status, 200)
+        self.assertEqual(lines[0]['index'], 0)
+        self.assertIn("No space left", lines[-1]['error'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+"""
+Tests for the streaming, sharded workbook writer
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docprocessor import shards  # noqa: E402
+from docprocessor.shards import StreamingWorkbookWriter, ROLLOVER_SHEET  # noqa: E402
+
+
+def workbook_rows(paths):
+    from openpyxl import load_workbook
+
+    rows = []
+    for path in paths:
+        wb = load_workbook(path, read_only=True)
+        try:
+            for sheet in wb.worksheets:
+                rows.extend(row[0] for row in sheet.iter_rows(min_row=2, values_only=True))
+        finally:
+            wb.close()
+    return rows
+
+
+def sheet_rows(path):
+    """{sheet title: [(file, data)]} of a shard workbook"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        return {sheet.title: [tuple(row) for row in sheet.iter_rows(min_row=2, values_only=True)]
+                for sheet in wb.worksheets}
+    finally:
+        wb.close()
+
+
+class StreamingWorkbookWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.excel_path = os.path.join(self.tmp, "out.xlsx")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_saved_shard_is_synced_before_it_replaces_the_last_one(self):
+        with mock.patch.object(shards, '_replace_durably', wraps=shards._replace_durably) as replace:
+            for filename in ("a.pdf", "b.pdf"):
+                writer = StreamingWorkbookWriter(self.excel_path)
+                writer.add(filename, filename, "data")
+                writer.close()
+
+        self.assertEqual(replace.call_count, 2)
+        for call in replace.call_args_list:
+            tmp_path, path = call[0]
+            self.assertEqual(tmp_path, path + ".tmp")
+            self.assertTrue(os.path.exists(path))
+        self.assertEqual(workbook_rows(writer.shards_written), ["a.pdf", "b.pdf"])
+
+    def test_flush_continues_the_open_shard(self):
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=10)
+        writer.add("a.pdf", "1", "A")
+        writer.flush()
+        writer.add("b.pdf", "2", "B")
+        writer.close()
+
+        self.assertEqual(len(writer.shards_written), 1)
+        self.assertEqual(workbook_rows(writer.shards_written), ["a.pdf", "b.pdf"])
+
+    def test_flush_does_not_save_the_workbook(self):
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=1000)
+        with mock.patch.object(writer, '_save', wraps=writer._save) as save:
+            for n in range(50):
+                writer.add(f"{n:02d}.pdf", str(n), "data")
+                writer.flush()
+                self.assertEqual(writer.rows_saved, n + 1)
+            self.assertEqual(save.call_count, 0)
+            writer.close()
+
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(writer.rows_copied, 0)
+        self.assertEqual(workbook_rows(writer.shards_written), [f"{n:02d}.pdf" for n in range(50)])
+
+    def test_flushes_fill_whole_sheets(self):
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=3, rollover=ROLLOVER_SHEET)
+        for n in range(4):
+            writer.add(f"{n}.pdf", str(n), "data")
+        writer.flush()
+        for n in range(4, 6):
+            writer.add(f"{n}.pdf", str(n), "data")
+            writer.flush()
+        writer.close()
+
+        self.assertEqual(len(writer.shards_written), 1)
+        rows = sheet_rows(writer.shards_written[0])
+        self.assertEqual(list(rows), ["Extracted Data 1", "Extracted Data 2"])
+        self.assertEqual([len(sheet) for sheet in rows.values()], [3, 3])
+
+    def test_next_run_carries_full_sheets_over(self):
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=3, rollover=ROLLOVER_SHEET)
+        for n in range(6):
+            writer.add(f"{n}.pdf", str(n), "data")
+        writer.close()
+
+        # The last sheet is full, so nothing is read back
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=3, rollover=ROLLOVER_SHEET)
+        writer.add("6.pdf", "6", "data")
+        writer.close()
+        self.assertEqual(writer.rows_copied, 0)
+
+        # Only the last sheet, which has room, is read back
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=3, rollover=ROLLOVER_SHEET)
+        writer.add("7.pdf", "7", "data")
+        writer.close()
+        self.assertEqual(writer.rows_copied, 1)
+
+        self.assertEqual(len(writer.shards_written), 1)
+        rows = sheet_rows(writer.shards_written[0])
+        self.assertEqual([len(sheet) for sheet in rows.values()], [3, 3, 2])
+        self.assertEqual(workbook_rows(writer.shards_written), [f"{n}.pdf" for n in range(8)])
+
+    def test_flushed_rows_survive_a_writer_that_never_closed(self):
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=3, rollover=ROLLOVER_SHEET)
+        for n in range(5):
+            writer.add(f"{n}.pdf", str(n), f"data {n}")
+        writer.flush()
+        writer.add("lost.pdf", "lost", "never flushed")
+        # The process dies: nothing more is saved or committed
+        writer.conn.close()
+
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=3, rollover=ROLLOVER_SHEET)
+        self.assertEqual(writer.add("2.pdf", "2", "data 2"), shards.ROW_SKIPPED)
+        self.assertEqual(writer.add("lost.pdf", "lost", "never flushed"), shards.ROW_APPENDED)
+        writer.close()
+
+        rows = sheet_rows(writer.shards_written[0])
+        self.assertEqual(rows["Extracted Data 1"], [(f"{n}.pdf", f"data {n}") for n in range(3)])
+        self.assertEqual(rows["Extracted Data 2"], [("3.pdf", "data 3"), ("4.pdf", "data 4"),
+                                                    ("lost.pdf", "never flushed")])
+
+    def test_flushed_rows_are_saved_by_the_next_close(self):
+        writer = StreamingWorkbookWriter(self.excel_path)
+        writer.add("a.pdf", "1", "A")
+        writer.flush()
+        writer.conn.close()
+
+        # A later run with nothing new to write still saves them
+        writer = StreamingWorkbookWriter(self.excel_path)
+        writer.close()
+        self.assertEqual(workbook_rows(writer.shards_written), ["a.pdf"])
+
+    def test_rows_saved_but_not_marked_are_not_repeated(self):
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=10)
+        writer.add("a.pdf", "1", "A")
+        writer.add("b.pdf", "2", "B")
+        writer.close()
+        # As if the process died after saving the workbook, before committing that it had
+        conn = sqlite3.connect(shards.shard_index_path_for(self.excel_path))
+        conn.executemany("INSERT INTO pending (shard, row, filename, data) VALUES (1, ?, ?, ?)",
+                         [(2, "a.pdf", "A"), (3, "b.pdf", "B")])
+        conn.commit()
+        conn.close()
+
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=10)
+        writer.add("c.pdf", "3", "C")
+        writer.close()
+
+        self.assertEqual(workbook_rows(writer.shards_written), ["a.pdf", "b.pdf", "c.pdf"])
+
+    def test_continues_a_workbook_written_by_openpyxl(self):
+        from openpyxl import Workbook
+
+        # Shards written by earlier versions use openpyxl's shared strings
+        path = os.path.join(self.tmp, "out_2024-01-01_001.xlsx")
+        wb = Workbook()
+        wb.remove(wb.active)
+        for title, files in (("Extracted Data 1", ["0.pdf", "1.pdf", "2.pdf"]), ("Extracted Data 2", ["3.pdf"])):
+            sheet = wb.create_sheet(title)
+            sheet.append(list(shards.HEADERS))
+            for filename in files:
+                sheet.append([filename, "old"])
+        wb.save(path)
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=3, rollover=ROLLOVER_SHEET)
+        writer.conn.executemany(
+            "INSERT INTO shards (workbook, sheet, rows, created) VALUES (?, ?, ?, '')",
+            [(os.path.basename(path), "Extracted Data 1", 3), (os.path.basename(path), "Extracted Data 2", 1)])
+        writer.conn.commit()
+        writer.close()
+
+        writer = StreamingWorkbookWriter(self.excel_path, max_rows=3, rollover=ROLLOVER_SHEET)
+        for n in range(4, 7):
+            writer.add(f"{n}.pdf", str(n), "new")
+        writer.close()
+
+        self.assertEqual(writer.shards_written, [path])
+        rows = sheet_rows(path)
+        self.assertEqual(rows["Extracted Data 1"], [(f"{n}.pdf", "old") for n in range(3)])
+        self.assertEqual(rows["Extracted Data 2"], [("3.pdf", "old"), ("4.pdf", "new"), ("5.pdf", "new")])
+        self.assertEqual(rows["Extracted Data 3"], [("6.pdf", "new")])
+
+
+if __name__ == "__main__":
+    unittest.main()
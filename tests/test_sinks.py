@@ -0,0 +1,217 @@
+"""
+Tests for the CSV, NDJSON, SQLite and Parquet outputs
+
+    python -m pytest tests
+"""
+import csv
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docprocessor.sinks import (CsvSink, NdjsonSink, SqliteSink, ParquetSink, SinkGroup, FIELDS,  # noqa: E402
+                                STDOUT, PARQUET_STAGING_FILE, PARQUET_UNFINISHED_PART)
+from docprocessor.workbook import (index_path_for, ROW_APPENDED, ROW_UPDATED,  # noqa: E402
+                                   ROW_SKIPPED, ROW_DUPLICATE)
+
+
+def csv_rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+class CsvSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "rows.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_header_is_written_once_when_appending(self):
+        for filename in ("a.pdf", "b.pdf"):
+            sink = CsvSink(self.path)
+            sink.add(filename, filename, "data")
+            sink.close()
+
+        rows = csv_rows(self.path)
+        self.assertEqual(rows[0], list(FIELDS))
+        self.assertEqual([row[0] for row in rows[1:]], ["a.pdf", "b.pdf"])
+
+    def test_reopened_sink_remembers_what_it_wrote(self):
+        sink = CsvSink(self.path)
+        sink.add("a.pdf", "sha-a", "A")
+        sink.add("b.pdf", "sha-b", "B")
+        sink.close()
+        self.assertTrue(os.path.exists(index_path_for(self.path)))
+
+        sink = CsvSink(self.path)
+        self.assertEqual(sink.add("a.pdf", "sha-a", "A"), ROW_SKIPPED)
+        self.assertEqual(sink.add("copy of a.pdf", "sha-a", "A"), ROW_DUPLICATE)
+        self.assertEqual(sink.add("b.pdf", "sha-b2", "B2"), ROW_UPDATED)
+        self.assertEqual(sink.add("c.pdf", "sha-c", "C"), ROW_APPENDED)
+        counts = sink.close()
+
+        self.assertEqual(counts, {ROW_APPENDED: 1, ROW_UPDATED: 1, ROW_SKIPPED: 1, ROW_DUPLICATE: 1})
+        # Append-only: the changed file gets a second row
+        self.assertEqual([row[0] for row in csv_rows(self.path)[1:]], ["a.pdf", "b.pdf", "b.pdf", "c.pdf"])
+
+
+class NdjsonSinkTest(unittest.TestCase):
+
+    def test_stdout_has_no_index(self):
+        out = io.StringIO()
+        with mock.patch.object(sys, 'stdout', out):
+            sink = NdjsonSink(STDOUT)
+            self.assertIsNone(sink.index)
+            self.assertEqual(sink.add("a.pdf", "sha-a", "A"), ROW_APPENDED)
+            self.assertEqual(sink.add("a.pdf", "sha-a", "A"), ROW_APPENDED)
+            sink.close()
+
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        self.assertFalse(os.path.exists(index_path_for(STDOUT)))
+
+
+class SqliteSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "rows.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_changed_content_replaces_the_row(self):
+        sink = SqliteSink(self.path)
+        sink.add("a.pdf", "sha-a", "old")
+        sink.close()
+
+        sink = SqliteSink(self.path)
+        self.assertEqual(sink.add("a.pdf", "sha-a", "old"), ROW_SKIPPED)
+        self.assertEqual(sink.add("a.pdf", "sha-a2", "new"), ROW_UPDATED)
+        sink.close()
+
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute("SELECT file, sha256, data FROM extracted_data").fetchall()
+        finally:
+            conn.close()
+        self.assertEqual(rows, [("a.pdf", "sha-a2", "new")])
+
+
+class SinkGroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_counts_and_rows_saved_across_sinks(self):
+        primary = CsvSink(os.path.join(self.tmp, "rows.csv"))
+        sqlite_sink = SqliteSink(os.path.join(self.tmp, "rows.sqlite"))
+        ndjson_sinks = [NdjsonSink(os.path.join(self.tmp, f"rows{n}.ndjson")) for n in range(2)]
+        group = SinkGroup([primary, sqlite_sink] + ndjson_sinks)
+
+        self.assertEqual(group.add("a.pdf", "sha-a", "A"), ROW_APPENDED)
+        self.assertEqual(group.add("a.pdf", "sha-a", "A"), ROW_SKIPPED)
+        self.assertEqual(group.add("b.pdf", "sha-b", "B"), ROW_APPENDED)
+        self.assertEqual(group.rows_added, 3)
+        self.assertEqual(group.counts, {ROW_APPENDED: 2, ROW_UPDATED: 0, ROW_SKIPPED: 1, ROW_DUPLICATE: 0})
+
+        # The text files are fsync'd but the SQLite transaction is still open
+        primary.flush()
+        for sink in ndjson_sinks:
+            sink.flush()
+        self.assertEqual(group.rows_saved, 0)
+        group.flush()
+        self.assertEqual(group.rows_saved, 3)
+
+        # Timings of sinks of the same format are summed under one key
+        timings = group.timings
+        self.assertEqual(set(timings), {'write', 'save', 'sqlite_write', 'sqlite_save',
+                                        'ndjson_write', 'ndjson_save'})
+        self.assertEqual(timings['write'], primary.timings['write'])
+        self.assertAlmostEqual(timings['ndjson_write'], sum(sink.timings['write'] for sink in ndjson_sinks))
+        group.close()
+        self.assertEqual([output['rows'] for output in group.outputs()],
+                         [{ROW_APPENDED: 2, ROW_UPDATED: 0, ROW_SKIPPED: 1, ROW_DUPLICATE: 0}] * 4)
+
+
+class ParquetSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "rows.parquet")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def parts(self):
+        return sorted(name for name in os.listdir(self.path) if name.startswith("part-"))
+
+    def files(self):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(self.path)
+        # A folder holding only "_"-prefixed files reads as a table with no columns
+        return table.column('file').to_pylist() if table.num_rows else []
+
+    def test_flushes_do_not_finish_parts(self):
+        sink = ParquetSink(self.path, row_group_rows=10, part_rows=1000)
+        for n in range(100):
+            sink.add(f"{n:03d}.pdf", str(n), "data")
+            sink.flush()
+            self.assertEqual(sink.rows_saved, n + 1)
+        self.assertEqual(self.parts(), [])
+        # Readers skip the unfinished part and the staged rows meanwhile
+        self.assertTrue(os.path.exists(os.path.join(self.path, PARQUET_UNFINISHED_PART)))
+        self.assertEqual(self.files(), [])
+        sink.close()
+
+        self.assertEqual(len(self.parts()), 1)
+        self.assertEqual(sorted(os.listdir(self.path)), self.parts())
+        self.assertEqual(self.files(), [f"{n:03d}.pdf" for n in range(100)])
+
+    def test_parts_are_finished_at_part_rows(self):
+        sink = ParquetSink(self.path, row_group_rows=2, part_rows=4)
+        for n in range(10):
+            sink.add(f"{n}.pdf", str(n), "data")
+        self.assertEqual(len(self.parts()), 2)
+        sink.close()
+
+        import pyarrow.parquet as pq
+
+        self.assertEqual([pq.read_metadata(os.path.join(self.path, name)).num_rows for name in self.parts()],
+                         [4, 4, 2])
+
+    def test_staged_rows_survive_a_run_that_never_closed(self):
+        sink = ParquetSink(self.path, row_group_rows=2)
+        for n in range(3):
+            sink.add(f"{n}.pdf", str(n), "data")
+        sink.flush()
+        # The process dies with its part unfinished, partway through a line
+        sink.staging.write(b'{"file": "torn')
+        sink.staging.close()
+        sink.index.close()
+
+        sink = ParquetSink(self.path, row_group_rows=2)
+        self.assertEqual(sink.rows_recovered, 3)
+        self.assertEqual(sink.add("1.pdf", "1", "data"), "skipped")
+        sink.add("3.pdf", "3", "data")
+        sink.close()
+
+        self.assertEqual(len(self.parts()), 1)
+        self.assertEqual(self.files(), ["0.pdf", "1.pdf", "2.pdf", "3.pdf"])
+        self.assertFalse(os.path.exists(os.path.join(self.path, PARQUET_STAGING_FILE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
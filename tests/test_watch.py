@@ -0,0 +1,96 @@
+"""
+Tests for watch-folder mode
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor.watch import FolderWatcher, watch_folder  # noqa: E402
+
+
+class FolderWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_growing_file_waits_until_its_size_settles(self):
+        watcher = FolderWatcher(self.tmp, settle_seconds=2.0)
+        path = os.path.join(self.tmp, "scan.pdf")
+        with open(path, 'wb') as f:
+            f.write(b"%PDF-1.4\n")
+            f.flush()
+            self.assertEqual(watcher.poll(now=0.0), [])
+            # Still being written: every change restarts the settle time
+            for now in (1.5, 3.0, 4.5):
+                f.write(b"x" * 1024)
+                f.flush()
+                self.assertEqual(watcher.poll(now=now), [])
+
+        self.assertEqual(watcher.poll(now=6.0), [])
+        self.assertEqual(watcher.poll(now=6.5), [path])
+        watcher.mark_processed([path])
+        self.assertEqual(watcher.poll(now=10.0), [])
+
+
+class WatchFolderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp, "letters")
+        generate_corpus(self.folder, 3, pages=1)
+        self.output = os.path.join(self.tmp, "out.xlsx")
+        self.batches = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=watch_folder, args=(self.folder, self.output), kwargs={
+            'workers': 1, 'use_cache': False, 'poll_seconds': 0.05, 'settle_seconds': 0.2,
+            'document_timeout': 0, 'document_cpu_seconds': 0,
+            'on_batch': self.batches.append, 'stop_event': self.stop_event})
+
+    def tearDown(self):
+        self.stop_event.set()
+        self.thread.join(timeout=30)
+        shutil.rmtree(self.tmp)
+
+    def wait_for_batches(self, count, timeout=30):
+        deadline = time.monotonic() + timeout
+        while len(self.batches) < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(len(self.batches), count)
+
+    def test_only_changed_files_are_extracted_again(self):
+        self.thread.start()
+        self.wait_for_batches(1)
+        self.assertEqual((self.batches[0]['files'], self.batches[0]['extracted']), (3, 3))
+
+        # A rescan replaces one letter with a new version
+        changed = os.path.join(self.folder, "letter_000001.pdf")
+        replacement = os.path.join(self.tmp, "rescan")
+        generate_corpus(replacement, 1, pages=1, seed=7)
+        os.replace(os.path.join(replacement, "letter_000000.pdf"), changed)
+        self.wait_for_batches(2)
+        self.assertEqual((self.batches[1]['files'], self.batches[1]['extracted']), (1, 1))
+
+        # Nothing changes, so nothing more is extracted
+        time.sleep(0.5)
+        self.assertEqual(len(self.batches), 2)
+        self.stop_event.set()
+        self.thread.join(timeout=30)
+        self.assertFalse(self.thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
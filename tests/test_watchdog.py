@@ -0,0 +1,50 @@
+"""
+Tests for moving documents that overran their budget to quarantine
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docprocessor.watchdog import quarantine, QUARANTINE_DIR  # noqa: E402
+
+
+class QuarantineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def letter(self, contents):
+        path = os.path.join(self.tmp, "letter.pdf")
+        with open(path, 'wb') as f:
+            f.write(contents)
+        return path
+
+    def test_earlier_offender_of_the_same_name_is_kept(self):
+        first = quarantine(self.letter(b"first"))
+        second = quarantine(self.letter(b"second"))
+        third = quarantine(self.letter(b"third"))
+
+        folder = os.path.join(self.tmp, QUARANTINE_DIR)
+        self.assertEqual([first, second, third], [os.path.join(folder, name) for name in
+                                                  ("letter.pdf", "letter (2).pdf", "letter (3).pdf")])
+        for path, contents in zip((first, second, third), (b"first", b"second", b"third")):
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), contents)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "letter.pdf")))
+
+    def test_missing_file_leaves_no_placeholder(self):
+        self.assertIsNone(quarantine(os.path.join(self.tmp, "gone.pdf")))
+        self.assertEqual(os.listdir(os.path.join(self.tmp, QUARANTINE_DIR)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests for the append-only workbook writer
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docprocessor import workbook  # noqa: E402
+from docprocessor.workbook import (WorkbookWriter, index_path_for,  # noqa: E402
+                                   ROW_APPENDED, ROW_UPDATED, ROW_SKIPPED, ROW_DUPLICATE)
+
+
+def sheet_rows(excel_path):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(excel_path, read_only=True)
+    try:
+        return [tuple(row[:2]) for row in wb.worksheets[0].iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+
+class WorkbookWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.excel_path = os.path.join(self.tmp, "out.xlsx")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, rows):
+        writer = WorkbookWriter(self.excel_path)
+        try:
+            return writer.write(rows), writer.rebuilt
+        finally:
+            writer.conn.close()
+
+    def test_row_missing_from_sheet_rebuilds_index(self):
+        self.write([("a.pdf", "1", "A"), ("b.pdf", "2", "B")])
+        # The index points a.pdf at a row the worksheet does not have
+        conn = sqlite3.connect(index_path_for(self.excel_path))
+        conn.execute("UPDATE rows SET row = 50 WHERE filename = 'a.pdf'")
+        conn.commit()
+        conn.close()
+
+        writer = WorkbookWriter(self.excel_path)
+        try:
+            counts = writer.write([("a.pdf", "3", "A2"), ("c.pdf", "4", "C")])
+        finally:
+            writer.conn.close()
+
+        # The rebuilt index keeps a.pdf's content hash, so its new content replaces the row
+        self.assertTrue(writer.rebuilt)
+        self.assertEqual(counts[ROW_APPENDED], 1)
+        self.assertEqual(counts[ROW_UPDATED], 1)
+        self.assertEqual(sheet_rows(self.excel_path)[1:], [("a.pdf", "A2"), ("b.pdf", "B"), ("c.pdf", "C")])
+
+    def test_outside_save_keeps_content_hashes(self):
+        self.write([("a.pdf", "1", "A"), ("b.pdf", "2", "B")])
+        # As if the workbook had been opened and saved in Excel
+        st = os.stat(self.excel_path)
+        os.utime(self.excel_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+        counts, rebuilt = self.write([("a.pdf", "3", "A2"), ("copy of b.pdf", "2", "B")])
+
+        self.assertTrue(rebuilt)
+        self.assertEqual(counts[ROW_UPDATED], 1)
+        self.assertEqual(counts[ROW_DUPLICATE], 1)
+        self.assertEqual(sheet_rows(self.excel_path)[1:], [("a.pdf", "A2"), ("b.pdf", "B")])
+
+    def test_same_file_twice_in_one_batch(self):
+        counts, _ = self.write([("a.pdf", "1", "old"), ("b.pdf", "2", "B"), ("a.pdf", "3", "new")])
+
+        self.assertEqual(counts[ROW_APPENDED], 2)
+        self.assertEqual(counts[ROW_SKIPPED], 1)
+        self.assertEqual(sheet_rows(self.excel_path)[1:], [("a.pdf", "new"), ("b.pdf", "B")])
+
+        counts, _ = self.write([("b.pdf", "4", "B2"), ("b.pdf", "5", "B3")])
+
+        self.assertEqual(counts[ROW_UPDATED], 1)
+        self.assertEqual(sheet_rows(self.excel_path)[1:], [("a.pdf", "new"), ("b.pdf", "B3")])
+
+    def test_rewritten_sheet_is_synced_before_it_replaces_the_workbook(self):
+        self.write([("a.pdf", "1", "A")])
+        with mock.patch.object(workbook, '_replace_durably', wraps=workbook._replace_durably) as replace:
+            self.write([("b.pdf", "2", "B")])
+
+        replace.assert_called_once()
+        self.assertEqual(replace.call_args[0][1], self.excel_path)
+        self.assertEqual(sheet_rows(self.excel_path)[1:], [("a.pdf", "A"), ("b.pdf", "B")])
+
+    def test_replace_durably_syncs_the_file_and_its_folder(self):
+        tmp_path = os.path.join(self.tmp, "new.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(b"new")
+        with mock.patch.object(workbook.os, 'fsync', wraps=os.fsync) as fsync:
+            workbook._replace_durably(tmp_path, self.excel_path)
+
+        # The file, then (except on Windows) the folder holding it
+        self.assertEqual(fsync.call_count, 1 if os.name == 'nt' else 2)
+        self.assertFalse(os.path.exists(tmp_path))
+        with open(self.excel_path, 'rb') as f:
+            self.assertEqual(f.read(), b"new")
+
+
+if __name__ == "__main__":
+    unittest.main()
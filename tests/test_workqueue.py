@@ -0,0 +1,194 @@
+"""
+Tests for the shared work queue
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+from docprocessor import workqueue  # noqa: E402
+from docprocessor.workqueue import SharedQueue, run_shared, MERGER_LEASE  # noqa: E402
+
+LETTERS = 12
+
+# Lease period of the queue tests, in seconds of the reader's monotonic clock
+LEASE = 0.2
+
+
+class SharedQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.queue_dir = os.path.join(self.tmp, "queue")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_unchanged_lease_is_taken_over(self):
+        first = SharedQueue(self.queue_dir, "first", lease_seconds=LEASE)
+        second = SharedQueue(self.queue_dir, "second", lease_seconds=LEASE)
+        lease = os.path.join(self.queue_dir, "claims", "key")
+
+        self.assertTrue(first.acquire(lease))
+        self.assertFalse(second.acquire(lease))
+
+        # first stops heartbeating, e.g. its workstation lost the share
+        time.sleep(LEASE * 1.5)
+        self.assertTrue(second.acquire(lease))
+        self.assertTrue(second.holds(lease))
+        self.assertFalse(first.holds(lease))
+
+        # Releasing a lease taken over leaves the new holder's file alone
+        first.release(lease)
+        self.assertTrue(os.path.exists(lease))
+
+    def test_heartbeat_keeps_a_lease(self):
+        first = SharedQueue(self.queue_dir, "first", lease_seconds=LEASE)
+        second = SharedQueue(self.queue_dir, "second", lease_seconds=LEASE)
+        lease = os.path.join(self.queue_dir, "claims", "key")
+        first.acquire(lease)
+
+        self.assertFalse(second.acquire(lease))
+        self.assertFalse(second.alive(lease))
+        for _ in range(3):
+            time.sleep(LEASE * 0.6)
+            first.heartbeat()
+            self.assertFalse(second.acquire(lease))
+        self.assertTrue(second.alive(lease))
+
+    def test_lease_age_ignores_file_times(self):
+        first = SharedQueue(self.queue_dir, "first", lease_seconds=LEASE)
+        second = SharedQueue(self.queue_dir, "second", lease_seconds=LEASE)
+        lease = os.path.join(self.queue_dir, "claims", "key")
+        first.acquire(lease)
+
+        # Stamped by a workstation whose clock is an hour behind, then one an hour ahead
+        st = os.stat(lease)
+        os.utime(lease, (st.st_atime - 3600, st.st_mtime - 3600))
+        self.assertFalse(second.acquire(lease))
+        first.heartbeat()
+        os.utime(lease, (st.st_atime + 3600, st.st_mtime + 3600))
+        self.assertFalse(second.acquire(lease))
+
+        time.sleep(LEASE * 1.5)
+        os.utime(lease, (st.st_atime + 3600, st.st_mtime + 3600))
+        self.assertTrue(second.acquire(lease))
+
+    def test_heartbeat_leaves_a_lease_taken_over_alone(self):
+        first = SharedQueue(self.queue_dir, "first", lease_seconds=LEASE)
+        second = SharedQueue(self.queue_dir, "second", lease_seconds=LEASE)
+        lease = os.path.join(self.queue_dir, "claims", "key")
+        first.acquire(lease)
+        second.acquire(lease)
+        time.sleep(LEASE * 1.5)
+        second.acquire(lease)
+
+        first.heartbeat()
+        self.assertTrue(second.holds(lease))
+
+    def test_stale_takeover_lock_is_cleared(self):
+        first = SharedQueue(self.queue_dir, "first", lease_seconds=LEASE)
+        second = SharedQueue(self.queue_dir, "second", lease_seconds=LEASE)
+        lease = os.path.join(self.queue_dir, "claims", "key")
+        first.acquire(lease)
+        # Left by a participant that died while taking the lease over
+        with open(lease + ".steal", 'w') as f:
+            f.write("gone")
+
+        self.assertFalse(second.acquire(lease))
+        time.sleep(LEASE * 1.5)
+        # The lease has gone stale, but the lock is only now seen for the first time
+        self.assertFalse(second.acquire(lease))
+        time.sleep(LEASE * 1.5)
+        self.assertFalse(second.acquire(lease))
+        self.assertFalse(os.path.exists(lease + ".steal"))
+        self.assertTrue(second.acquire(lease))
+
+
+class RunSharedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tmp, "letters")
+        self.pdf_files = generate_corpus(self.folder, LETTERS, pages=1)
+        self.excel_path = os.path.join(self.tmp, "out.xlsx")
+        self.queue_dir = os.path.join(self.tmp, "queue")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_participants(self, names):
+        summaries = {}
+        errors = []
+
+        def participate(name):
+            try:
+                summaries[name] = run_shared(self.folder, self.excel_path, queue_dir=self.queue_dir,
+                                             workers=1, document_timeout=0, document_cpu_seconds=0,
+                                             batch_files=2, worker_id=name)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=participate, args=(name,)) for name in names]
+        with mock.patch.object(workqueue, 'POLL_SECONDS', 0.05), \
+                mock.patch.object(workqueue, 'HEARTBEAT_SECONDS', 0.1), \
+                mock.patch.object(workqueue, 'LEASE_SECONDS', 1.0):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(60)
+        self.assertEqual(errors, [])
+        return summaries
+
+    def sheet_files(self):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(self.excel_path, read_only=True)
+        try:
+            return [row[0] for row in wb.worksheets[0].iter_rows(min_row=2, values_only=True)]
+        finally:
+            wb.close()
+
+    def test_two_participants_write_each_file_once(self):
+        summaries = self.run_participants(["alpha", "beta"])
+
+        self.assertEqual(sum(summary['merger'] for summary in summaries.values()), 1)
+        self.assertEqual(sum(summary['extracted'] for summary in summaries.values()), LETTERS)
+        files = self.sheet_files()
+        self.assertEqual(sorted(files), sorted(os.path.basename(path) for path in self.pdf_files))
+        self.assertEqual(os.listdir(os.path.join(self.queue_dir, "results")), [])
+
+    def test_live_merger_lease_is_left_alone(self):
+        holder = SharedQueue(self.queue_dir, "elsewhere")
+        holder.acquire(os.path.join(self.queue_dir, MERGER_LEASE))
+        with mock.patch.object(workqueue, 'HEARTBEAT_SECONDS', 0.1):
+            holder.start()
+            summary = self.run_participants(["alpha"])["alpha"]
+            # The merger's workstation dies without giving up its lease
+            holder._stop.set()
+            holder._thread.join()
+
+        self.assertFalse(summary['merger'])
+        self.assertFalse(os.path.exists(self.excel_path))
+        self.assertEqual(summary['extracted'], LETTERS)
+        self.assertTrue(os.listdir(os.path.join(self.queue_dir, "results")))
+
+        # The next run waits until the lease has stopped beating for the lease period, then merges what was left
+        summary = self.run_participants(["beta"])["beta"]
+        self.assertTrue(summary['merger'])
+        self.assertEqual(len(self.sheet_files()), LETTERS)
+
+
+if __name__ == "__main__":
+    unittest.main()